@@ -0,0 +1,147 @@
+"""
+Resources exposed by the JSON API.
+
+A resource names the model fields a client may ask for, the relations it may
+``include``, and the rows the requesting user is allowed to see. Relations
+that are not included are rendered as the related row's id. Every include
+also declares the columns that version it: the view reads those together
+with the rows' own ``updated_at`` to compute the ETag before loading any
+related data, so an unchanged page is answered with a 304 after one narrow
+query.
+"""
+from collections import namedtuple
+
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from auction import formats
+from auction.models import AuctionItem, AuctionResult, Offer
+from courses.models import Course, TimeSlot
+
+# many=True relations are prefetched, the others are joined with select_related
+Include = namedtuple("Include", "field fields many versions")
+
+
+class Resource:
+    name = None
+    model = None
+    fields = ()
+    includes = {}
+    cursor_field = "created_at"
+    descending = True
+    login_required = False
+
+    def queryset(self, request):
+        return self.model.objects.all()
+
+    def filter(self, request, queryset):
+        return queryset
+
+
+class Items(Resource):
+    name = "items"
+    model = AuctionItem
+    # reserve_price stays private to the provider
+    fields = (
+        "id", "title", "short_description", "category", "provider", "condition", "quantity_available",
+        "unit_of_measure", "unit_price", "total_price", "auction_format", "soft_close", "start_datetime",
+        "ends_at", "is_active", "created_at", "updated_at",
+    )
+    includes = {
+        "category": Include("category", ("id", "name"), False, {"category": F("category__updated_at")}),
+        "provider": Include("provider", ("id", "display_name"), False, {"provider": F("provider__display_name")}),
+        "images": Include("images", ("id", "image", "uploaded_at"), True, {
+            "images": Max("images__uploaded_at"), "image_count": Count("images", distinct=True),
+        }),
+    }
+
+    def filter(self, request, queryset):
+        if request.GET.get("category"):
+            queryset = queryset.filter(category_id=request.GET["category"])
+        if request.GET.get("active") in ("true", "false"):
+            queryset = queryset.filter(is_active=request.GET["active"] == "true")
+        return queryset
+
+
+class Offers(Resource):
+    name = "offers"
+    model = Offer
+    fields = (
+        "id", "item", "customer", "status", "offer_unit_price", "offer_quantity", "offer_price",
+        "created_at", "submitted_at", "accepted_at", "updated_at",
+    )
+    includes = {
+        "item": Include("auction_item", Items.fields, False, {"item": F("auction_item__updated_at")}),
+    }
+    login_required = True
+
+    def queryset(self, request):
+        user = request.user
+        sealed = [code for code, strategy in formats.FORMATS.items() if strategy.sealed]
+        # the provider sees offers on their items except drafts and sealed bids that are still live
+        received = Q(auction_item__provider__user=user) & ~Q(status=Offer.STATUS_DRAFT) & ~Q(
+            auction_item__auction_format__in=sealed,
+            auction_item__is_active=True,
+            auction_item__ends_at__gt=timezone.now(),
+        )
+        return Offer.objects.filter(Q(customer=user) | received)
+
+    def filter(self, request, queryset):
+        if request.GET.get("status"):
+            queryset = queryset.filter(status=request.GET["status"])
+        if request.GET.get("item"):
+            queryset = queryset.filter(auction_item_id=request.GET["item"])
+        return queryset
+
+
+class Results(Resource):
+    name = "results"
+    model = AuctionResult
+    fields = (
+        "id", "item", "provider", "customer", "qty", "condition", "merchant_price", "sold_price_total",
+        "start_datetime", "sold_datetime", "updated_at",
+    )
+    includes = {
+        "item": Include("auction_item", Items.fields, False, {"item": F("auction_item__updated_at")}),
+        "provider": Include("provider", ("id", "display_name"), False, {"provider": F("provider__display_name")}),
+    }
+    cursor_field = "sold_datetime"
+    login_required = True
+
+    def queryset(self, request):
+        return AuctionResult.objects.filter(Q(customer=request.user) | Q(provider__user=request.user))
+
+
+class Courses(Resource):
+    name = "courses"
+    model = Course
+    fields = (
+        "id", "title", "description", "teacher", "image", "video_url", "price", "duration_minutes",
+        "start_date", "end_date", "created_at", "updated_at",
+    )
+    includes = {
+        "time_slots": Include("time_slots", ("id", "start_time", "end_time", "capacity", "seats_available"), True, {
+            "time_slots": Max("time_slots__updated_at"), "time_slot_count": Count("time_slots", distinct=True),
+        }),
+    }
+
+
+class TimeSlots(Resource):
+    name = "timeslots"
+    model = TimeSlot
+    fields = ("id", "course", "start_time", "end_time", "capacity", "seats_available", "updated_at")
+    includes = {
+        "course": Include("course", ("id", "title", "price", "duration_minutes"), False, {
+            "course": F("course__updated_at"),
+        }),
+    }
+    cursor_field = "start_time"
+    descending = False
+
+    def filter(self, request, queryset):
+        if request.GET.get("course"):
+            queryset = queryset.filter(course_id=request.GET["course"])
+        return queryset
+
+
+RESOURCES = {resource.name: resource for resource in (Items(), Offers(), Results(), Courses(), TimeSlots())}
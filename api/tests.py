@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from auction.models import AuctionItem, Category, Offer, Provider
+
+
+class OfferETagTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create_user("seller", password="pw")
+        provider = Provider.objects.create(user=seller, display_name="Seller")
+        item = AuctionItem.objects.create(
+            provider=provider, category=Category.objects.create(name="Tools"), title="Drill",
+            short_description="Drill", unit_price=10, quantity_available=5, start_datetime=timezone.now(),
+        )
+        self.buyer = User.objects.create_user("buyer", password="pw")
+        self.offer = Offer.objects.create(auction_item=item, customer=self.buyer, offer_quantity=1)
+        self.client.force_login(self.buyer)
+        self.url = reverse("api:detail", args=["offers", self.offer.pk])
+
+    def test_etag_changes_after_submit(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.offer.submit()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["data"]["status"], Offer.STATUS_SUBMITTED)
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = "api"
+
+urlpatterns = [
+    path("v1/<str:name>/", views.resource_list, name="list"),
+    path("v1/<str:name>/<int:pk>/", views.resource_detail, name="detail"),
+]
@@ -0,0 +1,214 @@
+"""
+Read-only JSON API, version 1.
+
+    GET /api/v1/<resource>/?fields=id,title&include=category&limit=25&after=<cursor>
+    GET /api/v1/<resource>/<id>/?fields=...&include=...
+
+``fields`` picks the fields to return (sparse fieldsets; ``id`` is always
+returned) and only those columns are loaded. ``include`` expands relations
+inline, joined or prefetched as the relation requires. Lists are paged by
+keyset cursor (auction.keyset); ``next`` holds the URL of the following
+page, or null on the last one.
+
+Every response carries a strong ETag computed from the ``updated_at`` of the
+rows on the page and of every included relation, plus the shape of the
+request. A client that sends it back in If-None-Match gets a 304 as soon as
+the versions are read, before any row data is loaded or rendered.
+Authentication is the site session; offers and results are scoped to the
+requesting user.
+"""
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Prefetch
+from django.db.models.fields.files import FieldFile
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+from auction import keyset
+from main_site.replicas import read_from_replica
+
+from .resources import RESOURCES
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+    def response(self):
+        return JsonResponse({"error": str(self)}, status=self.status)
+
+
+def model_field(resource, name):
+    include = resource.includes.get(name)
+    return include.field if include else name
+
+
+def parse_shape(request, resource):
+    fields = request.GET.get("fields")
+    if fields:
+        fields = ["id", *(name for name in fields.split(",") if name and name != "id")]
+        unknown = set(fields) - set(resource.fields)
+        if unknown:
+            raise ApiError(400, f"Unknown fields for {resource.name}: {', '.join(sorted(unknown))}")
+    else:
+        fields = list(resource.fields)
+
+    includes = [name for name in request.GET.get("include", "").split(",") if name]
+    unknown = set(includes) - set(resource.includes)
+    if unknown:
+        raise ApiError(400, f"Unknown includes for {resource.name}: {', '.join(sorted(unknown))}")
+    # an included relation is always rendered, even if fields left it out
+    fields += [name for name in includes if name not in fields and name in resource.fields]
+    return fields, sorted(set(includes))
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit must be a number")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def versioned(resource, queryset, includes):
+    annotations = {}
+    for name in includes:
+        annotations.update({f"v_{key}": value for key, value in resource.includes[name].versions.items()})
+    return queryset.only("pk", resource.cursor_field, "updated_at").annotate(**annotations), sorted(annotations)
+
+
+def etag_for(request, resource, rows, version_names, extra=""):
+    digest = hashlib.sha1()
+    digest.update(f"v1|{resource.name}|{request.GET.urlencode()}|{extra}".encode())
+    for row in rows:
+        digest.update(f"|{row.pk}:{row.updated_at.isoformat()}".encode())
+        for name in version_names:
+            digest.update(f":{getattr(row, name)}".encode())
+    return quote_etag(digest.hexdigest())
+
+
+def not_modified(request, etag):
+    return etag in parse_etags(request.headers.get("If-None-Match", ""))
+
+
+def load(resource, queryset, fields, includes):
+    columns = {"pk"}
+    for name in fields:
+        columns.add(model_field(resource, name))
+    for name in includes:
+        include = resource.includes[name]
+        if include.many:
+            related = resource.model._meta.get_field(include.field).related_model
+            queryset = queryset.prefetch_related(Prefetch(include.field, queryset=related.objects.order_by("pk")))
+        else:
+            columns.add(include.field)
+            queryset = queryset.select_related(include.field)
+    # prefetched relations are not columns of this model
+    columns -= {resource.includes[name].field for name in includes if resource.includes[name].many}
+    return queryset.only(*columns)
+
+
+def render_value(value):
+    if isinstance(value, FieldFile):
+        return value.url if value else None
+    return value
+
+
+def render_row(obj, names, field_for=lambda name: name):
+    data = {}
+    for name in names:
+        field = obj._meta.get_field(field_for(name))
+        data[name] = render_value(getattr(obj, field.attname))
+    return data
+
+
+def render(resource, obj, fields, includes):
+    plain = [name for name in fields if name not in includes]
+    data = render_row(obj, plain, lambda name: model_field(resource, name))
+    for name in includes:
+        include = resource.includes[name]
+        related = getattr(obj, include.field)
+        if include.many:
+            data[name] = [render_row(child, include.fields) for child in related.all()]
+        else:
+            data[name] = render_row(related, include.fields) if related is not None else None
+    return data
+
+
+def finish(response, etag):
+    response["ETag"] = etag
+    # clients must revalidate, which costs them a 304 when nothing changed
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Cookie"])
+    return response
+
+
+def prepare(request, name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError(404, f"Unknown resource: {name}")
+    if resource.login_required and not request.user.is_authenticated:
+        raise ApiError(401, "Authentication required")
+    try:
+        queryset = resource.filter(request, resource.queryset(request))
+    except (ValueError, ValidationError, FieldDoesNotExist) as exc:
+        raise ApiError(400, str(exc))
+    return resource, queryset
+
+
+@require_safe
+@read_from_replica
+def resource_list(request, name):
+    try:
+        resource, queryset = prepare(request, name)
+        fields, includes = parse_shape(request, resource)
+        limit = parse_limit(request)
+    except ApiError as exc:
+        return exc.response()
+
+    versions, version_names = versioned(resource, queryset, includes)
+    page = keyset.page(versions, request.GET.get("after"), limit, resource.cursor_field, resource.descending)
+    etag = etag_for(request, resource, page.rows, version_names, page.next_cursor or "")
+    if not_modified(request, etag):
+        return finish(HttpResponseNotModified(), etag)
+
+    pks = [row.pk for row in page.rows]
+    loaded = load(resource, resource.model.objects.filter(pk__in=pks), fields, includes).in_bulk()
+    next_url = None
+    if page.next_cursor:
+        query = request.GET.copy()
+        query["after"] = page.next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+    return finish(JsonResponse({
+        "data": [render(resource, loaded[pk], fields, includes) for pk in pks if pk in loaded],
+        "next": next_url,
+    }), etag)
+
+
+@require_safe
+@read_from_replica
+def resource_detail(request, name, pk):
+    try:
+        resource, queryset = prepare(request, name)
+        fields, includes = parse_shape(request, resource)
+    except ApiError as exc:
+        return exc.response()
+
+    versions, version_names = versioned(resource, queryset.filter(pk=pk), includes)
+    row = versions.first()
+    if row is None:
+        return ApiError(404, f"No {resource.name} matches the given id.").response()
+    etag = etag_for(request, resource, [row], version_names)
+    if not_modified(request, etag):
+        return finish(HttpResponseNotModified(), etag)
+
+    obj = load(resource, resource.model.objects.filter(pk=pk), fields, includes).get()
+    return finish(JsonResponse({"data": render(resource, obj, fields, includes)}), etag)
@@ -0,0 +1,38 @@
+/**
+ * Auction countdowns.
+ *
+ * Every element with class "countdown" and a data-ends-at attribute (Unix
+ * seconds) shows the time left until then. The page carries one server
+ * timestamp (data-server-now on this script tag) so a wrong client clock
+ * does not shift the countdowns.
+ */
+(function() {
+  "use strict";
+
+  const script = document.currentScript;
+  const serverNow = parseInt(script && script.dataset.serverNow, 10);
+  const skew = isNaN(serverNow) ? 0 : serverNow * 1000 - Date.now();
+
+  function format(seconds) {
+    if (seconds <= 0) return "Expired";
+    const days = Math.floor(seconds / 86400);
+    const hours = Math.floor((seconds % 86400) / 3600);
+    const minutes = Math.floor((seconds % 3600) / 60);
+    if (days > 0) return days + "d " + hours + "h " + minutes + "m remaining";
+    if (hours > 0) return hours + "h " + minutes + "m remaining";
+    return minutes + "m remaining";
+  }
+
+  function update() {
+    const now = (Date.now() + skew) / 1000;
+    document.querySelectorAll(".countdown[data-ends-at]").forEach(function(el) {
+      const endsAt = parseInt(el.dataset.endsAt, 10);
+      if (!isNaN(endsAt)) el.textContent = format(endsAt - now);
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", function() {
+    update();
+    setInterval(update, 30000);
+  });
+})();
@@ -1,8 +1,16 @@
 from django.contrib import admin
-from .models import Provider, Category, AuctionItem, Offer, AuctionResult, AuctionImage, AuctionVideo
+from .exports import ITEM_FIELDS, OFFER_FIELDS, RESULT_FIELDS, export_response
+from .models import Provider, Category, AuctionItem, Offer, AuctionResult, AuctionImage, AuctionVideo, ProviderSalesStat, ItemImport
+from .models import SavedSearch, WatchedItem, WatchNotification, ProxyBid, DomainEvent, ItemState
+from main_site.paginator import EstimatedCountPaginator
 
 
 
+@admin.action(description="Export selected rows as CSV")
+def export_as_csv(modeladmin, request, queryset):
+    return export_response(request, queryset, modeladmin.export_fields, "csv", modeladmin.model._meta.model_name)
+
+
 class AuctionImageInline(admin.TabularInline):
     model = AuctionImage
     extra = 1
@@ -12,14 +20,137 @@ class AuctionVideoInline(admin.TabularInline):
     model = AuctionVideo
     extra = 1
 
+class ProviderAdmin(admin.ModelAdmin):
+    list_display = ('display_name', 'user')
+    list_select_related = ('user',)
+    search_fields = ('display_name', 'user__username')
+    raw_id_fields = ('user',)
+
+
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'active_item_count')
+    search_fields = ('name',)
+
+
 class AuctionItemAdmin(admin.ModelAdmin):
     inlines = [AuctionImageInline, AuctionVideoInline]
     list_display = ('title', 'provider', 'category','created_at')
+    list_select_related = ('provider', 'category')
+    list_filter = ('is_active', 'category', 'created_at')
     search_fields = ('title',)
+    autocomplete_fields = ('provider', 'category')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [export_as_csv]
+    export_fields = ITEM_FIELDS
+
+
+class OfferAdmin(admin.ModelAdmin):
+    list_display = ('id', 'auction_item', 'customer', 'offer_quantity', 'offer_price', 'status', 'created_at')
+    list_select_related = ('auction_item', 'customer')
+    list_filter = ('status', 'created_at')
+    autocomplete_fields = ('auction_item', 'customer')
+    raw_id_fields = ('proxy_bid',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [export_as_csv]
+    export_fields = OFFER_FIELDS
+
+
+class AuctionResultAdmin(admin.ModelAdmin):
+    list_display = ('auction_item', 'provider', 'customer', 'qty', 'sold_price_total', 'sold_datetime')
+    list_select_related = ('auction_item', 'provider', 'customer')
+    list_filter = ('sold_datetime',)
+    autocomplete_fields = ('auction_item', 'provider', 'customer')
+    # Offer.__str__ needs the item and customer; show the id only
+    raw_id_fields = ('offer_quantity',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [export_as_csv]
+    export_fields = RESULT_FIELDS
+
+
+class ProviderSalesStatAdmin(admin.ModelAdmin):
+    list_display = ('provider', 'category', 'day', 'items_listed', 'offers_received', 'accepted_quantity', 'revenue')
+    list_select_related = ('provider', 'category')
+    raw_id_fields = ('provider', 'category')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ItemImportAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'provider', 'status', 'rows_total', 'rows_imported', 'rows_failed', 'created_at')
+    list_select_related = ('provider',)
+    list_filter = ('status',)
+    raw_id_fields = ('provider',)
+
+class ProxyBidAdmin(admin.ModelAdmin):
+    list_display = ('auction_item', 'customer', 'max_unit_price', 'offer_quantity', 'is_active', 'placed_at')
+    list_select_related = ('auction_item', 'customer')
+    list_filter = ('is_active',)
+    raw_id_fields = ('auction_item', 'customer')
+
+
+class DomainEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'item_id', 'offer_id', 'occurred_at')
+    list_filter = ('kind',)
+    search_fields = ('=item_id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # the log is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ItemStateAdmin(admin.ModelAdmin):
+    list_display = ('item_id', 'offers_submitted', 'high_unit_price', 'accepted_quantity', 'revenue', 'closed_at', 'close_reason')
+    search_fields = ('=item_id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('user', 'category', 'keyword', 'max_unit_price', 'created_at')
+    list_select_related = ('user', 'category')
+    raw_id_fields = ('user',)
+    search_fields = ('keyword',)
+
+
+class WatchedItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'auction_item', 'created_at')
+    list_select_related = ('user', 'auction_item')
+    raw_id_fields = ('user', 'auction_item')
+
+
+class WatchNotificationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'auction_item', 'kind', 'created_at', 'sent_at')
+    list_select_related = ('user', 'auction_item')
+    list_filter = ('kind',)
+    raw_id_fields = ('user', 'auction_item')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
    
-admin.site.register(Provider)
-admin.site.register(Category)
+admin.site.register(Provider, ProviderAdmin)
+admin.site.register(Category, CategoryAdmin)
 admin.site.register(AuctionItem, AuctionItemAdmin)
-admin.site.register(Offer)
-admin.site.register(AuctionResult)
-
+admin.site.register(Offer, OfferAdmin)
+admin.site.register(AuctionResult, AuctionResultAdmin)
+admin.site.register(ProviderSalesStat, ProviderSalesStatAdmin)
+admin.site.register(ItemImport, ItemImportAdmin)
+admin.site.register(SavedSearch, SavedSearchAdmin)
+admin.site.register(WatchedItem, WatchedItemAdmin)
+admin.site.register(WatchNotification, WatchNotificationAdmin)
+admin.site.register(ProxyBid, ProxyBidAdmin)
+admin.site.register(DomainEvent, DomainEventAdmin)
+admin.site.register(ItemState, ItemStateAdmin)
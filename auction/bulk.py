@@ -0,0 +1,197 @@
+"""
+Bulk offer actions for providers.
+
+A provider posts a list of actions -- accept or reject an offer, close an
+item -- and ``apply()`` runs them as one batch in one transaction. The
+touched items and offers are locked and loaded once, each action is checked
+in order against that in-memory state (offer still submitted, item still
+open, enough quantity left after the accepts before it), and then the batch
+is written with a fixed number of set-based statements: one UPDATE per offer
+outcome, one bulk_update for the items' inventory, bulk inserts for results
+and events, and stats bumped once per category.
+
+Accepted offers draw down ``quantity_available`` and the item closes once
+it is sold out, so a multi-unit lot can be cleared in one request. Like
+batched settlement, this skips the Offer signals: no per-offer email goes
+out, and winners and watchers hear about it through the watch digest.
+
+Every action gets a result entry. By default the valid actions are applied
+and the rest are reported. With ``all_or_nothing`` one invalid action
+cancels the whole batch.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import categories, purchases, stats, watch
+from .models import AuctionItem, AuctionResult, DomainEvent, Offer
+
+ACCEPT = "accept"
+REJECT = "reject"
+CLOSE = "close"
+MAX_ACTIONS = 1000
+
+
+def _parse(action):
+    """Return (kind, target id, error)."""
+    if not isinstance(action, dict):
+        return None, None, "Each action must be an object."
+    kind = action.get("action")
+    key = "item" if kind == CLOSE else "offer"
+    if kind not in (ACCEPT, REJECT, CLOSE):
+        return None, None, f"Unknown action: {kind!r}."
+    try:
+        return kind, int(action.get(key)), None
+    except (TypeError, ValueError):
+        return kind, None, f"{kind} needs a numeric {key!r}."
+
+
+def _result(index, kind, target, error=None):
+    result = {"index": index, "action": kind, "ok": error is None}
+    if target is not None:
+        result["item" if kind == CLOSE else "offer"] = target
+    if error:
+        result["error"] = error
+    return result
+
+
+def apply(provider, actions, all_or_nothing=False, now=None):
+    """Validate and apply ``actions`` for ``provider``; return (applied, per-action results)."""
+    now = now or timezone.now()
+    parsed = [_parse(action) for action in actions]
+    offer_ids = {target for kind, target, error in parsed if not error and kind != CLOSE}
+    close_ids = {target for kind, target, error in parsed if not error and kind == CLOSE}
+
+    with transaction.atomic():
+        offer_items = Offer.objects.filter(pk__in=offer_ids).values_list("auction_item_id", flat=True)
+        # items first, then their offers, the same order the offer views lock in
+        items = AuctionItem.objects.select_for_update().filter(provider=provider).filter(
+            pk__in={*close_ids, *offer_items}
+        ).in_bulk()
+        offers = Offer.objects.select_for_update().filter(pk__in=offer_ids, auction_item_id__in=items).in_bulk()
+        sold = set(AuctionResult.objects.filter(auction_item_id__in=items).values_list("auction_item_id", flat=True))
+
+        results, decided = [], set()
+        accepted, rejected, closing = [], [], []
+        remaining = {pk: item.quantity_available or 0 for pk, item in items.items()}
+        for index, (kind, target, error) in enumerate(parsed):
+            if error is None:
+                if kind == CLOSE:
+                    item = items.get(target)
+                    if item is None:
+                        error = "No such item."
+                    elif not item.is_active or item.settled_at is not None:
+                        error = "This auction is already closed."
+                    else:
+                        closing.append((index, item))
+                else:
+                    offer = offers.get(target)
+                    item = items.get(offer.auction_item_id) if offer else None
+                    if offer is None:
+                        error = "No such offer."
+                    elif offer.pk in decided:
+                        error = "This offer was already decided in this batch."
+                    elif offer.accepted:
+                        error = "This offer has already been accepted."
+                    elif offer.status != Offer.STATUS_SUBMITTED:
+                        error = f"This offer is {offer.get_status_display().lower()}."
+                    elif kind == REJECT:
+                        rejected.append(offer)
+                        decided.add(offer.pk)
+                    elif not item.is_active or item.settled_at is not None:
+                        error = "This auction is closed."
+                    elif offer.offer_quantity > remaining[item.pk]:
+                        error = "Not enough quantity available to accept this offer."
+                    else:
+                        remaining[item.pk] -= offer.offer_quantity
+                        accepted.append(offer)
+                        decided.add(offer.pk)
+            results.append(_result(index, kind, target, error))
+
+        # the provider may only close items with no open offers left once the batch is applied
+        if closing:
+            still_open = set(
+                Offer.objects.filter(auction_item_id__in=[item.pk for _, item in closing], status=Offer.STATUS_SUBMITTED)
+                .exclude(pk__in=decided)
+                .values_list("auction_item_id", flat=True)
+            )
+            for index, item in closing:
+                if item.pk in still_open:
+                    results[index] = _result(index, CLOSE, item.pk, "This auction has offers and cannot be closed at this time.")
+            closing = [item for index, item in closing if results[index]["ok"]]
+
+        if all_or_nothing and not all(result["ok"] for result in results):
+            for result in results:
+                if result["ok"]:
+                    result.update(ok=False, error="Not applied: another action in the batch failed.")
+            return False, results
+
+        _write(provider, items, accepted, rejected, closing, remaining, sold, now)
+    return True, results
+
+
+def _write(provider, items, accepted, rejected, closing, remaining, sold, now):
+    events = []
+    if accepted:
+        Offer.objects.filter(pk__in=[offer.pk for offer in accepted]).update(
+            accepted=True, status=Offer.STATUS_ACCEPTED, accepted_at=now, updated_at=now,
+        )
+    if rejected:
+        Offer.objects.filter(pk__in=[offer.pk for offer in rejected]).update(
+            status=Offer.STATUS_REJECTED, updated_at=now,
+        )
+
+    new_results, sales = [], defaultdict(lambda: [0, Decimal("0")])
+    for offer in accepted:
+        item = items[offer.auction_item_id]
+        events.append(DomainEvent.build(
+            DomainEvent.OFFER_ACCEPTED, item.pk, offer, quantity=offer.offer_quantity, price_total=offer.offer_price,
+        ))
+        # one AuctionResult per item: the first buyer, as with a single accept
+        if item.pk not in sold:
+            sold.add(item.pk)
+            new_results.append(AuctionResult(
+                auction_item_id=item.pk,
+                provider_id=item.provider_id,
+                customer_id=offer.customer_id,
+                offer_quantity_id=offer.pk,
+                qty=offer.offer_quantity,
+                condition=item.condition,
+                merchant_price=item.total_price or 0,
+                sold_price_total=offer.offer_price,
+                start_datetime=item.start_datetime,
+                sold_datetime=now,
+            ))
+        sale = sales[item.category_id]
+        sale[0] += offer.offer_quantity
+        sale[1] += offer.offer_price
+    events += [DomainEvent.build(DomainEvent.OFFER_REJECTED, offer.auction_item_id, offer) for offer in rejected]
+
+    changed, closed = [], Counter()
+    closing_ids = {item.pk for item in closing}
+    for pk in {offer.auction_item_id for offer in accepted} | closing_ids:
+        item = items[pk]
+        item.quantity_available = remaining[pk]
+        item.fill_total_price()
+        item.updated_at = now
+        if item.quantity_available <= 0 or pk in closing_ids:
+            item.is_active = False
+            closed[item.category_id] += 1
+            events.append(DomainEvent.build(
+                DomainEvent.AUCTION_CLOSED, pk, reason="provider" if pk in closing_ids else "sold",
+            ))
+        changed.append(item)
+    AuctionItem.objects.bulk_update(changed, ["quantity_available", "total_price", "is_active", "updated_at"])
+    AuctionResult.objects.bulk_create(new_results)
+    DomainEvent.objects.bulk_create(events)
+
+    day = timezone.localdate(now)
+    for category_id, (quantity, total) in sales.items():
+        stats.bump(provider.pk, category_id, day, accepted_quantity=quantity, revenue=total)
+    # bulk_update skips the category counter signals
+    for category_id, count in closed.items():
+        categories.adjust(category_id, -count)
+    watch.record_awards((offer.auction_item_id, offer.customer_id) for offer in accepted)
+    purchases.forget_totals(*{result.customer_id for result in new_results})
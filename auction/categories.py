@@ -0,0 +1,63 @@
+"""
+Denormalized active-item counts per category.
+
+``Category.active_item_count`` is moved with F() updates whenever an item
+is created, closed, reopened, moved to another category or deleted, so the
+category sidebar reads one small table instead of grouping all items.
+bulk_create and QuerySet.update() skip these signals: bulk paths call
+``adjust()`` themselves, and ``manage.py recount_categories`` repairs drift.
+"""
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import AuctionItem, Category
+
+
+def adjust(category_id, delta):
+    if category_id is None or not delta:
+        return
+    Category.objects.filter(pk=category_id).update(
+        active_item_count=Greatest(F("active_item_count") + delta, 0)
+    )
+
+
+def recount():
+    active = Count("auction_items", filter=Q(auction_items__is_active=True))
+    changed = 0
+    for category in Category.objects.annotate(active=active).iterator():
+        if category.active != category.active_item_count:
+            Category.objects.filter(pk=category.pk).update(active_item_count=category.active)
+            changed += 1
+    return changed
+
+
+def _counted_in(item):
+    # deferred fields are not loaded; treat them as unknown rather than query
+    fields = item.__dict__
+    if "is_active" not in fields or "category_id" not in fields:
+        return None
+    return item.category_id if item.is_active else None
+
+
+@receiver(post_init, sender=AuctionItem)
+def remember_counted_category(sender, instance, **kwargs):
+    instance._counted_category_id = _counted_in(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=AuctionItem)
+def update_active_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = None if created else instance._counted_category_id
+    after = _counted_in(instance)
+    if before != after:
+        adjust(before, -1)
+        adjust(after, 1)
+    instance._counted_category_id = after
+
+
+@receiver(post_delete, sender=AuctionItem)
+def release_active_count(sender, instance, **kwargs):
+    adjust(instance._counted_category_id, -1)
@@ -1,4 +1,4 @@
-from .models import Provider
+from .models import Category, Provider
 
 
 
@@ -8,3 +8,15 @@ def user_role(request):
         user_is_provider = Provider.objects.filter(user=request.user).exists()
 
     return {'user_is_provider': user_is_provider}
+
+
+def category_nav(request):
+    # evaluated only by templates that render the sidebar; the counts are
+    # stored on Category, so this is one small query with no GROUP BY
+    return {
+        "nav_categories": lambda: list(
+            Category.objects.filter(active_item_count__gt=0)
+            .order_by("name")
+            .only("name", "active_item_count")
+        ),
+    }
@@ -0,0 +1,183 @@
+"""
+Domain event log and the item-state projection built from it.
+
+Offer and auction state changes append a ``DomainEvent`` in the same
+transaction as the change itself (offer confirm and withdrawal, proxy bids,
+acceptance, soft-close extensions, closing and settlement), so the log is a
+complete audit of how every item reached its current state.
+
+``ItemState`` is a projection: ``apply()`` folds one event into one item's
+state, and nothing else writes to it. ``project_pending()`` applies the
+events appended since the stored cursor. Ids are handed out before commit,
+so a slow transaction can commit an id the cursor has already passed: every
+id skipped on the way is kept on the cursor as a gap and applied when its
+event shows up, until GAP_TIMEOUT says the transaction rolled back.
+
+``replay()`` (manage.py replay_events) rebuilds the whole table. It first
+moves the cursor to the head of the log, then pages through the item ids
+with keyset pagination on the domain_event_item index and commits one batch
+of items per transaction: each item's state is rebuilt from its events up to
+the cursor, leaving out the open gaps, and overwrites the stored row. Each
+batch holds the cursor row lock, so ``project_pending()`` runs between
+batches rather than waiting for the whole log; what it applies to an item
+not rebuilt yet is recomputed when the batch reaches that item.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import DomainEvent, ItemState, WatchCursor
+
+CHUNK_SIZE = 5000
+ITEMS_PER_BATCH = 1000
+PROJECTION_CURSOR = "item-state"
+# how long a skipped id is waited for before it is taken for a rollback
+GAP_TIMEOUT = timedelta(minutes=10)
+STATE_FIELDS = [
+    "offers_submitted", "offers_withdrawn", "high_unit_price", "accepted_quantity",
+    "revenue", "buyer_id", "ends_at", "closed_at", "close_reason", "last_event_id",
+]
+
+
+def apply(state, event):
+    data = event.data
+    if event.kind == DomainEvent.OFFER_SUBMITTED:
+        state.offers_submitted += 1
+        price = data.get("unit_price")
+        if price not in (None, "None"):
+            price = Decimal(price)
+            if state.high_unit_price is None or price > state.high_unit_price:
+                state.high_unit_price = price
+    elif event.kind == DomainEvent.OFFER_WITHDRAWN:
+        state.offers_withdrawn += 1
+    elif event.kind == DomainEvent.OFFER_ACCEPTED:
+        state.accepted_quantity += data.get("quantity") or 0
+        state.revenue += Decimal(data.get("price_total") or 0)
+        state.buyer_id = data.get("customer")
+    elif event.kind == DomainEvent.AUCTION_EXTENDED:
+        # extensions only move the end forward, whatever order they arrive in
+        ends_at = parse_datetime(data["ends_at"])
+        if state.ends_at is None or ends_at > state.ends_at:
+            state.ends_at = ends_at
+    elif event.kind == DomainEvent.AUCTION_CLOSED:
+        if state.closed_at is None:
+            state.closed_at = event.occurred_at
+            state.close_reason = data.get("reason", "")
+    state.last_event_id = max(state.last_event_id or 0, event.pk)
+    return state
+
+
+def new_state(item_id):
+    return ItemState(item_id=item_id, revenue=Decimal("0"))
+
+
+def missing_ids(ids, after):
+    """Return the ids between ``after`` and the last of ``ids`` (ascending) that are not in it."""
+    missing, expected = [], after + 1
+    for pk in ids:
+        missing += range(expected, pk)
+        expected = pk + 1
+    return missing
+
+
+def replay(chunk_size=CHUNK_SIZE, items_per_batch=ITEMS_PER_BATCH):
+    """Rebuild ItemState from the whole log; return (events, items) replayed."""
+    with transaction.atomic():
+        cursor, _ = WatchCursor.objects.select_for_update().get_or_create(name=PROJECTION_CURSOR)
+        until = DomainEvent.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        # only transactions younger than GAP_TIMEOUT can still commit a lower id
+        now = timezone.now()
+        recent = list(
+            DomainEvent.objects.filter(id__lte=until, occurred_at__gte=now - GAP_TIMEOUT)
+            .order_by("id").values_list("id", flat=True)
+        )
+        gaps = {str(pk): now.isoformat() for pk in missing_ids(recent[1:], recent[0])} if recent else {}
+        # earlier gaps stay open until their event shows up
+        filled = set(DomainEvent.objects.filter(id__in=[int(pk) for pk in cursor.gaps]).values_list("id", flat=True))
+        gaps.update({pk: seen for pk, seen in cursor.gaps.items() if int(pk) not in filled})
+        cursor.position = max(cursor.position, until)
+        cursor.gaps = gaps
+        cursor.save(update_fields=["position", "gaps"])
+
+    events = items = 0
+    after = None
+    while True:
+        with transaction.atomic():
+            cursor = WatchCursor.objects.select_for_update().get(name=PROJECTION_CURSOR)
+            page = DomainEvent.objects.order_by("item_id").values_list("item_id", flat=True).distinct()
+            stale = ItemState.objects.all()
+            if after is not None:
+                page = page.filter(item_id__gt=after)
+                stale = stale.filter(item_id__gt=after)
+            item_ids = list(page[:items_per_batch])
+            if not item_ids:
+                # states left from items whose events are gone
+                stale.delete()
+                return events, items
+
+            states = {}
+            log = (
+                DomainEvent.objects.filter(item_id__in=item_ids, id__lte=cursor.position)
+                .exclude(id__in=[int(pk) for pk in cursor.gaps])
+                .order_by("item_id", "id")
+            )
+            for event in log.iterator(chunk_size=chunk_size):
+                state = states.get(event.item_id)
+                if state is None:
+                    state = states[event.item_id] = new_state(event.item_id)
+                apply(state, event)
+                events += 1
+            ItemState.objects.bulk_create(
+                list(states.values()),
+                update_conflicts=True,
+                unique_fields=["item_id"],
+                update_fields=STATE_FIELDS,
+                batch_size=1000,
+            )
+            # and from items with no event up to the cursor, which project_pending() applies from scratch
+            stale.filter(item_id__lte=item_ids[-1]).exclude(item_id__in=states).delete()
+            items += len(states)
+            after = item_ids[-1]
+
+
+def project_pending(chunk_size=CHUNK_SIZE):
+    """Apply the events appended since the last projection, and any that
+    committed late into a gap; return how many were applied."""
+    applied = 0
+    while True:
+        with transaction.atomic():
+            now = timezone.now()
+            cursor, _ = WatchCursor.objects.select_for_update().get_or_create(name=PROJECTION_CURSOR)
+            gaps = {
+                pk: seen for pk, seen in cursor.gaps.items() if parse_datetime(seen) > now - GAP_TIMEOUT
+            }
+            late = list(DomainEvent.objects.filter(id__in=[int(pk) for pk in gaps]).order_by("id")) if gaps else []
+            events = list(DomainEvent.objects.filter(id__gt=cursor.position).order_by("id")[:chunk_size])
+            for event in late:
+                del gaps[str(event.pk)]
+            gaps.update({str(pk): now.isoformat() for pk in missing_ids([e.pk for e in events], cursor.position)})
+
+            states = ItemState.objects.in_bulk({event.item_id for event in late + events})
+            for event in late + events:
+                state = states.get(event.item_id)
+                if state is None:
+                    state = states[event.item_id] = new_state(event.item_id)
+                apply(state, event)
+            ItemState.objects.bulk_create(
+                list(states.values()),
+                update_conflicts=True,
+                unique_fields=["item_id"],
+                update_fields=STATE_FIELDS,
+                batch_size=1000,
+            )
+            if events:
+                cursor.position = events[-1].pk
+            if events or gaps != cursor.gaps:
+                cursor.gaps = gaps
+                cursor.save(update_fields=["position", "gaps"])
+        applied += len(late) + len(events)
+        if len(events) < chunk_size:
+            return applied
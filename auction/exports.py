@@ -0,0 +1,78 @@
+"""
+Streaming CSV / JSON Lines exports.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` and written
+to the response as they arrive, so memory use does not grow with the
+number of rows exported. Under ASGI (main_site.asgi) a StreamingHttpResponse
+over a sync iterator is read into memory in full before it is sent, so
+requests served there get an async iterator that fetches the rows one chunk
+at a time through ``sync_to_async``.
+"""
+import csv
+import json
+from itertools import chain, islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+CHUNK_SIZE = 2000
+
+ITEM_FIELDS = [
+    "id", "title", "category__name", "short_description", "condition",
+    "quantity_available", "unit_of_measure", "unit_price", "total_price",
+    "start_datetime", "duration_days", "is_active", "created_at",
+]
+OFFER_FIELDS = [
+    "id", "auction_item_id", "auction_item__title", "customer__username",
+    "offer_quantity", "offer_unit_price", "offer_price", "status", "accepted",
+    "created_at", "submitted_at", "accepted_at",
+]
+RESULT_FIELDS = [
+    "id", "auction_item_id", "auction_item__title", "customer__username",
+    "qty", "condition", "merchant_price", "sold_price_total",
+    "start_datetime", "sold_datetime",
+]
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def line_writer(fields, fmt):
+    """Return the header lines and a function that turns one row into a line."""
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        return [writer.writerow(fields)], writer.writerow
+    return [], lambda row: json.dumps(dict(zip(fields, row)), default=str) + "\n"
+
+
+async def async_lines(header, line, rows):
+    for value in header:
+        yield value
+    # QuerySet.aiterator() runs values_list() queries in the event loop, so
+    # hand the sync iterator's chunks over instead
+    fetch = sync_to_async(lambda: list(islice(rows, CHUNK_SIZE)))
+    while chunk := await fetch():
+        for row in chunk:
+            yield line(row)
+
+
+def export_response(request, queryset, fields, fmt, filename):
+    rows = queryset.order_by("pk").values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+    header, line = line_writer(fields, fmt)
+    if isinstance(request, ASGIRequest):
+        lines = async_lines(header, line, rows)
+    else:
+        lines = chain(header, map(line, rows))
+    response = StreamingHttpResponse(lines, content_type=FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return response
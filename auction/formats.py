@@ -0,0 +1,285 @@
+"""
+Auction formats and batched settlement.
+
+Each ``AuctionItem.auction_format`` maps to a strategy object that names
+the item fields it needs (``required_fields``, checked by AuctionItemForm),
+decides whether an offer may be placed (``validate_offer``) and who wins once
+the item ends (``award``). Strategies work on plain ``Bid`` tuples so that
+settling an item is a computation over a list, not a query per offer.
+
+``settle_items()`` settles a batch of ended items at once: one query loads
+every submitted offer of the batch, the strategies pick the winners among
+the bids that fit the quantity left, and the results are written with a
+handful of bulk statements -- winning offers in one bulk_update, every other
+submitted offer rejected in one UPDATE, the items' remaining inventory in
+one bulk_update, AuctionResult rows in one bulk_create, sales stats bumped
+once per provider, category and day. bulk writes skip the Offer signals, so
+winners and watchers hear about it through the watch digest instead of one
+email per offer. ``manage.py settle_auctions`` and the lifecycle worker call
+it for items that have ended; a Dutch item is settled as soon as its first
+offer is confirmed.
+"""
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import categories, purchases, stats, watch
+from .models import AuctionItem, AuctionResult, DomainEvent, Offer
+
+BATCH_SIZE = 500
+
+Bid = namedtuple("Bid", "pk customer_id unit_price quantity submitted_at")
+Award = namedtuple("Award", "bid unit_price")
+
+
+def increment():
+    return Decimal(settings.PROXY_BID_INCREMENT)
+
+
+def bid_order(bid):
+    # highest price first, then the earliest offer
+    return (-bid.unit_price, bid.submitted_at, bid.pk)
+
+
+def check_quantity(item, offer):
+    if offer.offer_quantity > (item.quantity_available or 0):
+        raise ValidationError("Not enough quantity available for this offer.")
+
+
+class FixedPrice:
+    code = AuctionItem.FORMAT_FIXED
+    sealed = False
+    proxy_bidding = False
+    # settle as soon as an offer is confirmed instead of when the item ends
+    settles_on_offer = False
+    required_fields = ()
+
+    def current_price(self, item, now):
+        return item.unit_price
+
+    def validate_offer(self, item, offer, now):
+        pass
+
+    def award(self, item, bids):
+        # the provider picks an offer with accept_offer; nothing is awarded at the end
+        return None
+
+
+class English(FixedPrice):
+    code = AuctionItem.FORMAT_ENGLISH
+    proxy_bidding = True
+    # unit_price is the opening bid
+    required_fields = ("quantity_available", "unit_price")
+
+    def validate_offer(self, item, offer, now):
+        check_quantity(item, offer)
+        top = (
+            item.offers.filter(status=Offer.STATUS_SUBMITTED)
+            .order_by("-offer_unit_price")
+            .values_list("offer_unit_price", flat=True)
+            .first()
+        )
+        minimum = top + increment() if top is not None else item.unit_price
+        if minimum is not None and offer.offer_unit_price < minimum:
+            raise ValidationError(f"Offer at least ₹{minimum} per unit.")
+
+    def award(self, item, bids):
+        if not bids:
+            return None
+        best = min(bids, key=bid_order)
+        if item.reserve_price is not None and best.unit_price < item.reserve_price:
+            return None
+        return Award(best, best.unit_price)
+
+
+class SealedFirstPrice(English):
+    code = AuctionItem.FORMAT_SEALED_FIRST
+    sealed = True
+    proxy_bidding = False
+    required_fields = ("quantity_available",)
+
+    def validate_offer(self, item, offer, now):
+        check_quantity(item, offer)
+        placed = item.offers.filter(customer_id=offer.customer_id, status=Offer.STATUS_SUBMITTED)
+        if placed.exists():
+            raise ValidationError("Sealed-bid auctions take one offer per bidder.")
+
+
+class SealedSecondPrice(SealedFirstPrice):
+    code = AuctionItem.FORMAT_SEALED_SECOND
+
+    def award(self, item, bids):
+        if not bids:
+            return None
+        ranked = sorted(bids, key=bid_order)[:2]
+        best = ranked[0]
+        if item.reserve_price is not None and best.unit_price < item.reserve_price:
+            return None
+        if len(ranked) > 1:
+            price = ranked[1].unit_price
+        else:
+            price = item.reserve_price if item.reserve_price is not None else best.unit_price
+        if item.reserve_price is not None:
+            price = max(price, item.reserve_price)
+        return Award(best, price)
+
+
+class Dutch(FixedPrice):
+    code = AuctionItem.FORMAT_DUTCH
+    settles_on_offer = True
+    # unit_price is where the price starts falling from
+    required_fields = ("quantity_available", "unit_price", "price_drop_per_hour")
+
+    def current_price(self, item, now):
+        if item.unit_price is None:
+            return None
+        hours = Decimal(max((now - item.start_datetime) / timedelta(hours=1), 0))
+        price = item.unit_price - (item.price_drop_per_hour or 0) * hours
+        floor = item.reserve_price if item.reserve_price is not None else Decimal("0.01")
+        return max(price, floor).quantize(Decimal("0.01"))
+
+    def validate_offer(self, item, offer, now):
+        if item.offers.filter(status=Offer.STATUS_SUBMITTED).exists():
+            raise ValidationError("This item has already been taken.")
+        check_quantity(item, offer)
+        price = self.current_price(item, now)
+        if price is not None and offer.offer_unit_price < price:
+            raise ValidationError(f"The current price is ₹{price} per unit.")
+
+    def award(self, item, bids):
+        # the first offer at the falling price takes the item
+        if not bids:
+            return None
+        first = min(bids, key=lambda bid: (bid.submitted_at, bid.pk))
+        return Award(first, first.unit_price)
+
+
+FORMATS = {strategy.code: strategy for strategy in (
+    FixedPrice(), English(), SealedFirstPrice(), SealedSecondPrice(), Dutch(),
+)}
+
+
+def for_item(item):
+    return FORMATS.get(item.auction_format, FORMATS[AuctionItem.FORMAT_FIXED])
+
+
+def load_bids(item_ids):
+    bids = defaultdict(list)
+    offers = (
+        Offer.objects.filter(auction_item_id__in=item_ids, status=Offer.STATUS_SUBMITTED)
+        .values_list("pk", "auction_item_id", "customer_id", "offer_unit_price", "offer_quantity", "submitted_at")
+    )
+    for pk, item_id, customer_id, unit_price, quantity, submitted_at in offers.iterator(chunk_size=5000):
+        if unit_price is not None:
+            bids[item_id].append(Bid(pk, customer_id, unit_price, quantity, submitted_at or timezone.now()))
+    return bids
+
+
+def settle_items(item_ids, now=None):
+    """Award and close one batch of items; return the number of winners."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        items = list(
+            AuctionItem.objects.select_for_update()
+            .filter(pk__in=item_ids, settled_at__isnull=True)
+            .only("provider", "category", "unit_price", "quantity_available", "total_price", "condition",
+                  "start_datetime", "auction_format", "reserve_price", "price_drop_per_hour", "is_active")
+        )
+        if not items:
+            return 0
+        ids = [item.pk for item in items]
+        bids = load_bids(ids)
+        # items sold by the provider before they ended keep their result
+        sold = set(AuctionResult.objects.filter(auction_item_id__in=ids).values_list("auction_item_id", flat=True))
+
+        winners, results, awarded_to, events = [], [], {}, []
+        sales = defaultdict(lambda: [0, Decimal("0")])
+        for item in items:
+            if item.pk in sold:
+                continue
+            # a bid for more than is left cannot be filled; it loses with the rest
+            available = item.quantity_available or 0
+            award = for_item(item).award(item, [bid for bid in bids.get(item.pk, []) if bid.quantity <= available])
+            if award is None:
+                continue
+            total = award.unit_price * award.bid.quantity
+            winners.append(Offer(
+                pk=award.bid.pk, accepted=True, status=Offer.STATUS_ACCEPTED, accepted_at=now, offer_price=total,
+                updated_at=now,
+            ))
+            awarded_to[item.pk] = award.bid.customer_id
+            events.append(DomainEvent.build(
+                DomainEvent.OFFER_ACCEPTED, item.pk, winners[-1],
+                customer=award.bid.customer_id, quantity=award.bid.quantity, price_total=total,
+            ))
+            results.append(AuctionResult(
+                auction_item_id=item.pk,
+                provider_id=item.provider_id,
+                customer_id=award.bid.customer_id,
+                offer_quantity_id=award.bid.pk,
+                qty=award.bid.quantity,
+                condition=item.condition,
+                merchant_price=item.total_price or 0,
+                sold_price_total=total,
+                start_datetime=item.start_datetime,
+                sold_datetime=now,
+            ))
+            sale = sales[item.provider_id, item.category_id]
+            sale[0] += award.bid.quantity
+            sale[1] += total
+            item.quantity_available = available - award.bid.quantity
+            item.fill_total_price()
+
+        Offer.objects.bulk_update(
+            winners, ["accepted", "status", "accepted_at", "offer_price", "updated_at"], batch_size=BATCH_SIZE
+        )
+        # every offer still submitted on a settled item has lost
+        losers = Offer.objects.filter(auction_item_id__in=ids, status=Offer.STATUS_SUBMITTED)
+        events += [
+            DomainEvent.build(DomainEvent.OFFER_REJECTED, offer.auction_item_id, offer)
+            for offer in losers.only("auction_item", "customer")
+        ]
+        losers.update(status=Offer.STATUS_REJECTED, updated_at=now)
+        AuctionResult.objects.bulk_create(results, batch_size=BATCH_SIZE)
+
+        closed = Counter(item.category_id for item in items if item.is_active)
+        events += [DomainEvent.build(DomainEvent.AUCTION_CLOSED, item.pk, reason="ended") for item in items if item.is_active]
+        for item in items:
+            item.settled_at = item.updated_at = now
+            item.is_active = False
+        AuctionItem.objects.bulk_update(
+            items, ["quantity_available", "total_price", "settled_at", "is_active", "updated_at"], batch_size=BATCH_SIZE
+        )
+        DomainEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+        day = timezone.localdate(now)
+        for (provider_id, category_id), (quantity, total) in sales.items():
+            stats.bump(provider_id, category_id, day, accepted_quantity=quantity, revenue=total)
+        # bulk_update skips the category counter signals
+        for category_id, count in closed.items():
+            categories.adjust(category_id, -count)
+        watch.record_awards(awarded_to.items())
+        # bulk_create skips the AuctionResult signals too
+        purchases.forget_totals(*set(awarded_to.values()))
+    return len(winners)
+
+
+def settle_ended(batch_size=BATCH_SIZE, now=None):
+    """Settle every item that has ended; return (items settled, winners)."""
+    now = now or timezone.now()
+    settled = awarded = 0
+    while True:
+        ids = list(
+            AuctionItem.objects.filter(settled_at__isnull=True, ends_at__lte=now)
+            .order_by("ends_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return settled, awarded
+        awarded += settle_items(ids, now)
+        settled += len(ids)
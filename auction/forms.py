@@ -1,9 +1,11 @@
 from django import forms
 from django.forms import inlineformset_factory, BaseInlineFormSet
-from .models import AuctionItem,Offer, AuctionImage, AuctionVideo, Category
+from .models import AuctionItem,Offer, AuctionImage, AuctionVideo, Category, ItemImport, SavedSearch, ProxyBid
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm 
+from .formats import FORMATS
+from .watch import normalize_keyword
 
 
 class AuctionItemForm(forms.ModelForm):
@@ -21,11 +23,35 @@ class AuctionItemForm(forms.ModelForm):
         "condition",
         "start_datetime",
         "duration_days",
+        "soft_close",
+        "auction_format",
+        "reserve_price",
+        "price_drop_per_hour",
         ]
         widgets = {
         "start_datetime": forms.DateTimeInput(attrs={"type": "datetime-local"}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        auction_format = FORMATS.get(cleaned_data.get("auction_format"))
+        if auction_format is None:
+            return cleaned_data
+        for name in auction_format.required_fields:
+            if cleaned_data.get(name) in (None, "") and name not in self.errors:
+                self.add_error(name, "This auction format needs this field.")
+        unit_price = cleaned_data.get("unit_price")
+        reserve_price = cleaned_data.get("reserve_price")
+        drop = cleaned_data.get("price_drop_per_hour")
+        if "quantity_available" in auction_format.required_fields and cleaned_data.get("quantity_available") == 0:
+            self.add_error("quantity_available", "Quantity must be at least 1.")
+        if auction_format.code == AuctionItem.FORMAT_DUTCH:
+            if drop is not None and drop <= 0:
+                self.add_error("price_drop_per_hour", "The price must drop by more than 0 each hour.")
+            if unit_price is not None and reserve_price is not None and reserve_price > unit_price:
+                self.add_error("reserve_price", "The floor price cannot be above the starting unit price.")
+        return cleaned_data
+
     # def clean_unit_of_measure(self):
     #     unit_of_measure = self.cleaned_data.get("unit_of_measure")
     #     if not unit_of_measure:
@@ -33,6 +59,62 @@ class AuctionItemForm(forms.ModelForm):
     #     return unit_of_measure.strip()
 
 
+class CategoryLookupField(forms.Field):
+    # resolves a category id or name from a preloaded dict instead of one
+    # query per value like ModelChoiceField
+    def __init__(self, categories, **kwargs):
+        super().__init__(**kwargs)
+        self.categories = categories
+
+    def to_python(self, value):
+        value = str(value or "").strip()
+        if not value:
+            return None
+        category = self.categories.get(value) or self.categories.get(value.lower())
+        if category is None:
+            raise ValidationError("Unknown category.")
+        return category
+
+
+class ImportItemForm(AuctionItemForm):
+    """AuctionItemForm rules for one imported row."""
+
+    class Meta(AuctionItemForm.Meta):
+        fields = [f for f in AuctionItemForm.Meta.fields if f != "description_document"]
+
+    def __init__(self, *args, categories, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["category"] = CategoryLookupField(categories)
+        self.fields["auction_format"].required = False
+
+    def clean_auction_format(self):
+        return self.cleaned_data.get("auction_format") or AuctionItem.FORMAT_FIXED
+
+    def _get_validation_exclusions(self):
+        # the category was resolved from existing rows; skip the per-row FK query
+        exclude = super()._get_validation_exclusions()
+        exclude.add("category")
+        return exclude
+
+
+class ItemImportForm(forms.ModelForm):
+    class Meta:
+        model = ItemImport
+        fields = ["data_file", "images_zip"]
+
+    def clean_data_file(self):
+        data_file = self.cleaned_data["data_file"]
+        if not data_file.name.lower().endswith((".csv", ".jsonl")):
+            raise ValidationError("Upload a .csv or .jsonl file.")
+        return data_file
+
+    def clean_images_zip(self):
+        images_zip = self.cleaned_data.get("images_zip")
+        if images_zip and not images_zip.name.lower().endswith(".zip"):
+            raise ValidationError("Images must be uploaded as a .zip file.")
+        return images_zip
+
+
 class RequiredImageFormSet(BaseInlineFormSet):
     def clean(self):
         super().clean()
@@ -106,6 +188,45 @@ class OfferForm(forms.ModelForm):
         return price
 
 
+class ProxyBidForm(forms.ModelForm):
+    class Meta:
+        model = ProxyBid
+        fields = ["max_unit_price", "offer_quantity"]
+
+    def __init__(self, *args, item=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.item = item
+
+    def clean_max_unit_price(self):
+        price = self.cleaned_data["max_unit_price"]
+        if price <= 0:
+            raise ValidationError("Maximum unit price must be greater than 0.")
+        return price
+
+    def clean_offer_quantity(self):
+        # the engine places offers for this quantity, so hold it to what an offer may ask for
+        quantity = self.cleaned_data["offer_quantity"]
+        if quantity < 1:
+            raise ValidationError("Quantity must be at least 1.")
+        if self.item is not None and quantity > (self.item.quantity_available or 0):
+            raise ValidationError("Not enough quantity available for this offer.")
+        return quantity
+
+
+class SavedSearchForm(forms.ModelForm):
+    class Meta:
+        model = SavedSearch
+        fields = ["category", "keyword", "max_unit_price"]
+
+    def clean_keyword(self):
+        return normalize_keyword(self.cleaned_data.get("keyword"))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not (cleaned_data.get("category") or cleaned_data.get("keyword")):
+            raise ValidationError("Choose a category or enter a keyword.")
+        return cleaned_data
+
 
 class RegistrationForm(UserCreationForm):
     first_name = forms.CharField(max_length=30, required=True)
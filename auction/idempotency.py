@@ -0,0 +1,89 @@
+"""
+Idempotency keys for POSTs that must not run twice.
+
+Forms that trigger a write render ``{% idempotency_field %}``: a hidden
+input holding a fresh random key. ``idempotent`` claims that key by
+inserting an IdempotencyKey row before the view runs; the unique constraint
+lets exactly one request through, and the response it produced is stored on
+the row. A retry with the same key -- a double click, a browser resubmit, a
+client retrying after a dropped connection -- gets the stored response back
+without running the view again, so there is no second write and no second
+email. A retry that arrives while the first request is still running waits
+briefly for its result. Clients posting JSON send the key in an
+``Idempotency-Key`` header instead. POSTs without a key run as before.
+
+The row lives in the database rather than the cache so the claim holds
+across processes and survives cache evictions.
+"""
+import time
+import uuid
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBadRequest
+
+from .models import IdempotencyKey
+
+FIELD_NAME = "idempotency_key"
+WAIT_SECONDS = 5.0
+POLL_SECONDS = 0.1
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def store(record, response):
+    record.status_code = response.status_code
+    record.location = response.get("Location", "")[:500]
+    if not response.streaming and not record.location:
+        record.content_type = response.get("Content-Type", "")[:100]
+        record.content = response.content.decode(response.charset, errors="replace")
+    record.save(update_fields=["status_code", "location", "content_type", "content"])
+
+
+def replay(request, key):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is None:
+            # the first attempt failed and released the key
+            return HttpResponse("The earlier attempt failed. Please submit the form again.", status=409)
+        if record.path != request.path:
+            return HttpResponseBadRequest("This form was already submitted for a different action.")
+        if record.status_code is not None:
+            break
+        if time.monotonic() >= deadline:
+            response = HttpResponse("This request is still being processed.", status=409)
+            response["Retry-After"] = "1"
+            return response
+        time.sleep(POLL_SECONDS)
+
+    response = HttpResponse(record.content, status=record.status_code, content_type=record.content_type or None)
+    if record.location:
+        response["Location"] = record.location
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = ""
+        if request.method == "POST":
+            key = (request.POST.get(FIELD_NAME) or request.headers.get("Idempotency-Key", "")).strip()[:64]
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(user=request.user, key=key, path=request.path[:255])
+        except IntegrityError:
+            return replay(request, key)
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        store(record, response)
+        return response
+    return wrapper
@@ -0,0 +1,168 @@
+"""
+Bulk item import.
+
+An ItemImport is processed by ``manage.py process_item_imports``: rows are
+streamed from the uploaded CSV/JSONL file, validated one at a time with the
+AuctionItemForm rules, inserted with bulk_create in batches and, once all
+items exist, images are attached from the uploaded zip. Invalid rows are
+reported on the import instead of aborting it; anything else that goes
+wrong fails the import with the error recorded, so no job is left in
+PROCESSING.
+"""
+import csv
+import io
+import json
+import logging
+import zipfile
+from collections import Counter
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from . import categories, stats
+from .forms import ImportItemForm
+from .models import AuctionImage, AuctionItem, Category, ItemImport
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+
+def iter_rows(data_file):
+    data_file.open("rb")
+    text = io.TextIOWrapper(data_file, encoding="utf-8-sig", newline="")
+    try:
+        if data_file.name.lower().endswith(".jsonl"):
+            for line in text:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(text)
+    finally:
+        text.detach()
+        data_file.close()
+
+
+def claim_next():
+    for job_id in ItemImport.objects.filter(status=ItemImport.STATUS_PENDING).order_by("pk").values_list("pk", flat=True):
+        claimed = ItemImport.objects.filter(pk=job_id, status=ItemImport.STATUS_PENDING).update(
+            status=ItemImport.STATUS_PROCESSING
+        )
+        if claimed:
+            return ItemImport.objects.get(pk=job_id)
+    return None
+
+
+def process(job):
+    try:
+        return _process(job)
+    except Exception as exc:
+        logger.exception("Item import %s failed", job.pk)
+        job.status = ItemImport.STATUS_FAILED
+        job.errors = [*job.errors, {"row": None, "errors": {"__all__": [f"Import failed: {exc}"]}}]
+        job.finished_at = timezone.now()
+        job.save()
+        return job
+
+
+def _process(job):
+    lookup = {}
+    for category in Category.objects.all():
+        lookup[str(category.pk)] = category
+        lookup[category.name.lower()] = category
+
+    # kept on the job so process() can still report them if this fails
+    errors = job.errors = []
+    images = []
+    batch = []
+    listed = Counter()
+
+    def report(row_number, row_errors):
+        job.rows_failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "errors": row_errors})
+
+    def flush():
+        created = AuctionItem.objects.bulk_create([item for item, _ in batch])
+        for item, image_name in zip(created, (name for _, name in batch)):
+            listed[item.provider_id, item.category_id] += 1
+            if image_name:
+                images.append((item.pk, image_name))
+        job.rows_imported += len(created)
+        batch.clear()
+
+    try:
+        for row_number, row in enumerate(iter_rows(job.data_file), start=1):
+            job.rows_total += 1
+            form = ImportItemForm(data=row, categories=lookup)
+            if not form.is_valid():
+                report(row_number, {field: list(messages) for field, messages in form.errors.items()})
+                continue
+            item = form.save(commit=False)
+            item.provider = job.provider
+            item.fill_total_price()
+            item.fill_ends_at()
+            batch.append((item, (row.get("image") or "").strip()))
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+    except (UnicodeDecodeError, ValueError, csv.Error) as exc:
+        errors.append({"row": job.rows_total + 1, "errors": {"__all__": [f"Unreadable file: {exc}"]}})
+        job.status = ItemImport.STATUS_FAILED
+    except Exception as exc:
+        # the batches already inserted still get counted below
+        logger.exception("Item import %s failed at row %s", job.pk, job.rows_total)
+        errors.append({"row": job.rows_total, "errors": {"__all__": [f"Import failed: {exc}"]}})
+        job.status = ItemImport.STATUS_FAILED
+
+    today = timezone.localdate()
+    per_category = Counter()
+    for (provider_id, category_id), n in listed.items():
+        stats.bump(provider_id, category_id, today, items_listed=n)
+        per_category[category_id] += n
+    # bulk_create sends no post_save, so move the sidebar counters here
+    for category_id, n in per_category.items():
+        categories.adjust(category_id, n)
+
+    if images and job.images_zip:
+        job.images_attached = attach_images(job, images, errors)
+    elif images:
+        errors.append({"row": None, "errors": {"image": ["Rows name images but no zip was uploaded."]}})
+
+    if job.status != ItemImport.STATUS_FAILED:
+        job.status = ItemImport.STATUS_DONE
+    job.errors = errors
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def attach_images(job, images, errors):
+    attached = 0
+    job.images_zip.open("rb")
+    try:
+        with zipfile.ZipFile(job.images_zip) as archive:
+            members = {PurePosixPath(name).name: name for name in archive.namelist() if not name.endswith("/")}
+            pending = []
+            for item_id, image_name in images:
+                member = members.get(PurePosixPath(image_name).name)
+                if member is None:
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({"row": None, "errors": {"image": [f"{image_name} not found in zip."]}})
+                    continue
+                image = AuctionImage(auction_item_id=item_id)
+                image.image.save(PurePosixPath(member).name, ContentFile(archive.read(member)), save=False)
+                pending.append(image)
+                if len(pending) >= BATCH_SIZE:
+                    attached += len(AuctionImage.objects.bulk_create(pending))
+                    pending = []
+            if pending:
+                attached += len(AuctionImage.objects.bulk_create(pending))
+    except zipfile.BadZipFile:
+        errors.append({"row": None, "errors": {"images_zip": ["The images file is not a valid zip."]}})
+    finally:
+        job.images_zip.close()
+    return attached
@@ -0,0 +1,53 @@
+"""
+Keyset ("cursor") pagination for long, newest-first histories.
+
+OFFSET pagination makes the database walk and discard every row before the
+requested page, so page 400 of a buyer's offers costs 400 pages of work and
+rows shift between pages as new ones arrive. A keyset page instead starts
+strictly after the last row of the previous page: ``(created_at, pk)`` of
+that row is packed into an opaque cursor, and the next page is a range scan
+from there on an index ending in ``created_at``. Every page costs the same
+regardless of how deep it is.
+"""
+import base64
+from collections import namedtuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+Page = namedtuple("Page", "rows next_cursor")
+
+
+def encode(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode(cursor):
+    """Return (created_at, pk) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split("|")
+        created_at, pk = parse_datetime(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+def page(queryset, cursor, size, field="created_at", descending=True):
+    """Return the page of ``queryset`` after ``cursor``, newest first unless ``descending`` is False."""
+    position = decode(cursor)
+    after, sign = ("lt", "-") if descending else ("gt", "")
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f"{field}__{after}": value}) | Q(**{field: value, f"pk__{after}": pk}))
+    rows = list(queryset.order_by(f"{sign}{field}", f"{sign}pk")[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode(getattr(rows[-1], field), rows[-1].pk)
+    return Page(rows, next_cursor)
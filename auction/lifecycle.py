@@ -0,0 +1,147 @@
+"""
+Auction end times: soft-close extensions and the closing worker.
+
+On soft-close items an offer in the final SOFT_CLOSE_WINDOW_MINUTES pushes
+``ends_at`` to one window after the offer. ``extend_soft_close()`` does this
+with a single conditional UPDATE that only ever moves ``ends_at`` forward,
+so concurrent offers cannot shorten each other's extension and nothing has
+to be rescheduled when it happens. ``AuctionItem.save()`` never writes
+``extended_until`` and recomputes ``ends_at`` from the stored value, so an
+item loaded before an extension cannot roll it back.
+
+``manage.py run_auction_lifecycle`` closes items when they end. It loads the
+items ending within a horizon through the (is_active, ends_at) index into a
+``TimerWheel`` -- one bucket per tick -- and on each tick settles everything
+due in that bucket as one batch (see auction/formats.py). Items that were
+extended since they were scheduled are simply not due yet and are put back
+in the bucket for their new end, so thousands of items closing together cost
+a few queries per tick rather than a polling job each.
+"""
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import formats
+from .models import AuctionItem, DomainEvent
+
+
+def window():
+    return timedelta(minutes=settings.SOFT_CLOSE_WINDOW_MINUTES)
+
+
+def extend_soft_close(item, now=None):
+    """Extend ``item`` if an offer at ``now`` falls in its final window; return the new end or None."""
+    now = now or timezone.now()
+    new_end = now + window()
+    extended = AuctionItem.objects.filter(
+        pk=item.pk, soft_close=True, is_active=True, ends_at__gt=now, ends_at__lt=new_end,
+    ).update(ends_at=new_end, extended_until=new_end, updated_at=now)
+    if not extended:
+        return None
+    DomainEvent.record(DomainEvent.AUCTION_EXTENDED, item.pk, ends_at=new_end)
+    item.ends_at = item.extended_until = new_end
+    return new_end
+
+
+class TimerWheel:
+    """Buckets item ids by the tick they end in, ``slots`` ticks ahead at most."""
+
+    def __init__(self, tick_seconds=1.0, slots=3600, now=None):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.buckets = [set() for _ in range(slots)]
+        self.scheduled = {}
+        # the next tick to fire; anything already due goes in this bucket
+        self.current = self.tick_for(now or timezone.now())
+
+    def tick_for(self, when):
+        return math.ceil(when.timestamp() / self.tick_seconds)
+
+    @property
+    def horizon(self):
+        return timedelta(seconds=self.tick_seconds * (self.slots - 1))
+
+    def add(self, pk, when):
+        tick = max(self.tick_for(when), self.current)
+        if tick - self.current >= self.slots:
+            return False
+        if self.scheduled.get(pk) == tick:
+            return True
+        # an earlier entry for this id is left in its bucket and skipped there
+        self.scheduled[pk] = tick
+        self.buckets[tick % self.slots].add(pk)
+        return True
+
+    def advance(self, now):
+        """Return the ids due in every tick from the last call up to ``now``."""
+        target = self.tick_for(now)
+        due = []
+        while self.current <= target:
+            bucket = self.buckets[self.current % self.slots]
+            for pk in bucket:
+                if self.scheduled.get(pk) == self.current:
+                    del self.scheduled[pk]
+                    due.append(pk)
+            bucket.clear()
+            self.current += 1
+        return due
+
+    def __len__(self):
+        return len(self.scheduled)
+
+
+def load_ending(wheel, now):
+    """Schedule the active items ending before the wheel's horizon; return how many were read."""
+    ending = AuctionItem.objects.filter(is_active=True, ends_at__lte=now + wheel.horizon)
+    rows = ending.order_by("ends_at").values_list("pk", "ends_at")
+    count = 0
+    for pk, ends_at in rows.iterator(chunk_size=2000):
+        wheel.add(pk, ends_at)
+        count += 1
+    return count
+
+
+def close_due(wheel, pks, now):
+    """Settle the items in ``pks`` that have ended; reschedule the extended ones. Return closed count."""
+    if not pks:
+        return 0
+    with transaction.atomic():
+        rows = list(
+            AuctionItem.objects.select_for_update()
+            .filter(pk__in=pks, is_active=True)
+            .values_list("pk", "ends_at")
+        )
+        ended = [pk for pk, ends_at in rows if ends_at <= now]
+        for pk, ends_at in rows:
+            if ends_at > now:
+                wheel.add(pk, ends_at)
+        if ended:
+            formats.settle_items(ended, now)
+    return len(ended)
+
+
+def run(tick_seconds=1.0, slots=3600, rescan_seconds=60, loop=False, stdout=None):
+    """Close ended items; with ``loop`` keep ticking until interrupted. Return the total closed."""
+    wheel = TimerWheel(tick_seconds, slots)
+    # picks up items listed or edited since the last scan; extensions need no rescan
+    rescan_every = timedelta(seconds=rescan_seconds)
+    next_scan = None
+    total = 0
+    while True:
+        now = timezone.now()
+        if next_scan is None or now >= next_scan:
+            load_ending(wheel, now)
+            next_scan = now + rescan_every
+        due = wheel.advance(now)
+        for start in range(0, len(due), 500):
+            closed = close_due(wheel, due[start:start + 500], now)
+            total += closed
+            if closed and stdout is not None:
+                stdout.write(f"Closed {closed} auction(s).")
+        if not loop:
+            return total
+        time.sleep(tick_seconds)
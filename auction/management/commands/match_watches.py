@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auction.watch import BATCH_SIZE, match_new_items
+
+
+class Command(BaseCommand):
+    help = "Match newly listed items against saved searches and queue digest notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new items.")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            read = match_new_items(options["batch_size"])
+            total += read
+            if read:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(f"Matched {total} new item(s).")
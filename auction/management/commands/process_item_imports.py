@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auction.imports import claim_next, process
+
+
+class Command(BaseCommand):
+    help = "Process pending bulk item imports: insert the rows and attach their images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new imports.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next()
+            if job is None:
+                if not options["loop"]:
+                    return
+                time.sleep(options["interval"])
+                continue
+            process(job)
+            self.stdout.write(
+                f"Import {job.pk}: {job.rows_imported}/{job.rows_total} row(s) imported, "
+                f"{job.rows_failed} failed, {job.images_attached} image(s) attached."
+            )
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auction.models import Offer
+
+
+class Command(BaseCommand):
+    help = "Delete draft offers that were never confirmed, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=settings.DRAFT_OFFER_TTL_HOURS,
+                            help="Delete drafts older than this many hours.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        stale = Offer.objects.filter(status=Offer.STATUS_DRAFT, created_at__lt=cutoff)
+        deleted = 0
+        while True:
+            # short batches keep each delete's lock time small
+            batch = list(stale.values_list("pk", flat=True)[:options["batch_size"]])
+            if not batch:
+                break
+            deleted += Offer.objects.filter(pk__in=batch).delete()[1].get("auction.Offer", 0)
+        self.stdout.write(f"Deleted {deleted} stale draft offer(s).")
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auction.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored POST results whose retry window has passed, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=settings.IDEMPOTENCY_KEY_TTL_HOURS,
+                            help="Delete keys older than this many hours.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        stale = IdempotencyKey.objects.filter(created_at__lt=cutoff)
+        deleted = 0
+        while True:
+            batch = list(stale.values_list("pk", flat=True)[:options["batch_size"]])
+            if not batch:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(f"Deleted {deleted} expired idempotency key(s).")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auction.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the provider sales statistics table from items and offers."
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(f"Rebuilt {rows} provider sales stat row(s).")
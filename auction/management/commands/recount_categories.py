@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auction.categories import recount
+
+
+class Command(BaseCommand):
+    help = "Recompute each category's active item count from the items table."
+
+    def handle(self, *args, **options):
+        changed = recount()
+        self.stdout.write(f"Corrected {changed} category count(s).")
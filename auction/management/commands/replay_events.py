@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auction.events import CHUNK_SIZE, project_pending, replay
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item-state projection from the domain event log, or apply only new events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pending", action="store_true", help="Apply only events appended since the last run.")
+        parser.add_argument("--loop", action="store_true", help="With --pending, keep applying new events.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if not options["pending"]:
+            events, items = replay(options["chunk_size"])
+            self.stdout.write(f"Replayed {events} event(s) into {items} item state(s).")
+            return
+        while True:
+            applied = project_pending(options["chunk_size"])
+            if applied:
+                self.stdout.write(f"Applied {applied} event(s).")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
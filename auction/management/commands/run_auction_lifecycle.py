@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from auction.lifecycle import run
+
+
+class Command(BaseCommand):
+    help = "Close auctions when they end, honouring soft-close extensions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running and close auctions as they end.")
+        parser.add_argument("--tick", type=float, default=1.0, help="Seconds per timer wheel slot.")
+        parser.add_argument("--slots", type=int, default=3600, help="Timer wheel slots; tick x slots is the look-ahead.")
+        parser.add_argument("--rescan", type=float, default=60.0, help="Seconds between scans for newly ending items.")
+
+    def handle(self, *args, **options):
+        closed = run(
+            tick_seconds=options["tick"],
+            slots=options["slots"],
+            rescan_seconds=options["rescan"],
+            loop=options["loop"],
+            stdout=self.stdout,
+        )
+        self.stdout.write(f"Closed {closed} auction(s) in total.")
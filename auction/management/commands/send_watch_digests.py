@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auction.watch import send_digests
+
+
+class Command(BaseCommand):
+    help = "Email each user one digest of their queued watchlist and saved-search updates."
+
+    def handle(self, *args, **options):
+        sent = send_digests()
+        self.stdout.write(f"Sent {sent} digest email(s).")
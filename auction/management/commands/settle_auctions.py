@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from auction.formats import BATCH_SIZE, settle_ended
+
+
+class Command(BaseCommand):
+    help = "Settle ended auctions: pick each item's winner by its format and close it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        settled, awarded = settle_ended(options["batch_size"])
+        self.stdout.write(f"Settled {settled} auction(s), {awarded} with a winner.")
@@ -0,0 +1,27 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database onto each replica file (local stand-in for replication)."
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError("sync_replicas only handles SQLite; use the database's own replication.")
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured; set DB_REPLICAS.")
+
+        # back up through the open connection so an in-memory test database works too
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"Synced {alias} from the primary.")
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0013_offer_status_offer_submitted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offer',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProviderSalesStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('items_listed', models.PositiveIntegerField(default=0)),
+                ('offers_received', models.PositiveIntegerField(default=0)),
+                ('accepted_quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_stats', to='auction.category')),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_stats', to='auction.provider')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('provider', 'category', 'day'), name='unique_provider_category_day')],
+            },
+        ),
+    ]
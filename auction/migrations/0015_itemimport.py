@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0014_offer_accepted_at_providersalesstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_file', models.FileField(help_text='CSV or JSON Lines file, one item per row', upload_to='auction/imports/')),
+                ('images_zip', models.FileField(blank=True, help_text="Optional zip with the images named in the 'image' column", null=True, upload_to='auction/imports/')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=12)),
+                ('rows_total', models.PositiveIntegerField(default=0)),
+                ('rows_imported', models.PositiveIntegerField(default=0)),
+                ('rows_failed', models.PositiveIntegerField(default=0)),
+                ('images_attached', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_imports', to='auction.provider')),
+            ],
+        ),
+    ]
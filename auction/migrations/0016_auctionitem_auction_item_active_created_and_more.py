@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0015_itemimport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auctionitem',
+            index=models.Index(fields=['is_active', 'created_at'], name='auction_item_active_created'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionitem',
+            index=models.Index(fields=['created_at'], name='auction_item_created'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionresult',
+            index=models.Index(fields=['sold_datetime'], name='auction_result_sold'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['status', 'created_at'], name='offer_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['created_at'], name='offer_created'),
+        ),
+    ]
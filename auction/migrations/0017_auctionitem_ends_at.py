@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:38
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_ends_at(apps, schema_editor):
+    AuctionItem = apps.get_model('auction', 'AuctionItem')
+    batch = []
+    for item in AuctionItem.objects.only('start_datetime', 'duration_days').iterator(chunk_size=2000):
+        item.ends_at = item.start_datetime + timedelta(days=item.duration_days or 0)
+        batch.append(item)
+        if len(batch) == 2000:
+            AuctionItem.objects.bulk_update(batch, ['ends_at'])
+            batch = []
+    AuctionItem.objects.bulk_update(batch, ['ends_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0016_auctionitem_auction_item_active_created_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionitem',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_ends_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auctionitem',
+            index=models.Index(fields=['is_active', 'ends_at'], name='auction_item_active_ends'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:40
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_active_item_count(apps, schema_editor):
+    Category = apps.get_model('auction', 'Category')
+    active = Count('auction_items', filter=Q(auction_items__is_active=True))
+    for category in Category.objects.annotate(active=active).iterator():
+        Category.objects.filter(pk=category.pk).update(active_item_count=category.active)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0017_auctionitem_ends_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_active_item_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auctionitem',
+            index=models.Index(fields=['category', 'is_active', 'created_at'], name='auction_item_category_active'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0019_watchlist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProxyBid',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_unit_price', models.DecimalField(decimal_places=2, help_text='Highest price per unit you are willing to bid', max_digits=10)),
+                ('offer_quantity', models.PositiveIntegerField(default=1)),
+                ('is_active', models.BooleanField(default=True)),
+                ('placed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('auction_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proxy_bids', to='auction.auctionitem')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proxy_bids', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='proxy_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='offers', to='auction.proxybid'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['auction_item', 'status', 'offer_unit_price'], name='offer_item_status_price'),
+        ),
+        migrations.AddIndex(
+            model_name='proxybid',
+            index=models.Index(fields=['auction_item', 'is_active'], name='proxy_bid_item_active'),
+        ),
+        migrations.AddConstraint(
+            model_name='proxybid',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('auction_item', 'customer'), name='one_active_proxy_bid'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0020_proxybid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionitem',
+            name='extended_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='auctionitem',
+            name='soft_close',
+            field=models.BooleanField(default=False, help_text='Extend the auction when offers arrive in its final minutes'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0021_auctionitem_soft_close'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionitem',
+            name='auction_format',
+            field=models.CharField(choices=[('FIXED', 'Fixed price'), ('ENGLISH', 'English (ascending)'), ('SEALED_FIRST', 'Sealed bid, first price'), ('SEALED_SECOND', 'Sealed bid, second price'), ('DUTCH', 'Dutch (descending)')], default='FIXED', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='auctionitem',
+            name='price_drop_per_hour',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Dutch auctions: how much the unit price falls each hour', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='auctionitem',
+            name='reserve_price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Lowest unit price you will sell at (the floor for Dutch auctions)', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='auctionitem',
+            name='settled_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='auctionitem',
+            index=models.Index(fields=['settled_at', 'ends_at'], name='auction_item_unsettled'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:55
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_events(apps, schema_editor):
+    # seed the log from existing rows so replays start from the full history
+    Offer = apps.get_model('auction', 'Offer')
+    AuctionItem = apps.get_model('auction', 'AuctionItem')
+    DomainEvent = apps.get_model('auction', 'DomainEvent')
+    batch = []
+
+    def add(**fields):
+        batch.append(DomainEvent(**fields))
+        if len(batch) >= 1000:
+            DomainEvent.objects.bulk_create(batch)
+            batch.clear()
+
+    offers = Offer.objects.filter(submitted_at__isnull=False).order_by('submitted_at', 'pk')
+    for offer in offers.iterator(chunk_size=2000):
+        add(kind='OFFER_SUBMITTED', item_id=offer.auction_item_id, offer_id=offer.pk, occurred_at=offer.submitted_at,
+            data={'customer': offer.customer_id, 'unit_price': str(offer.offer_unit_price), 'quantity': offer.offer_quantity})
+    for offer in offers.filter(status='WITHDRAWN').iterator(chunk_size=2000):
+        add(kind='OFFER_WITHDRAWN', item_id=offer.auction_item_id, offer_id=offer.pk, occurred_at=offer.submitted_at,
+            data={'customer': offer.customer_id})
+    for offer in Offer.objects.filter(accepted=True).order_by('pk').iterator(chunk_size=2000):
+        add(kind='OFFER_ACCEPTED', item_id=offer.auction_item_id, offer_id=offer.pk,
+            occurred_at=offer.accepted_at or offer.submitted_at or offer.created_at,
+            data={'customer': offer.customer_id, 'quantity': offer.offer_quantity, 'price_total': str(offer.offer_price)})
+    now = timezone.now()
+    for item_id in AuctionItem.objects.filter(is_active=False).order_by('pk').values_list('pk', flat=True).iterator():
+        add(kind='AUCTION_CLOSED', item_id=item_id, occurred_at=now, data={'reason': 'before-event-log'})
+    DomainEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0022_auction_formats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemState',
+            fields=[
+                ('item_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('offers_submitted', models.PositiveIntegerField(default=0)),
+                ('offers_withdrawn', models.PositiveIntegerField(default=0)),
+                ('high_unit_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('accepted_quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('buyer_id', models.BigIntegerField(blank=True, null=True)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('close_reason', models.CharField(blank=True, max_length=20)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DomainEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('OFFER_SUBMITTED', 'Offer submitted'), ('OFFER_WITHDRAWN', 'Offer withdrawn'), ('OFFER_ACCEPTED', 'Offer accepted'), ('AUCTION_EXTENDED', 'Auction extended'), ('AUCTION_CLOSED', 'Auction closed')], max_length=20)),
+                ('item_id', models.BigIntegerField()),
+                ('offer_id', models.BigIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item_id', 'id'], name='domain_event_item')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
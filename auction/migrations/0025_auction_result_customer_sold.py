@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0024_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auctionresult',
+            index=models.Index(fields=['customer', 'sold_datetime'], name='auction_result_customer_sold'),
+        ),
+    ]
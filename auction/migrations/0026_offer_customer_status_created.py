@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0025_auction_result_customer_sold'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['customer', 'status', 'created_at'], name='offer_customer_status_created'),
+        ),
+    ]
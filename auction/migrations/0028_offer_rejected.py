@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0027_row_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='domainevent',
+            name='kind',
+            field=models.CharField(choices=[('OFFER_SUBMITTED', 'Offer submitted'), ('OFFER_WITHDRAWN', 'Offer withdrawn'), ('OFFER_ACCEPTED', 'Offer accepted'), ('OFFER_REJECTED', 'Offer rejected'), ('AUCTION_EXTENDED', 'Auction extended'), ('AUCTION_CLOSED', 'Auction closed')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='offer',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('SUBMITTED', 'Submitted'), ('ACCEPTED', 'Accepted'), ('WITHDRAWN', 'Withdrawn'), ('REJECTED', 'Rejected')], default='DRAFT', max_length=12),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:20
+
+from django.db import migrations
+
+
+def mark_accepted(apps, schema_editor):
+    # offers accepted from the dashboard used to keep their SUBMITTED status
+    Offer = apps.get_model('auction', 'Offer')
+    Offer.objects.filter(accepted=True, status='SUBMITTED').update(status='ACCEPTED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0028_offer_rejected'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_accepted, migrations.RunPython.noop),
+    ]
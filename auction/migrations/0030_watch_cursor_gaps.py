@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0029_accepted_offer_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchcursor',
+            name='gaps',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
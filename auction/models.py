@@ -1,7 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from urllib.parse import urlparse, parse_qs
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
@@ -29,6 +29,8 @@ class Category(models.Model):
     name = models.CharField(max_length=50, unique=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+    # kept current by auction.categories
+    active_item_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -45,6 +47,20 @@ class AuctionItem(models.Model):
     ("USED", "USED"),
     ]
 
+    FORMAT_FIXED = "FIXED"
+    FORMAT_ENGLISH = "ENGLISH"
+    FORMAT_SEALED_FIRST = "SEALED_FIRST"
+    FORMAT_SEALED_SECOND = "SEALED_SECOND"
+    FORMAT_DUTCH = "DUTCH"
+
+    FORMAT_CHOICES = [
+    (FORMAT_FIXED, "Fixed price"),
+    (FORMAT_ENGLISH, "English (ascending)"),
+    (FORMAT_SEALED_FIRST, "Sealed bid, first price"),
+    (FORMAT_SEALED_SECOND, "Sealed bid, second price"),
+    (FORMAT_DUTCH, "Dutch (descending)"),
+    ]
+
     provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name="auction_items")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="auction_items")
     title = models.CharField(max_length=200, help_text="Title of the auction item", blank=True, null=True)
@@ -90,6 +106,23 @@ class AuctionItem(models.Model):
     choices=CONDITION_CHOICES,
     default="NEW"
     )
+
+    # see auction/formats.py for how each format takes offers and settles
+    auction_format = models.CharField(max_length=16, choices=FORMAT_CHOICES, default=FORMAT_FIXED)
+    reserve_price = models.DecimalField(
+    max_digits=10,
+    decimal_places=2,
+    blank=True,
+    null=True,
+    help_text="Lowest unit price you will sell at (the floor for Dutch auctions)"
+    )
+    price_drop_per_hour = models.DecimalField(
+    max_digits=10,
+    decimal_places=2,
+    blank=True,
+    null=True,
+    help_text="Dutch auctions: how much the unit price falls each hour"
+    )
    
     start_datetime = models.DateTimeField(
     help_text="ITEM AUCTION Starting DATE & TIME"
@@ -104,8 +137,28 @@ class AuctionItem(models.Model):
     help_text="If False, auction is considered closed/terminated by provider."
     )
     is_cloased = models.BooleanField(default=False)
+    soft_close = models.BooleanField(
+    default=False,
+    help_text="Extend the auction when offers arrive in its final minutes"
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # row version for API ETags; bulk updates set it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
+    # start_datetime + duration_days, stored so listings can sort and filter on it
+    ends_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # latest soft-close extension; ends_at never moves back before it
+    extended_until = models.DateTimeField(null=True, blank=True, editable=False)
+    settled_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "created_at"], name="auction_item_active_created"),
+            models.Index(fields=["created_at"], name="auction_item_created"),
+            models.Index(fields=["is_active", "ends_at"], name="auction_item_active_ends"),
+            models.Index(fields=["category", "is_active", "created_at"], name="auction_item_category_active"),
+            models.Index(fields=["settled_at", "ends_at"], name="auction_item_unsettled"),
+        ]
     
     # adjust total price when quantity or unit price changes
     def calc_total_for_quantity(self, qty: int) -> Decimal:
@@ -113,14 +166,42 @@ class AuctionItem(models.Model):
             qty = 1
         return self.unit_price * Decimal(qty)
     
-    def save(self, *args, **kwargs):
+    def fill_total_price(self):
         if self.quantity_available is not None and self.unit_price is not None:
             self.total_price = self.quantity_available * self.unit_price
-        super().save(*args, **kwargs)
+
+    def fill_ends_at(self):
+        if self.start_datetime is not None:
+            self.ends_at = self.start_datetime + timedelta(days=self.duration_days or 0)
+            if self.extended_until is not None and self.extended_until > self.ends_at:
+                self.ends_at = self.extended_until
+
+    def save(self, *args, **kwargs):
+        self.fill_total_price()
+        if self._state.adding:
+            self.fill_ends_at()
+            return super().save(*args, **kwargs)
+
+        # extended_until is only written by lifecycle.extend_soft_close(); a
+        # copy loaded before an extension must not write back the old end
+        update_fields = kwargs.pop("update_fields", None)
+        if update_fields is None:
+            update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+        update_fields = {*update_fields, "updated_at"} - {"ends_at", "extended_until"}
+        with transaction.atomic():
+            if {"start_datetime", "duration_days"} & update_fields:
+                self.extended_until = (
+                    AuctionItem.objects.select_for_update().values_list("extended_until", flat=True).get(pk=self.pk)
+                )
+                self.fill_ends_at()
+                update_fields.add("ends_at")
+            super().save(*args, update_fields=update_fields, **kwargs)
 
     # TIME ENDS = start + duration
     @property
     def end_datetime(self):
+        if self.ends_at is not None:
+            return self.ends_at
         duration = self.duration_days or 0
         return self.start_datetime + timedelta(days=duration)
 
@@ -224,18 +305,21 @@ class Offer(models.Model):
     STATUS_SUBMITTED = "SUBMITTED"
     STATUS_ACCEPTED = "ACCEPTED"
     STATUS_WITHDRAWN = "WITHDRAWN"
+    STATUS_REJECTED = "REJECTED"
 
     STATUS_CHOICES = [
         (STATUS_DRAFT, "Draft"),
         (STATUS_SUBMITTED, "Submitted"),
         (STATUS_ACCEPTED, "Accepted"),
         (STATUS_WITHDRAWN, "Withdrawn"),
+        (STATUS_REJECTED, "Rejected"),
     ]
 
     auction_item = models.ForeignKey(AuctionItem, on_delete=models.CASCADE, related_name="offers")
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="offers")
     offer_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     offer_quantity = models.PositiveIntegerField(default=1, help_text="Quantity customer wants to buy")
     offer_unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, help_text="Offer price per unit")
@@ -244,6 +328,18 @@ class Offer(models.Model):
 
     status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_DRAFT)
     submitted_at = models.DateTimeField(null=True, blank=True)
+    accepted_at = models.DateTimeField(null=True, blank=True)
+
+    # set when the bid was placed by the proxy-bidding engine
+    proxy_bid = models.ForeignKey("ProxyBid", on_delete=models.SET_NULL, null=True, blank=True, related_name="offers")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="offer_status_created"),
+            models.Index(fields=["created_at"], name="offer_created"),
+            models.Index(fields=["auction_item", "status", "offer_unit_price"], name="offer_item_status_price"),
+            models.Index(fields=["customer", "status", "created_at"], name="offer_customer_status_created"),
+        ]
 
     def submit(self):
         if self.status != self.STATUS_DRAFT:
@@ -258,6 +354,8 @@ class Offer(models.Model):
 
         if self.offer_unit_price is not None:
             self.offer_price = Decimal(self.offer_unit_price) * self.offer_quantity
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
         super().save(*args, **kwargs)
 
     def accept(self):
@@ -266,7 +364,12 @@ class Offer(models.Model):
             return
         
         self.accepted = True
-        self.save(update_fields=["accepted"])
+        self.status = self.STATUS_ACCEPTED
+        self.save(update_fields=["accepted", "status"])
+        DomainEvent.record(
+            DomainEvent.OFFER_ACCEPTED, item.pk, self,
+            quantity=self.offer_quantity, price_total=self.offer_price,
+        )
 
         item.quantity_sold = item.quantity_sold + self.offer_quantity
         item.save(update_fields=["quantity_sold"])
@@ -276,6 +379,34 @@ class Offer(models.Model):
         return f"Offer {self.offer_price} on {self.auction_item} by {self.customer}"
 
 
+class ProxyBid(models.Model):
+
+    auction_item = models.ForeignKey(AuctionItem, on_delete=models.CASCADE, related_name="proxy_bids")
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="proxy_bids")
+    max_unit_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Highest price per unit you are willing to bid")
+    offer_quantity = models.PositiveIntegerField(default=1)
+    is_active = models.BooleanField(default=True)
+
+    # ties between equal maximums go to the earlier one
+    placed_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["auction_item", "customer"],
+                condition=models.Q(is_active=True),
+                name="one_active_proxy_bid",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["auction_item", "is_active"], name="proxy_bid_item_active"),
+        ]
+
+    def __str__(self):
+        return f"Proxy bid up to {self.max_unit_price} on {self.auction_item} by {self.customer}"
+
+
 class AuctionResult(models.Model):
 
     auction_item = models.OneToOneField(AuctionItem, on_delete=models.CASCADE, related_name="result")
@@ -292,14 +423,243 @@ class AuctionResult(models.Model):
 
     start_datetime = models.DateTimeField()
     sold_datetime = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
 
     # shipped_delivered = models.BooleanField(default=False)
     # received_accepted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["sold_datetime"], name="auction_result_sold"),
+            models.Index(fields=["customer", "sold_datetime"], name="auction_result_customer_sold"),
+        ]
+
     def __str__(self):
         return self.auction_item.title
 
 
+class ItemImport(models.Model):
+
+    STATUS_PENDING = "PENDING"
+    STATUS_PROCESSING = "PROCESSING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name="item_imports")
+    data_file = models.FileField(upload_to="auction/imports/", help_text="CSV or JSON Lines file, one item per row")
+    images_zip = models.FileField(upload_to="auction/imports/", blank=True, null=True,
+    help_text="Optional zip with the images named in the 'image' column"
+    )
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    images_attached = models.PositiveIntegerField(default=0)
+    # [{"row": 12, "errors": {"unit_price": ["..."]}}, ...]
+    errors = models.JSONField(default=list, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import {self.pk} by {self.provider}"
+
+
+class WatchedItem(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="watched_items")
+    auction_item = models.ForeignKey(AuctionItem, on_delete=models.CASCADE, related_name="watchers")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "auction_item"], name="unique_watch_per_item"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} watches {self.auction_item}"
+
+
+class SavedSearch(models.Model):
+    # an item matches when every criterion that is set matches
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="saved_searches")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name="saved_searches")
+    keyword = models.CharField(max_length=50, blank=True, db_index=True,
+    help_text="A single word that must appear in the title or description"
+    )
+    max_unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        parts = [self.category.name if self.category_id else "Any category"]
+        if self.keyword:
+            parts.append(f'"{self.keyword}"')
+        if self.max_unit_price is not None:
+            parts.append(f"up to ₹{self.max_unit_price}")
+        return ", ".join(parts)
+
+
+class WatchNotification(models.Model):
+
+    KIND_NEW_ITEM = "NEW_ITEM"
+    KIND_NEW_OFFER = "NEW_OFFER"
+    KIND_OFFER_ACCEPTED = "OFFER_ACCEPTED"
+
+    KIND_CHOICES = [
+        (KIND_NEW_ITEM, "New matching item"),
+        (KIND_NEW_OFFER, "New offer"),
+        (KIND_OFFER_ACCEPTED, "Offer accepted"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="watch_notifications")
+    auction_item = models.ForeignKey(AuctionItem, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # set once the notification went out in a digest
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sent_at", "user"], name="watch_notification_unsent"),
+        ]
+
+
+class WatchCursor(models.Model):
+    # how far a background matcher has read, e.g. the last item id matched
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    # ids below position not seen yet, with when they were first missed
+    gaps = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class DomainEvent(models.Model):
+    # append-only log of offer and auction state changes; see auction/events.py
+
+    OFFER_SUBMITTED = "OFFER_SUBMITTED"
+    OFFER_WITHDRAWN = "OFFER_WITHDRAWN"
+    OFFER_ACCEPTED = "OFFER_ACCEPTED"
+    OFFER_REJECTED = "OFFER_REJECTED"
+    AUCTION_EXTENDED = "AUCTION_EXTENDED"
+    AUCTION_CLOSED = "AUCTION_CLOSED"
+
+    KIND_CHOICES = [
+        (OFFER_SUBMITTED, "Offer submitted"),
+        (OFFER_WITHDRAWN, "Offer withdrawn"),
+        (OFFER_ACCEPTED, "Offer accepted"),
+        (OFFER_REJECTED, "Offer rejected"),
+        (AUCTION_EXTENDED, "Auction extended"),
+        (AUCTION_CLOSED, "Auction closed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # plain ids rather than foreign keys so history outlives deleted rows
+    item_id = models.BigIntegerField()
+    offer_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["item_id", "id"], name="domain_event_item"),
+        ]
+
+    @classmethod
+    def build(cls, kind, item_id, offer=None, **data):
+        if offer is not None:
+            data.setdefault("customer", offer.customer_id)
+        for key, value in data.items():
+            if isinstance(value, Decimal):
+                data[key] = str(value)
+            elif isinstance(value, datetime):
+                data[key] = value.isoformat()
+        return cls(kind=kind, item_id=item_id, offer_id=offer.pk if offer is not None else None, data=data)
+
+    @classmethod
+    def record(cls, kind, item_id, offer=None, **data):
+        event = cls.build(kind, item_id, offer, **data)
+        event.save()
+        return event
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Domain events are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Domain events are append-only.")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} on item {self.item_id}"
+
+
+class ItemState(models.Model):
+    # projection of DomainEvent per item, rebuilt by manage.py replay_events
+    item_id = models.BigIntegerField(primary_key=True)
+    offers_submitted = models.PositiveIntegerField(default=0)
+    offers_withdrawn = models.PositiveIntegerField(default=0)
+    high_unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    accepted_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    buyer_id = models.BigIntegerField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    close_reason = models.CharField(max_length=20, blank=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"State of item {self.item_id} @ event {self.last_event_id}"
+
+
+class IdempotencyKey(models.Model):
+    # the stored outcome of a POST, replayed when the same form token is sent again
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    key = models.CharField(max_length=64)
+    path = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    location = models.CharField(max_length=500, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    content = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'pending'})"
+
+
+class ProviderSalesStat(models.Model):
+    # one row per provider/category/day, kept current by auction.stats
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name="sales_stats")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="sales_stats")
+    day = models.DateField()
+
+    items_listed = models.PositiveIntegerField(default=0)
+    offers_received = models.PositiveIntegerField(default=0)
+    accepted_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "category", "day"], name="unique_provider_category_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} / {self.category} / {self.day}"
+
+
 
 @receiver(pre_save, sender=Offer)
 def send_email_when_offer_is_accepted(sender, instance, **kwargs):
@@ -368,6 +728,7 @@ def create_result_when_offer_is_accepted(sender, instance, created, **kwargs):
     if item.is_active:
         item.is_active = False
         item.save(update_fields=['is_active'])
+        DomainEvent.record(DomainEvent.AUCTION_CLOSED, item.pk, reason="sold")
 
     item.quantity_available -= 1
     if item.quantity_available <= 0:
@@ -0,0 +1,94 @@
+"""
+Proxy (automatic) bidding for ascending auctions.
+
+A buyer registers a maximum unit price as a ``ProxyBid`` and the engine bids
+for them. Every new bid on an item -- a proxy placed or raised, or a manual
+offer confirmed -- runs ``resolve()`` once, inside the transaction that holds
+the item row lock. The item's active proxies are loaded into a max-heap keyed
+by maximum price and placement time; the leader is popped and priced one
+increment over the next maximum or the best competing offer, capped at its
+own maximum. Only that resulting bid is written as an Offer row, and the
+proxies it outbids are deactivated in one UPDATE, so the heap for an item
+rarely holds more than the current leader and the newcomer.
+"""
+import heapq
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import lifecycle, stats, watch
+from .formats import increment
+from .models import AuctionItem, DomainEvent, Offer, ProxyBid, WatchNotification
+
+
+def place(item, customer, max_unit_price, quantity=1):
+    """Create or raise the customer's proxy on ``item`` and resolve; return (proxy, offer)."""
+    with transaction.atomic():
+        item = AuctionItem.objects.select_for_update().get(pk=item.pk)
+        proxy = ProxyBid.objects.filter(auction_item=item, customer=customer, is_active=True).first()
+        if proxy is None:
+            proxy = ProxyBid(auction_item=item, customer=customer)
+        if proxy.max_unit_price != max_unit_price:
+            proxy.placed_at = timezone.now()
+        proxy.max_unit_price = max_unit_price
+        proxy.offer_quantity = quantity
+        proxy.save()
+        offer = resolve(item)
+        if offer is not None:
+            lifecycle.extend_soft_close(item)
+        proxy.refresh_from_db(fields=["is_active"])
+    return proxy, offer
+
+
+def resolve(item):
+    """Settle the active proxies on a locked item; return the Offer placed, if any."""
+    heap = [(-proxy.max_unit_price, proxy.placed_at, proxy.pk, proxy)
+            for proxy in item.proxy_bids.filter(is_active=True)]
+    if not heap:
+        return None
+    heapq.heapify(heap)
+    leader = heapq.heappop(heap)[-1]
+    outbid = [entry[2] for entry in heap]
+
+    top = (
+        item.offers.filter(status=Offer.STATUS_SUBMITTED)
+        .order_by("-offer_unit_price", "created_at")
+        .only("customer", "offer_unit_price")
+        .first()
+    )
+    rivals = [-heap[0][0]] if heap else []
+    if top is not None and top.customer_id != leader.customer_id:
+        if top.offer_unit_price >= leader.max_unit_price:
+            # an earlier offer at or above every maximum; no proxy can beat it
+            ProxyBid.objects.filter(pk__in=outbid + [leader.pk]).update(is_active=False)
+            return None
+        rivals.append(top.offer_unit_price)
+
+    if rivals:
+        price = max(rivals) + increment()
+    else:
+        price = item.unit_price or increment()
+    price = min(price, leader.max_unit_price)
+
+    if outbid:
+        ProxyBid.objects.filter(pk__in=outbid).update(is_active=False)
+    if top is not None and top.customer_id == leader.customer_id and top.offer_unit_price >= price:
+        return None
+
+    offer = Offer(
+        auction_item=item,
+        customer_id=leader.customer_id,
+        proxy_bid=leader,
+        offer_unit_price=price,
+        offer_quantity=leader.offer_quantity,
+        status=Offer.STATUS_SUBMITTED,
+        submitted_at=timezone.now(),
+    )
+    offer.save()
+    DomainEvent.record(
+        DomainEvent.OFFER_SUBMITTED, item.pk, offer,
+        unit_price=price, quantity=offer.offer_quantity, proxy=True,
+    )
+    stats.record_offer_received(offer)
+    watch.record_offer_activity(offer, WatchNotification.KIND_NEW_OFFER)
+    return offer
@@ -0,0 +1,67 @@
+"""
+Buyer purchase history totals.
+
+The customer dashboard shows spend per month and per category. Both come
+from one grouped SQL aggregate over the buyer's AuctionResult rows, rolled
+up in Python and cached per buyer until one of their results is created,
+changed or deleted. Results written with bulk_create (batched settlement)
+skip the signals below, so that path calls ``forget_totals()`` itself.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AuctionResult
+
+
+def _totals_key(user_id):
+    return f"auction:spend-totals:{user_id}"
+
+
+def spend_totals(user):
+    key = _totals_key(user.pk)
+    result = cache.get(key)
+    if result is None:
+        result = _compute(user)
+        cache.set(key, result)
+    return result
+
+
+def _compute(user):
+    rows = (
+        AuctionResult.objects.filter(customer=user)
+        .values(month=TruncMonth("sold_datetime"), category=F("auction_item__category__name"))
+        .annotate(spent=Sum("sold_price_total"), purchases=Count("pk"))
+        .order_by("-month", "category")
+    )
+    by_month, by_category = OrderedDict(), {}
+    total, purchases = Decimal("0"), 0
+    for row in rows:
+        month = by_month.setdefault(row["month"], {"month": row["month"], "spent": Decimal("0"), "purchases": 0})
+        category = by_category.setdefault(row["category"], {"category": row["category"], "spent": Decimal("0"), "purchases": 0})
+        for bucket in (month, category):
+            bucket["spent"] += row["spent"]
+            bucket["purchases"] += row["purchases"]
+        total += row["spent"]
+        purchases += row["purchases"]
+    return {
+        "total": total,
+        "purchases": purchases,
+        "by_month": list(by_month.values()),
+        "by_category": sorted(by_category.values(), key=lambda row: -row["spent"]),
+    }
+
+
+def forget_totals(*user_ids):
+    cache.delete_many([_totals_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=AuctionResult)
+@receiver(post_delete, sender=AuctionResult)
+def invalidate_spend_totals(sender, instance, **kwargs):
+    forget_totals(instance.customer_id)
@@ -0,0 +1,153 @@
+"""
+Rate limiting with sliding-window counters.
+
+Each bucket in ``settings.RATE_LIMITS`` allows ``capacity`` requests in any
+window of ``capacity / per_minute`` minutes, so a burst of ``capacity`` is
+accepted and the long-run rate is ``per_minute``. Requests are counted per
+fixed window, and a request is weighed against the count of the current
+window plus the previous window's count scaled by how much of it still
+overlaps the sliding window ending now. Unlike plain fixed windows, a
+client cannot spend a full burst at the end of one window and another at
+the start of the next. A request over the limit is answered with 429 and
+not counted, with Retry-After set to when the sliding window has room again.
+
+The count for a key and window is taken with ``cache.add`` then
+``cache.incr`` (and given back with ``cache.decr``), so concurrent requests
+never spend the same slot. The increment is atomic on memcached and Redis
+and, within one process, on locmem. Limits are shared between workers only
+when the cache is: with the default locmem cache each process counts on its
+own, and the file cache increments with a read and a write. While the cache
+is unreachable the counters fall back to a per-process dict.
+"""
+import logging
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# key -> {window number: count}, for when the cache cannot be used
+_local = {}
+_local_lock = threading.Lock()
+
+
+class Bucket:
+
+    def __init__(self, name, capacity, per_minute):
+        self.name = name
+        self.capacity = capacity
+        self.rate = per_minute / 60
+
+    @property
+    def window(self):
+        return self.capacity / self.rate
+
+    def take(self, key):
+        """Count a request for ``key``; return 0, or the seconds until it would be allowed."""
+        now = time.time()
+        # windows are numbered rather than keyed by start time, which a float window would blur
+        index = math.floor(now / self.window)
+        elapsed = now - index * self.window
+        key = f"ratelimit:{self.name}:{key}"
+        previous, current, shared = _hit(key, index, self.window)
+        if previous * (1 - elapsed / self.window) + current <= self.capacity:
+            return 0
+        _release(key, index, shared)
+        return self.wait(previous, current - 1, elapsed)
+
+    def wait(self, previous, current, elapsed):
+        """Seconds until one more request fits, given the counts of the previous and current window."""
+        room = self.capacity - current - 1
+        if room >= 0:
+            # the previous window's weight has to fall to the room left
+            return self.window * (1 - room / previous) - elapsed
+        # the current window is full: wait for it to become the previous one and fade enough
+        return self.window - elapsed + self.window * (1 - (self.capacity - 1) / current)
+
+
+def _hit(key, index, window):
+    """Add one to the count of ``key`` in window number ``index``;
+    return (count of the window before, new count, whether the cache holds them)."""
+    try:
+        previous = cache.get(f"{key}:{index - 1}", 0)
+        for _ in range(2):
+            # kept through the next window, which weighs it
+            cache.add(f"{key}:{index}", 0, math.ceil(2 * window))
+            try:
+                return previous, cache.incr(f"{key}:{index}"), True
+            except ValueError:
+                # the counter was evicted between add and incr
+                continue
+        logger.warning("Rate limit counter %s keeps disappearing, using in-process counters", key)
+    except Exception:
+        logger.warning("Rate limit cache unavailable, using in-process counters", exc_info=True)
+    with _local_lock:
+        windows = _local.setdefault(key, {})
+        for old in [number for number in windows if number < index - 1]:
+            del windows[old]
+        windows[index] = windows.get(index, 0) + 1
+        return windows.get(index - 1, 0), windows[index], False
+
+
+def _release(key, index, shared):
+    """Give back a request counted by _hit() that was refused."""
+    if shared:
+        try:
+            cache.decr(f"{key}:{index}")
+        except Exception:
+            # an expired or unreachable counter has nothing left to give back
+            pass
+        return
+    with _local_lock:
+        windows = _local.get(key, {})
+        if windows.get(index):
+            windows[index] -= 1
+
+
+def bucket(name):
+    capacity, per_minute = settings.RATE_LIMITS[name]
+    return Bucket(name, capacity, per_minute)
+
+
+def by_user(request, *args, **kwargs):
+    return request.user.pk if request.user.is_authenticated else None
+
+
+def by_ip(request, *args, **kwargs):
+    return request.META.get("REMOTE_ADDR")
+
+
+def by_username(request, *args, **kwargs):
+    return request.POST.get("username", "").strip().lower() or None
+
+
+def by_url_kwarg(name):
+    def key(request, *args, **kwargs):
+        return kwargs.get(name)
+    return key
+
+
+def rate_limit(*rules, methods=("POST",)):
+    """Limit a view with ``(bucket name, key function)`` rules; a rule whose
+    key is None does not apply to the request."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                for name, key_func in rules:
+                    key = key_func(request, *args, **kwargs)
+                    if key is None:
+                        continue
+                    wait = bucket(name).take(key)
+                    if wait:
+                        response = HttpResponse("Too many requests, please slow down.", status=429)
+                        response["Retry-After"] = str(math.ceil(wait))
+                        return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
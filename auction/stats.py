@@ -0,0 +1,112 @@
+"""
+Incrementally maintained provider sales statistics.
+
+Each event adds to one ProviderSalesStat row with an F() update, so the
+provider dashboard reads a handful of pre-aggregated rows instead of
+scanning the provider's offers and results. ``rebuild()`` recomputes the
+whole table from source rows (manage.py rebuild_provider_stats).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import AuctionItem, Offer, ProviderSalesStat
+
+COUNTERS = ("items_listed", "offers_received", "accepted_quantity", "revenue")
+
+
+def bump(provider_id, category_id, day, **deltas):
+    lookup = {"provider_id": provider_id, "category_id": category_id, "day": day}
+    changes = {name: F(name) + value for name, value in deltas.items()}
+    if ProviderSalesStat.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ProviderSalesStat.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # another request created the row first
+        ProviderSalesStat.objects.filter(**lookup).update(**changes)
+
+
+def record_item_listed(item):
+    bump(item.provider_id, item.category_id, timezone.localdate(item.created_at), items_listed=1)
+
+
+def record_offer_received(offer):
+    item = offer.auction_item
+    day = timezone.localdate(offer.submitted_at or timezone.now())
+    bump(item.provider_id, item.category_id, day, offers_received=1)
+
+
+def record_acceptance(offer):
+    item = offer.auction_item
+    day = timezone.localdate(offer.accepted_at or timezone.now())
+    bump(
+        item.provider_id, item.category_id, day,
+        accepted_quantity=offer.offer_quantity,
+        revenue=offer.offer_price,
+    )
+
+
+def summary(provider, since):
+    return (
+        ProviderSalesStat.objects.filter(provider=provider, day__gte=since)
+        .values("category__name")
+        .annotate(
+            items_listed=Sum("items_listed"),
+            offers_received=Sum("offers_received"),
+            accepted_quantity=Sum("accepted_quantity"),
+            revenue=Sum("revenue"),
+        )
+        .order_by("category__name")
+    )
+
+
+def rebuild():
+    rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    items = (
+        AuctionItem.objects.annotate(day=TruncDate("created_at"))
+        .values("provider_id", "category_id", "day")
+        .annotate(n=Count("pk"))
+    )
+    for row in items.iterator():
+        rows[row["provider_id"], row["category_id"], row["day"]]["items_listed"] = row["n"]
+
+    offer_base = Offer.objects.values(
+        provider_id=F("auction_item__provider_id"), category_id=F("auction_item__category_id"),
+    )
+    received = (
+        offer_base.filter(submitted_at__isnull=False)
+        .annotate(day=TruncDate("submitted_at"))
+        .values("provider_id", "category_id", "day")
+        .annotate(n=Count("pk"))
+    )
+    for row in received.iterator():
+        rows[row["provider_id"], row["category_id"], row["day"]]["offers_received"] = row["n"]
+
+    accepted = (
+        offer_base.filter(accepted=True)
+        .annotate(day=TruncDate(Coalesce("accepted_at", "submitted_at", "created_at")))
+        .values("provider_id", "category_id", "day")
+        .annotate(qty=Sum("offer_quantity"), revenue=Sum("offer_price"))
+    )
+    for row in accepted.iterator():
+        stat = rows[row["provider_id"], row["category_id"], row["day"]]
+        stat["accepted_quantity"] = row["qty"] or 0
+        stat["revenue"] = row["revenue"] or Decimal("0")
+
+    with transaction.atomic():
+        ProviderSalesStat.objects.all().delete()
+        ProviderSalesStat.objects.bulk_create(
+            [
+                ProviderSalesStat(provider_id=provider_id, category_id=category_id, day=day, **counters)
+                for (provider_id, category_id, day), counters in rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
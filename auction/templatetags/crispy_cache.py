@@ -0,0 +1,50 @@
+"""
+``{{ form|crispy_cached }}``: crispy rendering cached per form class.
+
+crispy renders a form by walking a template per field, and for the unbound
+forms most pages show, the output depends only on the form class and the
+state of its fields. The HTML is cached under a fingerprint of the class and
+of every field (value, label, help text, widget and its attrs, choices), so
+any change to them produces a new key rather than a stale hit. Bound forms,
+the ones that can carry errors, and formsets render uncached.
+"""
+import hashlib
+
+from crispy_forms.templatetags.crispy_forms_filters import as_crispy_form
+from crispy_forms.utils import TEMPLATE_PACK
+from django import forms, template
+from django.core.cache import cache
+from django.forms.widgets import ChoiceWidget
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+TIMEOUT = 24 * 60 * 60
+
+
+def fingerprint(form):
+    form_class = type(form)
+    parts = [form_class.__module__, form_class.__qualname__, form.prefix, form.auto_id, form.label_suffix]
+    for bound_field in form:
+        field = bound_field.field
+        parts += [
+            bound_field.html_name, bound_field.value(), bound_field.label, field.help_text, field.required,
+            field.disabled, type(field.widget).__name__, sorted(field.widget.attrs.items()),
+        ]
+        # only widgets that print their options; a formset's hidden pk field
+        # would otherwise load and label every existing row
+        if isinstance(field, forms.ChoiceField) and isinstance(field.widget, ChoiceWidget):
+            parts.append([(str(value), str(label)) for value, label in field.choices])
+    return hashlib.sha1("\x1f".join(map(str, parts)).encode()).hexdigest()
+
+
+@register.filter
+def crispy_cached(form, template_pack=TEMPLATE_PACK):
+    if not isinstance(form, forms.BaseForm) or form.is_bound:
+        return as_crispy_form(form, template_pack)
+    key = f"crispy:{template_pack}:{fingerprint(form)}"
+    html = cache.get(key)
+    if html is None:
+        html = str(as_crispy_form(form, template_pack))
+        cache.set(key, html, TIMEOUT)
+    return mark_safe(html)
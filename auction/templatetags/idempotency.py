@@ -0,0 +1,11 @@
+from django import template
+from django.utils.html import format_html
+
+from auction.idempotency import FIELD_NAME, new_key
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_field():
+    return format_html('<input type="hidden" name="{}" value="{}">', FIELD_NAME, new_key())
@@ -1,3 +1,1043 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from main_site.paginator import EstimatedCountPaginator
+
+from . import (
+    categories, events, exports, formats, imports, keyset, lifecycle, proxy, purchases, ratelimit, stats, watch,
+)
+from .forms import AuctionItemForm, ProxyBidForm
+from .models import (
+    AuctionItem, AuctionResult, Category, DomainEvent, IdempotencyKey, ItemImport, ItemState, Offer, Provider,
+    ProviderSalesStat, ProxyBid, WatchCursor, WatchNotification,
+)
+from .templatetags import crispy_cache
+
+
+class AuctionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user("seller", password="pw")
+        self.provider = Provider.objects.create(user=self.seller, display_name="Seller")
+        self.item = AuctionItem.objects.create(
+            provider=self.provider, category=Category.objects.create(name="Tools"), title="Drill",
+            short_description="Drill", unit_price=10, quantity_available=5, start_datetime=timezone.now(),
+        )
+        self.buyer = User.objects.create_user("buyer", password="pw")
+
+    def submitted_offer(self, quantity=2):
+        offer = Offer.objects.create(auction_item=self.item, customer=self.buyer, offer_quantity=quantity)
+        offer.submit()
+        return offer
+
+
+class BulkAcceptTests(AuctionTestCase):
+
+    def bulk(self, *actions):
+        return self.client.post(
+            reverse("provider_bulk_actions"), json.dumps({"actions": list(actions)}), content_type="application/json",
+        )
+
+    def test_offer_accepted_from_dashboard_is_not_accepted_again(self):
+        offer = self.submitted_offer()
+        self.client.force_login(self.seller)
+        self.client.post(reverse("accept_offer", args=[self.item.pk, offer.pk]))
+        offer.refresh_from_db()
+        self.assertEqual(offer.status, Offer.STATUS_ACCEPTED)
+
+        response = self.bulk({"action": "accept", "offer": offer.pk})
+
+        self.assertFalse(response.json()["results"][0]["ok"])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_available, 3)
+
+    def test_accepted_offer_left_submitted_is_refused(self):
+        offer = self.submitted_offer()
+        Offer.objects.filter(pk=offer.pk).update(accepted=True)
+        self.client.force_login(self.seller)
+
+        response = self.bulk({"action": "accept", "offer": offer.pk})
+
+        self.assertEqual(response.json()["results"][0]["error"], "This offer has already been accepted.")
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_available, 5)
+
+
+class IdempotencyTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.offer = self.submitted_offer()
+        self.client.force_login(self.seller)
+
+    def accept(self, offer, key="key-1"):
+        return self.client.post(reverse("accept_offer", args=[self.item.pk, offer.pk]), {"idempotency_key": key})
+
+    def quantity(self):
+        return AuctionItem.objects.values_list("quantity_available", flat=True).get(pk=self.item.pk)
+
+    def test_retry_with_the_same_key_replays_the_stored_response(self):
+        first = self.accept(self.offer)
+        retry = self.accept(self.offer)
+
+        self.assertEqual((retry.status_code, retry["Location"]), (first.status_code, first["Location"]))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(self.quantity(), 3)
+        self.assertEqual(DomainEvent.objects.filter(kind=DomainEvent.OFFER_ACCEPTED).count(), 1)
+
+    def test_key_reused_for_a_different_action_is_refused(self):
+        other = self.submitted_offer(quantity=1)
+        self.accept(self.offer)
+
+        response = self.accept(other)
+
+        self.assertEqual(response.status_code, 400)
+        other.refresh_from_db()
+        self.assertFalse(other.accepted)
+
+    def test_key_is_released_when_the_view_fails(self):
+        with mock.patch("auction.views.watch.record_offer_activity", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.accept(self.offer)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.quantity(), 5)
+
+        response = self.accept(self.offer)
+
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(self.quantity(), 3)
+
+
+class KeysetTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # five offers, three of them sharing one created_at
+        self.offers = [self.submitted_offer(quantity=1) for _ in range(5)]
+        moment = timezone.now()
+        Offer.objects.filter(pk__in=[offer.pk for offer in self.offers[1:4]]).update(created_at=moment)
+        Offer.objects.filter(pk=self.offers[4].pk).update(created_at=moment + timedelta(seconds=1))
+        Offer.objects.create(auction_item=self.item, customer=self.buyer, offer_quantity=1)  # a draft
+
+    def test_cursor_round_trip(self):
+        created_at = timezone.now()
+
+        self.assertEqual(keyset.decode(keyset.encode(created_at, 42)), (created_at, 42))
+        for cursor in ("", "not a cursor", keyset.encode(created_at, 42)[:-3]):
+            self.assertIsNone(keyset.decode(cursor))
+
+    def test_pages_walk_ties_on_created_at_without_skipping_or_repeating(self):
+        expected = [self.offers[4].pk, self.offers[3].pk, self.offers[2].pk, self.offers[1].pk, self.offers[0].pk]
+        self.client.force_login(self.buyer)
+        seen, cursor = [], None
+
+        with mock.patch("auction.views.MY_OFFERS_PER_PAGE", 2):
+            for _ in range(3):
+                response = self.client.get(reverse("my_offers"), {"after": cursor} if cursor else {})
+                seen += [offer.pk for offer in response.context["offers"]]
+                cursor = response.context["next_cursor"]
+
+        self.assertEqual(seen, expected)
+        self.assertIsNone(cursor)
+
+
+class StatsTests(AuctionTestCase):
+
+    def counters(self):
+        return list(
+            ProviderSalesStat.objects.order_by("provider_id", "category_id", "day")
+            .values("provider_id", "category_id", "day", *stats.COUNTERS)
+        )
+
+    def test_bump_that_loses_the_insert_race_adds_to_the_winning_row(self):
+        day = timezone.localdate()
+        real_update = QuerySet.update
+        calls = []
+
+        def update(queryset, **changes):
+            calls.append(changes)
+            if len(calls) == 1:
+                # another request inserts the row between our update and our insert
+                ProviderSalesStat.objects.create(
+                    provider=self.provider, category=self.item.category, day=day, offers_received=1,
+                )
+                return 0
+            return real_update(queryset, **changes)
+
+        with mock.patch.object(QuerySet, "update", autospec=True, side_effect=update):
+            stats.bump(self.provider.pk, self.item.category_id, day, offers_received=1)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(ProviderSalesStat.objects.get().offers_received, 2)
+
+    def test_rebuild_matches_the_incremental_counters(self):
+        stats.record_item_listed(self.item)
+        offers = [self.submitted_offer(quantity) for quantity in (2, 1)]
+        for offer in offers:
+            stats.record_offer_received(offer)
+        self.client.force_login(self.seller)
+        self.client.post(reverse("accept_offer", args=[self.item.pk, offers[0].pk]))
+        incremental = self.counters()
+
+        self.assertEqual(stats.rebuild(), 1)
+
+        self.assertEqual(self.counters(), incremental)
+        self.assertEqual(
+            [(row["items_listed"], row["offers_received"], row["accepted_quantity"]) for row in incremental],
+            [(1, 2, 2)],
+        )
+
+
+class CategoryCountTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.garden = Category.objects.create(name="Garden")
+
+    def counts(self):
+        return dict(Category.objects.values_list("name", "active_item_count"))
+
+    def test_counts_follow_moves_closes_and_deletes(self):
+        self.assertEqual(self.counts(), {"Tools": 1, "Garden": 0})
+
+        self.item.category = self.garden
+        self.item.save()
+        self.assertEqual(self.counts(), {"Tools": 0, "Garden": 1})
+
+        self.item.is_active = False
+        self.item.save()
+        self.assertEqual(self.counts(), {"Tools": 0, "Garden": 0})
+
+        # moving a closed item and reopening it counts it once, in its new category
+        self.item.category = Category.objects.get(name="Tools")
+        self.item.save()
+        self.item.is_active = True
+        self.item.save()
+        self.assertEqual(self.counts(), {"Tools": 1, "Garden": 0})
+
+        AuctionItem.objects.get(pk=self.item.pk).delete()
+        self.assertEqual(self.counts(), {"Tools": 0, "Garden": 0})
+        self.assertEqual(categories.recount(), 0)
+
+    def test_settling_an_item_releases_its_count(self):
+        AuctionItem.objects.filter(pk=self.item.pk).update(ends_at=timezone.now() - timedelta(minutes=1))
+
+        formats.settle_items([self.item.pk])
+
+        self.assertEqual(self.counts()["Tools"], 0)
+        self.assertEqual(categories.recount(), 0)
+
+    def test_recount_repairs_drift(self):
+        Category.objects.filter(name="Tools").update(active_item_count=7)
+
+        self.assertEqual(categories.recount(), 1)
+        self.assertEqual(self.counts(), {"Tools": 1, "Garden": 0})
+
+
+class AdminChangeListTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser("admin", password="pw"))
+
+    def changelist_queries(self, model_name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f"admin:auction_{model_name}_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_change_list_queries_do_not_grow_with_the_rows(self):
+        self.submitted_offer()
+        one_row = self.changelist_queries("offer")
+
+        for number in range(10):
+            Offer.objects.create(
+                auction_item=self.item, offer_quantity=1,
+                customer=User.objects.create_user(f"bidder{number}", password="pw"),
+            )
+
+        self.assertEqual(self.changelist_queries("offer"), one_row)
+
+    def test_large_tables_are_counted_from_the_planner_estimate(self):
+        self.submitted_offer()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute("DELETE FROM sqlite_stat1 WHERE tbl = %s", [Offer._meta.db_table])
+            cursor.execute(
+                "INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (%s, NULL, '250000')", [Offer._meta.db_table],
+            )
+
+        self.assertEqual(EstimatedCountPaginator(Offer.objects.order_by("pk"), 100).count, 250000)
+        # filtered lists have no estimate and small ones are counted exactly
+        self.assertEqual(EstimatedCountPaginator(Offer.objects.filter(offer_quantity=2).order_by("pk"), 100).count, 1)
+        self.assertEqual(EstimatedCountPaginator(AuctionItem.objects.order_by("pk"), 100).count, 1)
+
+
+class FormatTestCase(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rival = User.objects.create_user("rival", password="pw")
+        self.placed = 0
+
+    def use_format(self, auction_format, **fields):
+        AuctionItem.objects.filter(pk=self.item.pk).update(auction_format=auction_format, **fields)
+        self.item.refresh_from_db()
+        return formats.for_item(self.item)
+
+    def bid(self, unit_price, quantity=1, customer=None):
+        # each bid is placed a minute after the one before
+        self.placed += 1
+        return Offer.objects.create(
+            auction_item=self.item, customer=customer or self.buyer, offer_unit_price=Decimal(unit_price),
+            offer_quantity=quantity, status=Offer.STATUS_SUBMITTED,
+            submitted_at=self.item.start_datetime + timedelta(minutes=self.placed),
+        )
+
+    def draft(self, unit_price, quantity=1, customer=None):
+        return Offer(
+            auction_item=self.item, customer=customer or self.buyer, offer_unit_price=Decimal(unit_price),
+            offer_quantity=quantity,
+        )
+
+    def award(self):
+        return formats.for_item(self.item).award(self.item, formats.load_bids([self.item.pk])[self.item.pk])
+
+
+class FormatValidationTests(FormatTestCase):
+
+    def test_english_offers_start_at_the_opening_price_and_beat_the_top_by_an_increment(self):
+        english = self.use_format(AuctionItem.FORMAT_ENGLISH)
+        now = timezone.now()
+
+        with self.assertRaises(ValidationError):
+            english.validate_offer(self.item, self.draft("9.99"), now)
+        english.validate_offer(self.item, self.draft("10"), now)
+        self.bid("12", customer=self.rival)
+        with self.assertRaises(ValidationError):
+            english.validate_offer(self.item, self.draft("12.50"), now)
+        english.validate_offer(self.item, self.draft("13"), now)
+
+    def test_offers_for_more_than_is_available_are_refused(self):
+        for auction_format in (AuctionItem.FORMAT_ENGLISH, AuctionItem.FORMAT_SEALED_SECOND, AuctionItem.FORMAT_DUTCH):
+            strategy = self.use_format(auction_format, price_drop_per_hour=1)
+            with self.subTest(auction_format), self.assertRaises(ValidationError):
+                strategy.validate_offer(self.item, self.draft("50", quantity=6), timezone.now())
+
+    def test_sealed_auctions_take_one_offer_per_bidder(self):
+        sealed = self.use_format(AuctionItem.FORMAT_SEALED_FIRST)
+        self.bid("5")
+
+        with self.assertRaises(ValidationError):
+            sealed.validate_offer(self.item, self.draft("20"), timezone.now())
+        sealed.validate_offer(self.item, self.draft("4", customer=self.rival), timezone.now())
+
+    def test_dutch_price_falls_to_the_floor(self):
+        dutch = self.use_format(AuctionItem.FORMAT_DUTCH, price_drop_per_hour=2, reserve_price=5)
+        start = self.item.start_datetime
+
+        self.assertEqual(dutch.current_price(self.item, start + timedelta(hours=1)), Decimal("8.00"))
+        self.assertEqual(dutch.current_price(self.item, start + timedelta(hours=10)), Decimal("5.00"))
+        with self.assertRaises(ValidationError):
+            dutch.validate_offer(self.item, self.draft("7.99"), start + timedelta(hours=1))
+        dutch.validate_offer(self.item, self.draft("8"), start + timedelta(hours=1))
+
+
+class FormatAwardTests(FormatTestCase):
+
+    def test_english_awards_the_highest_bid_at_its_own_price(self):
+        self.use_format(AuctionItem.FORMAT_ENGLISH)
+        self.bid("12", customer=self.rival)
+        best = self.bid("15")
+
+        award = self.award()
+
+        self.assertEqual((award.bid.pk, award.unit_price), (best.pk, Decimal("15")))
+
+    def test_equal_bids_go_to_the_earlier_one(self):
+        self.use_format(AuctionItem.FORMAT_SEALED_FIRST)
+        first = self.bid("15", customer=self.rival)
+        self.bid("15")
+
+        self.assertEqual(self.award().bid.pk, first.pk)
+
+    def test_nothing_is_awarded_below_the_reserve(self):
+        self.use_format(AuctionItem.FORMAT_ENGLISH, reserve_price=20)
+        self.bid("15")
+
+        self.assertIsNone(self.award())
+
+    def test_second_price_pays_the_runner_up(self):
+        self.use_format(AuctionItem.FORMAT_SEALED_SECOND)
+        best = self.bid("30")
+        self.bid("18", customer=self.rival)
+
+        award = self.award()
+
+        self.assertEqual((award.bid.pk, award.unit_price), (best.pk, Decimal("18")))
+
+    def test_second_price_never_pays_below_the_reserve(self):
+        self.use_format(AuctionItem.FORMAT_SEALED_SECOND, reserve_price=25)
+        self.bid("30")
+        self.bid("18", customer=self.rival)
+
+        self.assertEqual(self.award().unit_price, Decimal("25"))
+
+    def test_a_lone_second_price_bid_pays_the_reserve(self):
+        self.use_format(AuctionItem.FORMAT_SEALED_SECOND, reserve_price=12)
+        self.bid("30")
+
+        self.assertEqual(self.award().unit_price, Decimal("12"))
+
+    def test_dutch_awards_the_first_offer(self):
+        self.use_format(AuctionItem.FORMAT_DUTCH, price_drop_per_hour=1)
+        first = self.bid("8")
+        self.bid("9", customer=self.rival)
+
+        self.assertEqual(self.award().bid.pk, first.pk)
+
+
+class SettlementTests(FormatTestCase):
+
+    def statuses(self):
+        return dict(Offer.objects.filter(auction_item=self.item).values_list("pk", "status"))
+
+    def test_settling_accepts_the_winner_rejects_the_rest_and_draws_down_inventory(self):
+        self.use_format(AuctionItem.FORMAT_SEALED_SECOND)
+        winner = self.bid("30", quantity=2)
+        loser = self.bid("18", customer=self.rival)
+
+        self.assertEqual(formats.settle_items([self.item.pk]), 1)
+
+        self.assertEqual(self.statuses(), {winner.pk: Offer.STATUS_ACCEPTED, loser.pk: Offer.STATUS_REJECTED})
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity_available, self.item.total_price), (3, Decimal("30")))
+        self.assertFalse(self.item.is_active)
+        self.assertIsNotNone(self.item.settled_at)
+        result = AuctionResult.objects.get(auction_item=self.item)
+        self.assertEqual((result.customer_id, result.qty, result.sold_price_total), (self.buyer.pk, 2, Decimal("36")))
+        rejected = DomainEvent.objects.get(kind=DomainEvent.OFFER_REJECTED)
+        self.assertEqual((rejected.offer_id, rejected.data["customer"]), (loser.pk, self.rival.pk))
+
+    def test_bids_for_more_than_is_left_lose(self):
+        self.use_format(AuctionItem.FORMAT_ENGLISH)
+        too_many = self.bid("30", quantity=6)
+        fits = self.bid("20", quantity=5, customer=self.rival)
+
+        formats.settle_items([self.item.pk])
+
+        self.assertEqual(self.statuses(), {too_many.pk: Offer.STATUS_REJECTED, fits.pk: Offer.STATUS_ACCEPTED})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_available, 0)
+        self.assertEqual(AuctionResult.objects.get(auction_item=self.item).qty, 5)
+
+    def test_items_sold_before_the_end_keep_their_result(self):
+        self.use_format(AuctionItem.FORMAT_ENGLISH)
+        sold = self.bid("12")
+        AuctionResult.objects.create(
+            auction_item=self.item, provider=self.provider, customer=self.buyer, offer_quantity=sold, qty=1,
+            condition="NEW", merchant_price=50, sold_price_total=12, start_datetime=self.item.start_datetime,
+            sold_datetime=timezone.now(),
+        )
+        Offer.objects.filter(pk=sold.pk).update(accepted=True, status=Offer.STATUS_ACCEPTED)
+        late = self.bid("15", customer=self.rival)
+
+        self.assertEqual(formats.settle_items([self.item.pk]), 0)
+
+        self.assertEqual(self.statuses(), {sold.pk: Offer.STATUS_ACCEPTED, late.pk: Offer.STATUS_REJECTED})
+        self.assertEqual(AuctionResult.objects.get(auction_item=self.item).offer_quantity_id, sold.pk)
+        self.item.refresh_from_db()
+        self.assertIsNotNone(self.item.settled_at)
+
+    def test_settled_items_are_not_settled_again(self):
+        self.use_format(AuctionItem.FORMAT_ENGLISH)
+        self.bid("12")
+        formats.settle_items([self.item.pk])
+
+        self.assertEqual(formats.settle_items([self.item.pk]), 0)
+        self.assertEqual(AuctionResult.objects.count(), 1)
+
+    def test_nothing_below_the_reserve_is_sold(self):
+        self.use_format(AuctionItem.FORMAT_ENGLISH, reserve_price=20)
+        offer = self.bid("15")
+
+        self.assertEqual(formats.settle_items([self.item.pk]), 0)
+
+        self.assertEqual(self.statuses(), {offer.pk: Offer.STATUS_REJECTED})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_available, 5)
+
+    def test_confirming_a_dutch_offer_settles_the_item(self):
+        self.use_format(AuctionItem.FORMAT_DUTCH, price_drop_per_hour=1)
+        offer = Offer.objects.create(auction_item=self.item, customer=self.buyer, offer_unit_price=10, offer_quantity=2)
+        self.client.force_login(self.buyer)
+
+        self.client.post(reverse("offer_review", args=[offer.pk]), {"action": "confirm"})
+
+        self.assertEqual(self.statuses(), {offer.pk: Offer.STATUS_ACCEPTED})
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.is_active, self.item.quantity_available), (False, 3))
+
+
+class SpendTotalTests(FormatTestCase):
+
+    def purchase(self, item, total):
+        return AuctionResult.objects.create(
+            auction_item=item, provider=self.provider, customer=self.buyer, qty=1, condition="NEW",
+            merchant_price=total, sold_price_total=total, start_datetime=item.start_datetime,
+        )
+
+    def test_totals_are_cached_until_a_purchase_changes(self):
+        result = self.purchase(self.item, 10)
+        self.assertEqual(purchases.spend_totals(self.buyer)["total"], Decimal("10"))
+        with self.assertNumQueries(0):
+            purchases.spend_totals(self.buyer)
+
+        result.sold_price_total = 12
+        result.save()
+        self.assertEqual(purchases.spend_totals(self.buyer)["total"], Decimal("12"))
+
+        result.delete()
+        self.assertEqual(purchases.spend_totals(self.buyer)["purchases"], 0)
+
+    def test_batched_settlement_forgets_the_winners_totals(self):
+        self.assertEqual(purchases.spend_totals(self.buyer)["total"], Decimal("0"))
+        self.use_format(AuctionItem.FORMAT_ENGLISH)
+        self.bid("30", quantity=2)
+
+        formats.settle_items([self.item.pk])
+
+        totals = purchases.spend_totals(self.buyer)
+        self.assertEqual((totals["total"], totals["purchases"]), (Decimal("60"), 1))
+        self.assertEqual([row["category"] for row in totals["by_category"]], ["Tools"])
+
+
+class AuctionItemFormTests(AuctionTestCase):
+
+    def form(self, **fields):
+        data = {
+            "title": "Drill", "category": self.item.category_id, "short_description": "Drill",
+            "quantity_available": 5, "unit_price": 10, "condition": "NEW",
+            "start_datetime": "2030-01-01 10:00", "duration_days": 1, "auction_format": AuctionItem.FORMAT_FIXED,
+        }
+        data.update(fields)
+        return AuctionItemForm(data)
+
+    def test_each_format_requires_its_fields(self):
+        self.assertTrue(self.form(unit_price="").is_valid())
+        self.assertIn("unit_price", self.form(auction_format=AuctionItem.FORMAT_ENGLISH, unit_price="").errors)
+        self.assertIn(
+            "quantity_available", self.form(auction_format=AuctionItem.FORMAT_SEALED_FIRST, quantity_available="").errors,
+        )
+        self.assertIn("price_drop_per_hour", self.form(auction_format=AuctionItem.FORMAT_DUTCH).errors)
+        self.assertTrue(self.form(auction_format=AuctionItem.FORMAT_DUTCH, price_drop_per_hour=1).is_valid())
+
+    def test_dutch_floor_must_be_below_the_starting_price(self):
+        form = self.form(auction_format=AuctionItem.FORMAT_DUTCH, price_drop_per_hour=1, reserve_price=11)
+
+        self.assertIn("reserve_price", form.errors)
+
+
+class RenderCacheTests(AuctionTestCase):
+
+    def test_crispy_fingerprint_changes_with_the_field_choices(self):
+        before = crispy_cache.fingerprint(AuctionItemForm())
+        self.assertEqual(crispy_cache.fingerprint(AuctionItemForm()), before)
+        self.assertIn("Tools", crispy_cache.crispy_cached(AuctionItemForm()))
+
+        Category.objects.create(name="Garden")
+
+        self.assertNotEqual(crispy_cache.fingerprint(AuctionItemForm()), before)
+        self.assertIn("Garden", crispy_cache.crispy_cached(AuctionItemForm()))
+
+    def test_bound_forms_render_their_errors_uncached(self):
+        crispy_cache.crispy_cached(AuctionItemForm())
+
+        html = crispy_cache.crispy_cached(AuctionItemForm({"title": ""}))
+
+        self.assertIn("This field is required.", html)
+        self.assertNotIn("This field is required.", crispy_cache.crispy_cached(AuctionItemForm()))
+
+    def test_item_card_is_rendered_again_after_an_edit(self):
+        self.assertContains(self.client.get(reverse("home")), "Drill")
+
+        self.item.title = "Hammer drill"
+        self.item.save()
+
+        self.assertContains(self.client.get(reverse("home")), "Hammer drill")
+
+
+class ProxyBidTests(FormatTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.use_format(AuctionItem.FORMAT_ENGLISH)
+
+    def place(self, customer, max_unit_price, quantity=1):
+        return proxy.place(self.item, customer, Decimal(max_unit_price), quantity)
+
+    def prices(self):
+        return list(
+            Offer.objects.filter(auction_item=self.item).order_by("pk").values_list("customer__username", "offer_unit_price")
+        )
+
+    def test_a_lone_proxy_bids_the_opening_price(self):
+        _, offer = self.place(self.buyer, "20")
+
+        self.assertEqual(offer.offer_unit_price, Decimal("10"))
+
+    def test_the_leader_bids_one_increment_over_the_rival_maximum(self):
+        self.place(self.buyer, "20")
+
+        rival, _ = self.place(self.rival, "15")
+
+        self.assertFalse(rival.is_active)
+        self.assertEqual(self.prices(), [("buyer", Decimal("10")), ("buyer", Decimal("16"))])
+
+    def test_the_leader_never_bids_over_its_own_maximum(self):
+        self.place(self.buyer, "20")
+
+        rival, offer = self.place(self.rival, "20.50")
+
+        self.assertTrue(rival.is_active)
+        self.assertEqual((offer.customer, offer.offer_unit_price), (self.rival, Decimal("20.50")))
+        self.assertFalse(ProxyBid.objects.get(customer=self.buyer).is_active)
+
+    def test_equal_maximums_go_to_the_earlier_proxy(self):
+        self.place(self.buyer, "20")
+
+        rival, offer = self.place(self.rival, "20")
+
+        self.assertFalse(rival.is_active)
+        self.assertEqual((offer.customer, offer.offer_unit_price), (self.buyer, Decimal("20")))
+
+    def test_a_manual_offer_at_every_maximum_stops_the_proxies(self):
+        self.place(self.buyer, "20")
+        self.place(self.rival, "15")
+        self.bid("20", customer=User.objects.create_user("manual", password="pw"))
+
+        self.assertIsNone(proxy.resolve(self.item))
+
+        self.assertFalse(ProxyBid.objects.filter(is_active=True).exists())
+
+    def test_a_leader_raising_its_maximum_places_no_new_offer(self):
+        self.place(self.buyer, "20")
+        self.place(self.rival, "15")
+
+        mine, offer = self.place(self.buyer, "40")
+
+        self.assertIsNone(offer)
+        self.assertTrue(mine.is_active)
+        self.assertEqual(mine.max_unit_price, Decimal("40"))
+        self.assertEqual(Offer.objects.filter(auction_item=self.item).count(), 2)
+
+    def test_proxy_quantity_is_held_to_what_is_available(self):
+        def form(quantity):
+            return ProxyBidForm({"max_unit_price": "20", "offer_quantity": quantity}, item=self.item)
+
+        self.assertTrue(form(5).is_valid())
+        self.assertIn("offer_quantity", form(6).errors)
+        self.assertIn("offer_quantity", form(0).errors)
+
+        self.client.force_login(self.buyer)
+        self.client.post(reverse("place_proxy_bid", args=[self.item.pk]), {"max_unit_price": "20", "offer_quantity": 6})
+        self.assertFalse(ProxyBid.objects.exists())
+
+
+class AsyncViewTests(AuctionTestCase):
+
+    async def test_home_counts_and_fetches_the_requested_page(self):
+        for number in range(12):
+            await AuctionItem.objects.acreate(
+                provider=self.provider, category=self.item.category, title=f"Item {number}",
+                short_description="Item", unit_price=1, quantity_available=1, start_datetime=timezone.now(),
+            )
+
+        response = await self.async_client.get(reverse("home"), {"page": 2, "sort": "newest"})
+        self.assertEqual(response.context["page_obj"].paginator.count, 13)
+        self.assertEqual([item.title for item in response.context["page_obj"]], ["Drill"])
+
+        # a page past the end falls back to the last one
+        response = await self.async_client.get(reverse("home"), {"page": 9, "sort": "newest"})
+        self.assertEqual(response.context["page_obj"].number, 2)
+        self.assertEqual([item.title for item in response.context["page_obj"]], ["Drill"])
+
+    async def test_unknown_category_and_item_are_not_found(self):
+        response = await self.async_client.get(reverse("category_items", args=[self.item.category_id + 1]))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse("auction_item_detail", args=[self.item.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_item_offers_are_shown_to_the_provider_but_not_while_sealed(self):
+        await Offer.objects.acreate(
+            auction_item=self.item, customer=self.buyer, offer_quantity=1, status=Offer.STATUS_SUBMITTED,
+        )
+        url = reverse("auction_item_detail", args=[self.item.pk])
+
+        await self.async_client.aforce_login(self.buyer)
+        response = await self.async_client.get(url)
+        self.assertIsNone(response.context["offers"])
+        self.assertTrue(response.context["can_offer"])
+
+        await self.async_client.aforce_login(self.seller)
+        response = await self.async_client.get(url)
+        self.assertEqual(len(response.context["offers"]), 1)
+
+        await AuctionItem.objects.filter(pk=self.item.pk).aupdate(auction_format=AuctionItem.FORMAT_SEALED_FIRST)
+        response = await self.async_client.get(url)
+        self.assertIsNone(response.context["offers"])
+
+
+class ExportTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.saw = AuctionItem.objects.create(
+            provider=self.provider, category=self.item.category, title='Saw, "large"', short_description="Saw",
+            unit_price=5, quantity_available=2, start_datetime=timezone.now(),
+        )
+        other = Provider.objects.create(user=User.objects.create_user("other", password="pw"), display_name="Other")
+        AuctionItem.objects.create(
+            provider=other, category=self.item.category, title="Not mine", short_description="Other",
+            unit_price=1, quantity_available=1, start_datetime=timezone.now(),
+        )
+        self.client.force_login(self.seller)
+
+    def export(self, fmt):
+        response = self.client.get(reverse("provider_export", args=["items"]), {"format": fmt})
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_has_a_header_row_quotes_values_and_holds_only_my_items(self):
+        content = self.export("csv")
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], exports.ITEM_FIELDS)
+        self.assertEqual([row[1] for row in rows[1:]], ["Drill", 'Saw, "large"'])
+        self.assertIn('"Saw, ""large"""', content)
+
+    def test_jsonl_export_writes_one_object_per_row(self):
+        lines = [json.loads(line) for line in self.export("jsonl").splitlines()]
+
+        self.assertEqual([line["title"] for line in lines], ["Drill", 'Saw, "large"'])
+        self.assertEqual(lines[1]["unit_price"], "5.00")
+
+    async def test_asgi_requests_stream_from_an_async_iterator(self):
+        await self.async_client.aforce_login(self.seller)
+
+        response = await self.async_client.get(reverse("provider_export", args=["items"]), {"format": "csv"})
+
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(list(csv.reader(io.StringIO(content)))), 3)
+
+
+class RateLimitTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ratelimit._local.clear()
+
+    def take(self, bucket, at, times=1):
+        with mock.patch("auction.ratelimit.time.time", return_value=at):
+            return [bucket.take("key") for _ in range(times)]
+
+    def test_concurrent_requests_do_not_share_a_slot(self):
+        bucket = ratelimit.Bucket("test", 5, 1)
+        with ThreadPoolExecutor(8) as pool:
+            waits = list(pool.map(lambda _: bucket.take("key"), range(40)))
+
+        self.assertEqual(waits.count(0), 5)
+        self.assertTrue(all(0 < wait <= 2 * bucket.window for wait in waits if wait))
+
+    def test_keys_are_counted_separately(self):
+        bucket = ratelimit.Bucket("test", 1, 1)
+
+        self.assertEqual(bucket.take("a"), 0)
+        self.assertEqual(bucket.take("b"), 0)
+        self.assertGreater(bucket.take("a"), 0)
+
+    def test_a_burst_at_a_window_edge_is_not_doubled(self):
+        bucket = ratelimit.Bucket("test", 5, 60)  # five requests in any five seconds
+        edge = 1000 * bucket.window
+
+        self.assertEqual(self.take(bucket, edge - 0.01, 5), [0] * 5)
+        waits = self.take(bucket, edge + 0.01, 3)
+
+        self.assertTrue(all(waits), waits)
+        # half the last window still weighs in; refused requests were not counted
+        self.assertEqual(self.take(bucket, edge + bucket.window / 2, 3).count(0), 2)
+
+    def test_refused_requests_are_told_when_there_is_room(self):
+        bucket = ratelimit.Bucket("test", 5, 60)
+        edge = 1000 * bucket.window
+        self.take(bucket, edge - 0.01, 5)
+
+        wait = self.take(bucket, edge + 0.5)[0]
+
+        # the last window's five weigh four one second in, which leaves room for one
+        self.assertAlmostEqual(wait, 0.5)
+        self.assertEqual(self.take(bucket, edge + 0.5 + wait + 0.01), [0])
+
+    def test_a_vanishing_cache_counter_falls_back_to_counting_in_process(self):
+        bucket = ratelimit.Bucket("test", 1, 1)
+        with mock.patch("auction.ratelimit.cache") as broken, self.assertLogs("auction.ratelimit", "WARNING"):
+            broken.get.return_value = 0
+            broken.incr.side_effect = ValueError
+
+            self.assertEqual(bucket.take("key"), 0)
+            self.assertGreater(bucket.take("key"), 0)
+
+
+class FailAfterOneBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        if len(mail.outbox) >= 1:
+            raise OSError("SMTP connection lost")
+        return super().send_messages(messages)
+
+
+class DigestTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.watchers = [User.objects.create_user(f"watcher{i}", f"watcher{i}@example.com", "pw") for i in range(2)]
+        for user in self.watchers:
+            WatchNotification.objects.create(
+                user=user, auction_item=self.item, kind=WatchNotification.KIND_OFFER_ACCEPTED,
+            )
+
+    def unsent(self):
+        return list(WatchNotification.objects.filter(sent_at__isnull=True).values_list("user_id", flat=True))
+
+    def test_smtp_error_keeps_only_unsent_notifications_queued(self):
+        with override_settings(EMAIL_BACKEND="auction.tests.FailAfterOneBackend"):
+            with self.assertRaises(OSError):
+                watch.send_digests()
+        self.assertEqual(self.unsent(), [self.watchers[1].pk])
+
+        self.assertEqual(watch.send_digests(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [["watcher0@example.com"], ["watcher1@example.com"]])
+        self.assertEqual(self.unsent(), [])
+
+
+class EndTimeTests(AuctionTestCase):
+
+    def listed(self, title, ends_in):
+        return AuctionItem.objects.create(
+            provider=self.provider, category=self.item.category, title=title, short_description=title,
+            unit_price=1, quantity_available=1, duration_days=1,
+            start_datetime=timezone.now() + ends_in - timedelta(days=1),
+        )
+
+    def test_ends_at_follows_the_start_and_duration(self):
+        self.assertEqual(self.item.ends_at, self.item.start_datetime + timedelta(days=1))
+        self.assertEqual(self.item.end_datetime, self.item.ends_at)
+
+        self.item.duration_days = 4
+        self.item.save(update_fields=["duration_days"])
+
+        self.assertEqual(
+            AuctionItem.objects.values_list("ends_at", flat=True).get(pk=self.item.pk),
+            self.item.start_datetime + timedelta(days=4),
+        )
+
+    def test_ending_soonest_lists_only_live_items_in_end_order(self):
+        self.listed("Ended", -timedelta(hours=1))
+        self.listed("Later", timedelta(hours=5))
+        self.listed("Soon", timedelta(hours=1))
+
+        response = self.client.get(reverse("home"), {"sort": "ending"})
+        self.assertEqual([item.title for item in response.context["page_obj"]], ["Soon", "Later", "Drill"])
+
+        response = self.client.get(reverse("home"), {"ending_within": 2})
+        self.assertEqual([item.title for item in response.context["page_obj"]], ["Soon"])
+
+    def test_countdowns_carry_the_end_timestamp(self):
+        response = self.client.get(reverse("auction_item_detail", args=[self.item.pk]))
+
+        self.assertContains(response, f'data-ends-at="{int(self.item.ends_at.timestamp())}"')
+        self.assertContains(response, "data-server-now=")
+
+
+class SoftCloseTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # a one-day auction ending two minutes from now, inside the soft-close window
+        ends_at = timezone.now() + timedelta(minutes=2)
+        AuctionItem.objects.filter(pk=self.item.pk).update(
+            soft_close=True, start_datetime=ends_at - timedelta(days=1), duration_days=1, ends_at=ends_at,
+        )
+        self.stale = AuctionItem.objects.get(pk=self.item.pk)
+        self.new_end = lifecycle.extend_soft_close(AuctionItem.objects.get(pk=self.item.pk))
+
+    def ends_at(self):
+        return AuctionItem.objects.values_list("ends_at", flat=True).get(pk=self.item.pk)
+
+    def test_saving_a_stale_copy_keeps_the_extension(self):
+        self.assertIsNotNone(self.new_end)
+
+        self.stale.quantity_available -= 1
+        self.stale.save()
+
+        self.assertEqual(self.ends_at(), self.new_end)
+
+    def test_accepting_an_offer_keeps_the_extension(self):
+        offer = self.submitted_offer()
+        self.client.force_login(self.seller)
+
+        self.client.post(reverse("accept_offer", args=[self.item.pk, offer.pk]))
+
+        self.assertEqual(self.ends_at(), self.new_end)
+
+    def test_rescheduling_a_stale_copy_respects_the_extension(self):
+        self.stale.duration_days = 3
+        self.stale.save(update_fields=["duration_days"])
+
+        self.assertEqual(self.ends_at(), self.stale.start_datetime + timedelta(days=3))
+
+
+class ProjectionTests(TestCase):
+
+    def submitted(self, pk, item_id=1):
+        event = DomainEvent.build(DomainEvent.OFFER_SUBMITTED, item_id, unit_price="10")
+        event.pk = pk
+        event.save()
+
+    def state(self, item_id=1):
+        return ItemState.objects.get(item_id=item_id)
+
+    def test_event_committed_behind_the_cursor_is_applied(self):
+        self.submitted(1)
+        self.submitted(3)
+        self.assertEqual(events.project_pending(), 2)
+        self.assertEqual(WatchCursor.objects.get(name=events.PROJECTION_CURSOR).gaps.keys(), {"2"})
+
+        # the transaction holding id 2 commits after the cursor moved to 3
+        self.submitted(2)
+
+        self.assertEqual(events.project_pending(), 1)
+        self.assertEqual(self.state().offers_submitted, 3)
+        self.assertEqual(WatchCursor.objects.get(name=events.PROJECTION_CURSOR).gaps, {})
+        self.assertEqual(events.project_pending(), 0)
+
+    def test_gaps_are_given_up_after_the_timeout(self):
+        self.submitted(1)
+        self.submitted(3)
+        events.project_pending()
+        expired = (timezone.now() - events.GAP_TIMEOUT - timedelta(seconds=1)).isoformat()
+        WatchCursor.objects.filter(name=events.PROJECTION_CURSOR).update(gaps={"2": expired})
+
+        self.assertEqual(events.project_pending(), 0)
+        self.assertEqual(WatchCursor.objects.get(name=events.PROJECTION_CURSOR).gaps, {})
+
+    def test_replay_keeps_recent_gaps(self):
+        self.submitted(1)
+        self.submitted(3)
+
+        events.replay()
+        self.submitted(2)
+        events.project_pending()
+
+        self.assertEqual(self.state().offers_submitted, 3)
+
+
+class ReplayTests(TestCase):
+
+    def submitted(self, pk, item_id):
+        event = DomainEvent.build(DomainEvent.OFFER_SUBMITTED, item_id, unit_price="10")
+        event.pk = pk
+        event.save()
+
+    def test_replay_rebuilds_one_batch_of_items_per_transaction(self):
+        for pk, item_id in [(1, 1), (2, 2), (3, 1), (4, 3)]:
+            self.submitted(pk, item_id)
+        ItemState.objects.create(item_id=1, offers_submitted=99, last_event_id=3)
+        ItemState.objects.create(item_id=9, offers_submitted=1, last_event_id=1)
+        WatchCursor.objects.create(name=events.PROJECTION_CURSOR)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(events.replay(items_per_batch=2), (4, 3))
+
+        self.assertEqual(
+            dict(ItemState.objects.values_list("item_id", "offers_submitted")), {1: 2, 2: 1, 3: 1},
+        )
+        # the cursor move, two batches and the empty page that ends the walk
+        savepoints = [query for query in queries if query["sql"].startswith("SAVEPOINT")]
+        self.assertEqual(len(savepoints), 4)
+        self.assertEqual(events.project_pending(), 0)
+
+    def test_a_gap_filled_before_the_replay_is_applied_once(self):
+        self.submitted(1, 1)
+        self.submitted(3, 1)
+        # id 2 was still uncommitted when the cursor passed it, and commits before the replay
+        WatchCursor.objects.create(name=events.PROJECTION_CURSOR, position=3, gaps={"2": timezone.now().isoformat()})
+        self.submitted(2, 1)
+
+        events.replay()
+
+        self.assertEqual(ItemState.objects.get(item_id=1).offers_submitted, 3)
+        self.assertEqual(WatchCursor.objects.get(name=events.PROJECTION_CURSOR).gaps, {})
+        self.assertEqual(events.project_pending(), 0)
+
+
+class ItemImportTests(AuctionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def run_import(self, job):
+        claimed = imports.claim_next()
+        self.assertEqual(claimed.pk, job.pk)
+        with self.assertLogs("auction.imports", "ERROR"):
+            imports.process(claimed)
+        job.refresh_from_db()
+        return job
+
+    def test_missing_data_file_fails_the_job(self):
+        job = self.run_import(ItemImport.objects.create(provider=self.provider, data_file="auction/imports/gone.csv"))
+
+        self.assertEqual(job.status, ItemImport.STATUS_FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn("Import failed", job.errors[-1]["errors"]["__all__"][0])
+
+    def test_error_after_the_rows_fails_the_job_and_keeps_row_results(self):
+        job = ItemImport(provider=self.provider, images_zip="auction/imports/gone.zip")
+        job.data_file.save("items.csv", ContentFile(
+            "title,category,short_description,quantity_available,unit_price,condition,start_datetime,duration_days,image\n"
+            "Saw,Tools,Hand saw,2,5.00,NEW,2030-01-01 10:00,3,saw.png\n"
+            "Bad,Tools,Missing price,2,,NEW,,3,\n"
+        ))
+
+        job = self.run_import(job)
+
+        self.assertEqual(job.status, ItemImport.STATUS_FAILED)
+        self.assertEqual((job.rows_total, job.rows_imported, job.rows_failed), (2, 1, 1))
+        self.assertEqual(job.errors[0]["row"], 2)
+        self.assertIn("Import failed", job.errors[-1]["errors"]["__all__"][0])
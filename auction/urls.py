@@ -7,13 +7,24 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     
     path("item/<int:pk>/", views.auction_item_detail, name="auction_item_detail"),
+    path("category/<int:pk>/", views.category_items, name="category_items"),
+    path("item/<int:pk>/watch/", views.toggle_watch, name="toggle_watch"),
+    path("item/<int:pk>/proxy/", views.place_proxy_bid, name="place_proxy_bid"),
+    path("item/<int:pk>/proxy/cancel/", views.cancel_proxy_bid, name="cancel_proxy_bid"),
+    path("watchlist/", views.watchlist, name="watchlist"),
+    path("watchlist/search/<int:pk>/delete/", views.delete_saved_search, name="delete_saved_search"),
     
     path("provider/create/", views.create_auction_item, name="create_auction_item"),
     path("provider/dashboard/", views.provider_dashboard, name="provider_dashboard"),
     path("provider/<int:item_id>/accept/<int:offer_id>/", views.accept_offer, name="accept_offer"),
     path("provider/<int:item_id>/close/", views.close_auction, name="close_auction"),
+    path("provider/bulk/", views.provider_bulk_actions, name="provider_bulk_actions"),
+    path("provider/export/<str:kind>/", views.provider_export, name="provider_export"),
+    path("provider/import/", views.provider_imports, name="provider_imports"),
+    path("provider/import/<int:pk>/", views.provider_import_detail, name="provider_import_detail"),
 
     path("customer/dashboard/", views.customer_dashboard, name="customer_dashboard"),
+    path("customer/offers/", views.my_offers, name="my_offers"),
 
     path('register/', views.register, name='register'),
     path('admin_dashboard/', views.admin_dashboard, name='admin_dashboard'),
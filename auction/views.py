@@ -1,9 +1,17 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.http import HttpResponseForbidden
+from datetime import timedelta
+from django.http import HttpResponseForbidden, HttpResponseBadRequest, Http404, JsonResponse
 
-from .models import AuctionItem, AuctionImage, AuctionVideo, Offer, AuctionResult, Provider, Category
+from .models import (
+AuctionItem, AuctionImage, AuctionVideo, Offer, AuctionResult, Provider, Category, ItemImport,
+SavedSearch, WatchedItem, WatchNotification, ProxyBid, DomainEvent,
+)
 from .forms import (
 AuctionItemForm,
 AuctionImageFormSet,
@@ -11,38 +19,95 @@ AuctionVideoFormSet,
 OfferForm,
 RegistrationForm,
 CategoryForm,
+ItemImportForm,
+SavedSearchForm,
+ProxyBidForm,
 )
-from django.db.models import Prefetch
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.paginator import Paginator
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import user_passes_test
+from main_site.db import fetch_all
+from main_site.replicas import read_from_replica
+from . import bulk, exports, formats, keyset, lifecycle, proxy, purchases, stats, watch
+from .idempotency import idempotent
+from .ratelimit import rate_limit, by_ip, by_url_kwarg, by_user, by_username
+
+
+LISTING_SORTS = {
+    "newest": ("-created_at",),
+    "ending": ("ends_at", "pk"),
+}
+
+OPEN_OFFERS_SHOWN = 10
+MY_OFFERS_PER_PAGE = 25
+MY_OFFER_STATUSES = [Offer.STATUS_SUBMITTED, Offer.STATUS_ACCEPTED, Offer.STATUS_REJECTED, Offer.STATUS_WITHDRAWN]
+
+
+@read_from_replica
+async def home(request):
+    return await listing_page(request, AuctionItem.objects.filter(is_active=True))
 
-def home(request):
+
+@read_from_replica
+async def category_items(request, pk):
+    try:
+        category = await Category.objects.aget(pk=pk)
+    except Category.DoesNotExist:
+        raise Http404("No Category matches the given query.")
+    items = AuctionItem.objects.filter(category=category, is_active=True)
+    return await listing_page(request, items, {"category": category})
+
+
+async def listing_page(request, items, extra_context=None):
     now = timezone.now()
-    items = (AuctionItem.objects.filter(is_active=True).order_by("-created_at"))
+    sort = request.GET.get("sort")
+    if sort not in LISTING_SORTS:
+        sort = "newest"
+    if sort == "ending":
+        items = items.filter(ends_at__gt=now)
+    try:
+        ending_within = int(request.GET.get("ending_within"))
+    except (TypeError, ValueError):
+        ending_within = None
+    else:
+        items = items.filter(ends_at__gt=now, ends_at__lte=now + timedelta(hours=ending_within))
+    items = items.order_by(*LISTING_SORTS[sort])
 
     paginator = Paginator(items, 12)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-
-    user_is_provider = False
-    if request.user.is_authenticated:
-        try:
-            request.user.provider_profile
-            user_is_provider = True
-        except ObjectDoesNotExist:
-            user_is_provider = False
+    try:
+        number = max(int(request.GET.get("page")), 1)
+    except (TypeError, ValueError):
+        number = 1
+
+    # count and fetch the requested page at the same time; only an
+    # out-of-range page number needs a second fetch
+    page_items = items.prefetch_related("images")
+    bottom = (number - 1) * paginator.per_page
+    paginator.count, rows = await asyncio.gather(
+        items.acount(), fetch_all(page_items[bottom:bottom + paginator.per_page])
+    )
+    page_obj = paginator.get_page(number)
+    if page_obj.number == number:
+        page_obj.object_list = rows
+    else:
+        bottom = (page_obj.number - 1) * paginator.per_page
+        page_obj.object_list = await fetch_all(page_items[bottom:bottom + paginator.per_page])
 
-    return render(request, "auction/home.html", {
-        "items": items,
+    # user_is_provider comes from auction.context_processors.user_role
+    return await sync_to_async(render)(request, "auction/home.html", {
         "page_obj": page_obj,
-        "user_is_provider": user_is_provider
+        "sort": sort,
+        "ending_within": ending_within,
+        **(extra_context or {}),
     })
 
 
+@rate_limit(("login-ip", by_ip), ("login-username", by_username))
 def login_view(request):
     if request.user.is_authenticated:
         return redirect("home")
@@ -85,6 +150,7 @@ def create_auction_item(request):
             # auction_item._price = form.cleaned_data["total_price"] 
             auction_item.unit_price = form.cleaned_data["unit_price"]
             auction_item.save()
+            stats.record_item_listed(auction_item)
 
             image_formset = AuctionImageFormSet(request.POST, request.FILES, instance=auction_item)
             video_formset = AuctionVideoFormSet(request.POST, request.FILES, instance=auction_item)
@@ -109,65 +175,143 @@ def create_auction_item(request):
     })
 
 
-def auction_item_detail(request, pk):
-    item = get_object_or_404(AuctionItem, pk=pk)
-    offer_form = None
-    can_offer = item.is_active and timezone.now() < item.end_datetime
-    offers_for_display = None
+@read_from_replica
+async def auction_item_detail(request, pk):
+    if request.method == "POST":
+        return await sync_to_async(make_offer)(request, pk)
 
-    if request.user.is_authenticated:
-        if request.user.is_staff or request.user.is_superuser:
-            offers_for_display = item.offers.exclude(status=Offer.STATUS_WITHDRAWN).order_by("-created_at")
-        elif request.user == item.provider.user:
-            offers_for_display = item.offers.exclude(status=Offer.STATUS_WITHDRAWN).order_by("-created_at")
-        else:
-            offers_for_display = None
-           
+    items = AuctionItem.objects.select_related("provider__user", "category")
+    try:
+        item, user = await asyncio.gather(items.aget(pk=pk), request.auser())
+    except AuctionItem.DoesNotExist:
+        raise Http404("No AuctionItem matches the given query.")
+    now = timezone.now()
+    can_offer = item.is_active and now < item.end_datetime
+    auction_format = formats.for_item(item)
+    # sealed bids stay hidden from the provider until the auction ends
+    can_see_offers = user.is_authenticated and (
+        user.is_staff or user.is_superuser
+        or (user.pk == item.provider.user_id and not (auction_format.sealed and can_offer))
+    )
+    if can_see_offers:
+        offers = item.offers.exclude(status=Offer.STATUS_WITHDRAWN).order_by("-created_at")
+    else:
+        offers = Offer.objects.none()
+
+    watches = WatchedItem.objects.filter(auction_item=item)
+    watches = watches.filter(user_id=user.pk) if user.is_authenticated else watches.none()
+    proxies = ProxyBid.objects.filter(auction_item=item, is_active=True)
+    proxies = proxies.filter(customer_id=user.pk) if user.is_authenticated else proxies.none()
+
+    images, videos, offers, watching, my_proxy = await asyncio.gather(
+        fetch_all(item.images.all()),
+        fetch_all(item.videos.all()),
+        fetch_all(offers),
+        watches.aexists(),
+        proxies.afirst(),
+    )
+    return await sync_to_async(render)(request, "auction/item_detail.html", {
+    "item": item,
+    "images": images,
+    "videos": videos,
+    "watching": watching,
+    "auction_format": auction_format,
+    "current_price": auction_format.current_price(item, now),
+    "offer_form": OfferForm() if can_offer else None,
+    "proxy_form": ProxyBidForm(instance=my_proxy) if can_offer and auction_format.proxy_bidding else None,
+    "my_proxy": my_proxy,
+    "can_offer": can_offer,
+    "offers": offers if can_see_offers else None,
+    })
 
-    if request.method == "POST":
-        if not request.user.is_authenticated:
-            return HttpResponseForbidden("Login required to make an offer.")
-        if request.user == item.provider.user:
-            return HttpResponseForbidden("You cannot make an offer on your own items.")
-        if not can_offer:
-            return HttpResponseForbidden("This auction is closed for offers.")
-        
-        offer_form = OfferForm(request.POST)
-        if offer_form.is_valid():
-            offer = offer_form.save(commit=False)
-            offer.auction_item = item
-            offer.customer = request.user
-            offer.status = Offer.STATUS_DRAFT
+
+@rate_limit(("offer-user", by_user), ("offer-item", by_url_kwarg("pk")))
+def make_offer(request, pk):
+    item = get_object_or_404(AuctionItem.objects.select_related("provider__user", "category"), pk=pk)
+    now = timezone.now()
+    can_offer = item.is_active and now < item.end_datetime
+    auction_format = formats.for_item(item)
+
+    if not request.user.is_authenticated:
+        return HttpResponseForbidden("Login required to make an offer.")
+    if request.user == item.provider.user:
+        return HttpResponseForbidden("You cannot make an offer on your own items.")
+    if not can_offer:
+        return HttpResponseForbidden("This auction is closed for offers.")
+
+    # a customer keeps at most one draft per item; a new post replaces it
+    draft = Offer.objects.filter(auction_item=item, customer=request.user, status=Offer.STATUS_DRAFT).first()
+    offer_form = OfferForm(request.POST, instance=draft)
+    if offer_form.is_valid():
+        offer = offer_form.save(commit=False)
+        offer.auction_item = item
+        offer.customer = request.user
+        offer.status = Offer.STATUS_DRAFT
+        try:
+            auction_format.validate_offer(item, offer, now)
+        except ValidationError as error:
+            offer_form.add_error(None, error)
+        else:
             offer.save()
             return redirect("offer_review", offer_id=offer.id)
-    else:
-        offer_form = OfferForm() if can_offer else None
-
-
-    #     if can_offer:
-    #         offer_form = OfferForm(request.POST)
-    #     if offer_form.is_valid():
-    #         offer = offer_form.save(commit=False)
-    #         offer.auction_item = item
-    #         offer.customer = request.user
-    #         offer.save()
-            
-    #         return redirect("auction_item_detail", pk=item.pk)
-    #     else:
-    #         offer_form = OfferForm()
-    # else:
-    #     if can_offer:
-    #         offer_form = OfferForm()
-    # offers = item.offers.all().order_by("-created_at")
+
+    offers_for_display = None
+    if request.user.is_staff or request.user.is_superuser:
+        offers_for_display = item.offers.exclude(status=Offer.STATUS_WITHDRAWN).order_by("-created_at")
 
     return render(request, "auction/item_detail.html", {
     "item": item,
+    "images": item.images.all(),
+    "videos": item.videos.all(),
+    "auction_format": auction_format,
+    "current_price": auction_format.current_price(item, now),
     "offer_form": offer_form,
+    "proxy_form": ProxyBidForm() if auction_format.proxy_bidding else None,
     "can_offer": can_offer,
     "offers": offers_for_display,
     })
 
 @login_required
+@rate_limit(("offer-user", by_user), ("offer-item", by_url_kwarg("pk")))
+def place_proxy_bid(request, pk):
+    item = get_object_or_404(AuctionItem.objects.select_related("provider__user"), pk=pk)
+    if request.method != "POST":
+        return redirect("auction_item_detail", pk=item.pk)
+    if request.user == item.provider.user:
+        return HttpResponseForbidden("You cannot bid on your own items.")
+    if not (item.is_active and timezone.now() < item.end_datetime):
+        return HttpResponseForbidden("This auction is closed for offers.")
+    if not formats.for_item(item).proxy_bidding:
+        return HttpResponseForbidden("Automatic bidding is only available on English auctions.")
+
+    form = ProxyBidForm(request.POST, item=item)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            messages.error(request, " ".join(errors))
+        return redirect("auction_item_detail", pk=item.pk)
+
+    proxy_bid, offer = proxy.place(
+        item, request.user, form.cleaned_data["max_unit_price"], form.cleaned_data["offer_quantity"],
+    )
+    if not proxy_bid.is_active:
+        messages.warning(request, "Another bidder's maximum is higher. Raise your maximum to keep bidding.")
+    elif offer is not None:
+        messages.success(request, f"You are the highest bidder at ₹{offer.offer_unit_price} per unit.")
+    else:
+        messages.success(request, "Your maximum has been updated. You are still the highest bidder.")
+    return redirect("auction_item_detail", pk=item.pk)
+
+
+@login_required
+def cancel_proxy_bid(request, pk):
+    if request.method == "POST":
+        ProxyBid.objects.filter(auction_item_id=pk, customer=request.user, is_active=True).update(is_active=False)
+        messages.info(request, "Automatic bidding stopped. Bids already placed stay on the item.")
+    return redirect("auction_item_detail", pk=pk)
+
+
+@login_required
+@idempotent
 def offer_review(request, offer_id):
     offer = get_object_or_404(Offer, pk=offer_id)
 
@@ -181,11 +325,35 @@ def offer_review(request, offer_id):
     if request.method == "POST":
         action = request.POST.get("action")
         if action == "confirm":
-            offer.submit()
+            if offer.status == Offer.STATUS_DRAFT:
+                with transaction.atomic():
+                    item = AuctionItem.objects.select_for_update().get(pk=item.pk)
+                    auction_format = formats.for_item(item)
+                    try:
+                        auction_format.validate_offer(item, offer, timezone.now())
+                    except ValidationError as error:
+                        return HttpResponseForbidden(error.messages[0])
+                    offer.submit()
+                    DomainEvent.record(
+                        DomainEvent.OFFER_SUBMITTED, item.pk, offer,
+                        unit_price=offer.offer_unit_price, quantity=offer.offer_quantity,
+                    )
+                    stats.record_offer_received(offer)
+                    watch.record_offer_activity(offer, WatchNotification.KIND_NEW_OFFER)
+                    if auction_format.proxy_bidding:
+                        # proxies on the item answer the new offer in the same step
+                        proxy.resolve(item)
+                    if auction_format.settles_on_offer:
+                        formats.settle_items([item.pk])
+                    else:
+                        lifecycle.extend_soft_close(item)
             return redirect("auction_item_detail", pk=item.pk)
         elif action == "cancel":
-            offer.status = Offer.STATUS_WITHDRAWN
-            offer.save(update_fields=['status'])
+            with transaction.atomic():
+                if offer.status == Offer.STATUS_SUBMITTED:
+                    DomainEvent.record(DomainEvent.OFFER_WITHDRAWN, item.pk, offer)
+                offer.status = Offer.STATUS_WITHDRAWN
+                offer.save(update_fields=['status'])
             return redirect("auction_item_detail", pk=item.pk)
     return render(request, "auction/offer_review.html", {
     "offer": offer,
@@ -196,6 +364,8 @@ def offer_review(request, offer_id):
 @login_required
 def provider_dashboard(request):
     provider = get_object_or_404(Provider, user=request.user)
+    sales_since = timezone.localdate() - timedelta(days=30)
+    sales_by_category = list(stats.summary(provider, sales_since))
     my_items = AuctionItem.objects.filter(provider=provider).order_by("-created_at")
     offers_by_item = {}
     for item in my_items:
@@ -207,10 +377,13 @@ def provider_dashboard(request):
     return render(request, "auction/provider_dashboard.html", {
     "my_items": my_items,
     "offers_by_item": offers_by_item,
+    "sales_since": sales_since,
+    "sales_by_category": sales_by_category,
     })
 
 
 @login_required
+@idempotent
 def accept_offer(request, item_id, offer_id):
     provider = get_object_or_404(Provider, user=request.user) 
     item = get_object_or_404(AuctionItem, pk=item_id, provider=provider)
@@ -223,10 +396,19 @@ def accept_offer(request, item_id, offer_id):
     if offer.offer_quantity > item.quantity_available:
         messages.error(request, "Not enough quantity available to accept this offer.")
         return redirect("provider_dashboard")
-    offer.accepted = True
-    offer.save()
-    item.quantity_available -= offer.offer_quantity
-    item.save()
+    with transaction.atomic():
+        offer.accepted = True
+        offer.status = Offer.STATUS_ACCEPTED
+        offer.accepted_at = timezone.now()
+        DomainEvent.record(
+            DomainEvent.OFFER_ACCEPTED, item.pk, offer,
+            quantity=offer.offer_quantity, price_total=offer.offer_price,
+        )
+        offer.save()
+        item.quantity_available -= offer.offer_quantity
+        item.save(update_fields=["quantity_available", "total_price"])
+        stats.record_acceptance(offer)
+        watch.record_offer_activity(offer, WatchNotification.KIND_OFFER_ACCEPTED)
     messages.success(request, "Offer accepted.")
 
 
@@ -264,6 +446,127 @@ def accept_offer(request, item_id, offer_id):
 
 
 
+@login_required
+def provider_export(request, kind):
+    provider = get_object_or_404(Provider, user=request.user)
+    fmt = request.GET.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest("Unknown export format.")
+
+    if kind == "items":
+        queryset, fields = AuctionItem.objects.filter(provider=provider), exports.ITEM_FIELDS
+    elif kind == "offers":
+        queryset = Offer.objects.filter(auction_item__provider=provider).exclude(status=Offer.STATUS_DRAFT)
+        fields = exports.OFFER_FIELDS
+    elif kind == "results":
+        queryset, fields = AuctionResult.objects.filter(provider=provider), exports.RESULT_FIELDS
+    else:
+        raise Http404("Unknown export.")
+
+    return exports.export_response(request, queryset, fields, fmt, f"{kind}-{timezone.localdate()}")
+
+
+@login_required
+def provider_imports(request):
+    provider = get_object_or_404(Provider, user=request.user)
+    if request.method == "POST":
+        form = ItemImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            item_import = form.save(commit=False)
+            item_import.provider = provider
+            item_import.save()
+            messages.success(request, "Your file was uploaded and will be imported shortly.")
+            return redirect("provider_import_detail", pk=item_import.pk)
+    else:
+        form = ItemImportForm()
+
+    imports = ItemImport.objects.filter(provider=provider).defer("errors").order_by("-created_at")[:20]
+    return render(request, "auction/provider_imports.html", {
+    "form": form,
+    "imports": imports,
+    })
+
+
+@login_required
+def provider_import_detail(request, pk):
+    provider = get_object_or_404(Provider, user=request.user)
+    item_import = get_object_or_404(ItemImport, pk=pk, provider=provider)
+    return render(request, "auction/provider_import_detail.html", {
+    "item_import": item_import,
+    })
+
+
+@login_required
+def toggle_watch(request, pk):
+    item = get_object_or_404(AuctionItem, pk=pk)
+    if request.method != "POST":
+        return redirect("auction_item_detail", pk=item.pk)
+    removed, _ = WatchedItem.objects.filter(user=request.user, auction_item=item).delete()
+    if removed:
+        messages.info(request, "Removed from your watchlist.")
+    else:
+        WatchedItem.objects.get_or_create(user=request.user, auction_item=item)
+        messages.success(request, "Added to your watchlist. You will get a digest email when offers come in.")
+    return redirect("auction_item_detail", pk=item.pk)
+
+
+@login_required
+def watchlist(request):
+    if request.method == "POST":
+        form = SavedSearchForm(request.POST)
+        if form.is_valid():
+            saved_search = form.save(commit=False)
+            saved_search.user = request.user
+            saved_search.save()
+            messages.success(request, "Search saved. New matching items will appear in your digest.")
+            return redirect("watchlist")
+    else:
+        form = SavedSearchForm()
+
+    watched = (
+        WatchedItem.objects.filter(user=request.user)
+        .select_related("auction_item")
+        .order_by("-created_at")
+    )
+    saved_searches = SavedSearch.objects.filter(user=request.user).select_related("category").order_by("-created_at")
+    return render(request, "auction/watchlist.html", {
+    "form": form,
+    "watched": watched,
+    "saved_searches": saved_searches,
+    })
+
+
+@login_required
+def delete_saved_search(request, pk):
+    saved_search = get_object_or_404(SavedSearch, pk=pk, user=request.user)
+    if request.method == "POST":
+        saved_search.delete()
+        messages.info(request, "Saved search removed.")
+    return redirect("watchlist")
+
+
+@login_required
+@idempotent
+def provider_bulk_actions(request):
+    provider = Provider.objects.filter(user=request.user).first()
+    if provider is None:
+        return JsonResponse({"error": "Only providers can act on offers."}, status=403)
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "The body must be JSON."}, status=400)
+    actions = payload.get("actions") if isinstance(payload, dict) else None
+    if not isinstance(actions, list) or not actions:
+        return JsonResponse({"error": "Send a non-empty \"actions\" list."}, status=400)
+    if len(actions) > bulk.MAX_ACTIONS:
+        return JsonResponse({"error": f"At most {bulk.MAX_ACTIONS} actions per request."}, status=400)
+
+    applied, results = bulk.apply(provider, actions, all_or_nothing=bool(payload.get("all_or_nothing")))
+    return JsonResponse({"applied": applied, "results": results}, status=200 if applied else 409)
+
+
 @login_required
 def close_auction(request, item_id, winning_offer_id=None):
     provider = get_object_or_404(Provider, user=request.user)
@@ -271,22 +574,70 @@ def close_auction(request, item_id, winning_offer_id=None):
     if item.offers.exists():
         return HttpResponseForbidden("This auction has offers and cannot be closed at this time.")
     if request.method == "POST":
-        item.is_active = False
-        item.save()
+        with transaction.atomic():
+            item.is_active = False
+            item.save(update_fields=["is_active"])
+            DomainEvent.record(DomainEvent.AUCTION_CLOSED, item.pk, reason="provider")
         return redirect("provider_dashboard")
     return HttpResponseForbidden("POST required")
     
 
 
 @login_required
+@read_from_replica
 def customer_dashboard(request):
 
     results = AuctionResult.objects.filter(customer=request.user).select_related(
-    "auction_item", "provider", "auction_item__category"
+        "auction_item__category", "provider"
+    ).order_by("-sold_datetime", "-pk")
+    paginator = Paginator(results, 25)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    top_unit_price = Offer.objects.filter(
+        auction_item=OuterRef("auction_item"), status=Offer.STATUS_SUBMITTED
+    ).order_by("-offer_unit_price").values("offer_unit_price")[:1]
+    open_offers = list(
+        Offer.objects.filter(
+            customer=request.user,
+            status__in=[Offer.STATUS_DRAFT, Offer.STATUS_SUBMITTED],
+            auction_item__is_active=True,
+        )
+        .select_related("auction_item")
+        .annotate(top_unit_price=Subquery(top_unit_price))
+        .order_by("-created_at")[:OPEN_OFFERS_SHOWN]
     )
+    for offer in open_offers:
+        # sealed bids stay sealed until the auction settles
+        if formats.for_item(offer.auction_item).sealed or offer.status != Offer.STATUS_SUBMITTED:
+            offer.leading = None
+        else:
+            offer.leading = offer.offer_unit_price >= offer.top_unit_price
 
     return render(request, "auction/customer_dashboard.html", {
-    "results": results,
+        "page_obj": page_obj,
+        "page_range": paginator.get_elided_page_range(page_obj.number),
+        "open_offers": open_offers,
+        "spend": purchases.spend_totals(request.user),
+    })
+
+
+@login_required
+@read_from_replica
+def my_offers(request):
+    status = request.GET.get("status")
+    statuses = [status] if status in MY_OFFER_STATUSES else MY_OFFER_STATUSES
+    offers = (
+        Offer.objects.filter(customer=request.user, status__in=statuses)
+        .select_related("auction_item")
+        .prefetch_related(Prefetch("auction_item__images", queryset=AuctionImage.objects.order_by("pk")))
+    )
+    page = keyset.page(offers, request.GET.get("after"), MY_OFFERS_PER_PAGE)
+
+    return render(request, "auction/my_offers.html", {
+        "offers": page.rows,
+        "next_cursor": page.next_cursor,
+        "status": status if status in MY_OFFER_STATUSES else "",
+        "status_choices": [(value, label) for value, label in Offer.STATUS_CHOICES if value in MY_OFFER_STATUSES],
     })
 
 
@@ -0,0 +1,170 @@
+"""
+Watchlists, saved searches and digest emails.
+
+New items are matched against saved searches by ``match_new_items()`` in
+batches read after a stored cursor (manage.py match_watches). For each batch
+only the searches that could match are loaded, using the indexed keyword and
+category columns, and they are bucketed by keyword and category, so an item
+is compared with a handful of candidate searches instead of all of them.
+Offer activity on watched items is queued when it happens. ``send_digests()``
+(manage.py send_watch_digests) mails every user one digest of what is queued
+over a single SMTP connection.
+"""
+import re
+from collections import defaultdict
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import AuctionItem, SavedSearch, WatchCursor, WatchedItem, WatchNotification
+
+BATCH_SIZE = 500
+NEW_ITEMS_CURSOR = "new-items"
+
+WORD = re.compile(r"\w+")
+
+
+def keywords(item):
+    return set(WORD.findall(f"{item.title or ''} {item.short_description}".lower()))
+
+
+def normalize_keyword(value):
+    words = WORD.findall((value or "").lower())
+    return words[0] if words else ""
+
+
+def candidate_searches(items):
+    tokens = set()
+    category_ids = set()
+    for item in items:
+        tokens |= item.keywords
+        category_ids.add(item.category_id)
+
+    by_keyword = defaultdict(list)
+    by_category = defaultdict(list)
+    unfiltered = Q(keyword="") & (Q(category__isnull=True) | Q(category_id__in=category_ids))
+    tokens = sorted(tokens)
+    for start in range(0, max(len(tokens), 1), BATCH_SIZE):
+        chunk = tokens[start:start + BATCH_SIZE]
+        query = Q(keyword__in=chunk) | unfiltered if start == 0 else Q(keyword__in=chunk)
+        for search in SavedSearch.objects.filter(query):
+            if search.keyword:
+                by_keyword[search.keyword].append(search)
+            else:
+                by_category[search.category_id].append(search)
+    return by_keyword, by_category
+
+
+def matches(search, item):
+    if search.category_id is not None and search.category_id != item.category_id:
+        return False
+    if search.max_unit_price is not None and (item.unit_price is None or item.unit_price > search.max_unit_price):
+        return False
+    return True
+
+
+def match_new_items(batch_size=BATCH_SIZE):
+    """Queue NEW_ITEM notifications for one batch; return how many items were read."""
+    with transaction.atomic():
+        cursor, _ = WatchCursor.objects.select_for_update().get_or_create(name=NEW_ITEMS_CURSOR)
+        items = list(
+            AuctionItem.objects.filter(pk__gt=cursor.position, is_active=True)
+            .order_by("pk")
+            .select_related("provider")
+            .only("title", "short_description", "category", "unit_price", "provider__user")[:batch_size]
+        )
+        if not items:
+            return 0
+        for item in items:
+            item.keywords = keywords(item)
+
+        by_keyword, by_category = candidate_searches(items)
+        pending = set()
+        for item in items:
+            candidates = by_category[None] + by_category[item.category_id]
+            for word in item.keywords:
+                candidates += by_keyword.get(word, [])
+            for search in candidates:
+                if search.user_id != item.provider.user_id and matches(search, item):
+                    pending.add((search.user_id, item.pk))
+
+        WatchNotification.objects.bulk_create(
+            [WatchNotification(user_id=user_id, auction_item_id=item_id, kind=WatchNotification.KIND_NEW_ITEM)
+             for user_id, item_id in pending],
+            batch_size=1000,
+        )
+        cursor.position = items[-1].pk
+        cursor.save(update_fields=["position"])
+    return len(items)
+
+
+def record_offer_activity(offer, kind):
+    watchers = WatchedItem.objects.filter(auction_item_id=offer.auction_item_id).exclude(user_id=offer.customer_id)
+    WatchNotification.objects.bulk_create([
+        WatchNotification(user_id=user_id, auction_item_id=offer.auction_item_id, kind=kind)
+        for user_id in watchers.values_list("user_id", flat=True)
+    ])
+
+
+def record_awards(winners):
+    """Queue OFFER_ACCEPTED for the winners and watchers of many items; ``winners`` holds (item id, user id) pairs."""
+    pending = {(user_id, item_id) for item_id, user_id in winners}
+    item_ids = list({item_id for item_id, _ in pending})
+    for start in range(0, len(item_ids), BATCH_SIZE):
+        watchers = WatchedItem.objects.filter(auction_item_id__in=item_ids[start:start + BATCH_SIZE])
+        pending.update(watchers.values_list("user_id", "auction_item_id"))
+    WatchNotification.objects.bulk_create(
+        [WatchNotification(user_id=user_id, auction_item_id=item_id, kind=WatchNotification.KIND_OFFER_ACCEPTED)
+         for user_id, item_id in pending],
+        batch_size=1000,
+    )
+
+
+def digest_body(user, notifications):
+    lines = [f"Hello {user.first_name or user.get_username()},", "", "Here is what happened on the auctions you follow:", ""]
+    for notification in notifications:
+        item = notification.auction_item
+        url = reverse("auction_item_detail", args=[item.pk])
+        lines.append(f"- {notification.get_kind_display()}: {item.title or item.short_description} ({settings.SITE_URL}{url})")
+    lines += ["", "Manage your watchlist and saved searches on your watchlist page.", "", "TradeSocial"]
+    return "\n".join(lines)
+
+
+def send_digests():
+    """Send one email per user with everything queued for them; return the number sent.
+
+    A user's notifications are marked sent as soon as their email is out, so
+    an SMTP error partway through leaves only the unsent ones queued.
+    """
+    pending = (
+        WatchNotification.objects.filter(sent_at__isnull=True)
+        .select_related("user", "auction_item")
+        .order_by("user_id", "created_at")
+    )
+    # one SMTP session for the whole run instead of one per email
+    connection = get_connection()
+    sent = 0
+    try:
+        for _, notifications in groupby(pending.iterator(chunk_size=2000), key=attrgetter("user_id")):
+            notifications = list(notifications)
+            user = notifications[0].user
+            if user.email:
+                if not sent:
+                    connection.open()
+                connection.send_messages([EmailMessage(
+                    f"{len(notifications)} update(s) on auctions you follow",
+                    digest_body(user, notifications),
+                    settings.DEFAULT_FROM_EMAIL,
+                    [user.email],
+                )])
+                sent += 1
+            WatchNotification.objects.filter(pk__in=[n.pk for n in notifications]).update(sent_at=timezone.now())
+    finally:
+        connection.close()
+    return sent
@@ -0,0 +1,152 @@
+"""
+Public read pages under the WSGI and the ASGI handler.
+
+Drives main_site.wsgi from a pool of ``--concurrency`` threads (a threaded
+WSGI server) and main_site.asgi from as many asyncio tasks (an ASGI server)
+with the same mix of home, item detail and course list requests, and
+reports throughput and latency. No HTTP server is involved, so the numbers
+compare the request handlers and views only.
+
+    python -m benchmarks.async_views --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks import harness
+
+
+def seed(items):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from auction.models import AuctionImage, AuctionItem, Category, Provider
+    from courses.models import Course
+
+    seller = User.objects.create(username='seller', password='!')
+    provider = Provider.objects.create(user=seller, display_name='Seller')
+    category = Category.objects.create(name='Bench')
+    created = AuctionItem.objects.bulk_create([
+        AuctionItem(
+            provider=provider, category=category, title=f"Lot {i}", short_description=f"Lot {i}",
+            unit_price=10, quantity_available=5, start_datetime=timezone.now(), duration_days=7,
+        )
+        for i in range(items)
+    ])
+    AuctionImage.objects.bulk_create([AuctionImage(auction_item=item, image='bench.png') for item in created])
+    Course.objects.bulk_create([
+        Course(title=f"Course {i}", teacher=seller, price=20, description='Bench course') for i in range(20)
+    ])
+    return [item.pk for item in created]
+
+
+def wsgi_get(application, path):
+    environ = {'PATH_INFO': path, 'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO()}
+    setup_testing_defaults(environ)
+    status = []
+    body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(application, path):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    received = False
+    status = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # the client stays connected; Django cancels this once it has responded
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def timed(call, path):
+    start = time.perf_counter()
+    status = call(path)
+    return status, time.perf_counter() - start
+
+
+async def run_asgi(application, paths, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(path):
+        async with limit:
+            start = time.perf_counter()
+            status = await asgi_get(application, path)
+            return status, time.perf_counter() - start
+
+    return await asyncio.gather(*(one(path) for path in paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--items', type=int, default=200)
+    args = parser.parse_args()
+
+    harness.setup()
+
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connections
+
+    item_ids = seed(args.items)
+    mix = ['/', '/courses/course_list/'] + [f"/item/{pk}/" for pk in item_ids[:8]]
+    paths = [mix[i % len(mix)] for i in range(args.requests)]
+
+    def wsgi_run():
+        application = get_wsgi_application()
+
+        def one(path):
+            try:
+                return timed(lambda p: wsgi_get(application, p), path)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            return list(pool.map(one, paths))
+
+    def asgi_run():
+        return asyncio.run(run_asgi(get_asgi_application(), paths, args.concurrency))
+
+    rows = []
+    for label, run in [('WSGI threads', wsgi_run), ('ASGI tasks', asgi_run)]:
+        run_started = time.perf_counter()
+        results = run()
+        elapsed = time.perf_counter() - run_started
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status != 200)
+        rows.append([
+            label, len(results), errors, f"{elapsed:.2f}", f"{len(results) / elapsed:.0f}",
+            f"{statistics.median(latencies) * 1000:.0f}", f"{latencies[int(len(latencies) * 0.95)] * 1000:.0f}",
+        ])
+
+    harness.print_table(['handler', 'requests', 'errors', 'seconds', 'req/s', 'p50 ms', 'p95 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
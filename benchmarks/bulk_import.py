@@ -0,0 +1,112 @@
+"""
+Bulk item import against per-row saves.
+
+Builds a CSV of ``--rows`` items (every ``--bad-every``-th row invalid, every
+``--image-every``-th row naming an image in a zip) and imports it twice:
+once the way create_auction_item does it, one AuctionItemForm and save() per
+row, and once through auction.imports.
+
+    python -m benchmarks.bulk_import --rows 10000
+"""
+import argparse
+import csv
+import io
+import tempfile
+import time
+import zipfile
+
+from benchmarks import harness
+
+PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082'
+)
+
+
+def build_files(rows, bad_every, image_every, categories):
+    data = io.StringIO()
+    writer = csv.writer(data)
+    writer.writerow([
+        'title', 'category', 'short_description', 'unit_of_measure', 'quantity_available',
+        'unit_price', 'condition', 'start_datetime', 'duration_days', 'image',
+    ])
+    images = io.BytesIO()
+    with zipfile.ZipFile(images, 'w') as archive:
+        for i in range(rows):
+            image = f"lot{i}.png" if i % image_every == 0 else ''
+            if image:
+                archive.writestr(image, PNG)
+            writer.writerow([
+                f"Lot {i}", categories[i % len(categories)], f"Bulk lot {i}", 'pcs',
+                'many' if i % bad_every == 0 else i % 50 + 1,
+                '12.50', 'NEW', '2026-01-01 09:00', 7, image,
+            ])
+    return data.getvalue().encode(), images.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--bad-every', type=int, default=100)
+    parser.add_argument('--image-every', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = harness.setup(MEDIA_ROOT=tempfile.mkdtemp(prefix='auction-bench-media-'))
+
+    from django.contrib.auth.models import User
+    from django.core.files.base import ContentFile
+
+    from auction import imports, stats
+    from auction.forms import AuctionItemForm
+    from auction.models import AuctionImage, AuctionItem, Category, ItemImport, Provider
+
+    categories = [Category.objects.create(name=f"Category {i}").name for i in range(10)]
+    data, images = build_files(args.rows, args.bad_every, args.image_every, categories)
+    print(f"{args.rows} rows, {len(data) // 1024} KiB CSV, {len(images) // 1024} KiB zip, scratch dir {workdir}")
+
+    def per_row(provider):
+        category_ids = dict(Category.objects.values_list('name', 'pk'))
+        archive = zipfile.ZipFile(io.BytesIO(images))
+        for row in csv.DictReader(io.StringIO(data.decode())):
+            row['category'] = category_ids[row['category']]
+            form = AuctionItemForm(data=row)
+            if not form.is_valid():
+                continue
+            item = form.save(commit=False)
+            item.provider = provider
+            item.save()
+            stats.record_item_listed(item)
+            if row['image']:
+                image = AuctionImage(auction_item=item)
+                image.image.save(row['image'], ContentFile(archive.read(row['image'])))
+
+    def bulk(provider):
+        job = ItemImport(provider=provider)
+        job.data_file.save('bench.csv', ContentFile(data), save=False)
+        job.images_zip.save('bench.zip', ContentFile(images), save=False)
+        job.save()
+        imports.process(imports.claim_next())
+
+    results = []
+    for label, run in [('per-row save()', per_row), ('auction.imports', bulk)]:
+        user = User.objects.create(username=label, password='!')
+        provider = Provider.objects.create(user=user, display_name=label)
+        queries = harness.QueryCounter()
+        started = time.perf_counter()
+        with queries.watch():
+            run(provider)
+        elapsed = time.perf_counter() - started
+        results.append([
+            label,
+            AuctionItem.objects.filter(provider=provider).count(),
+            AuctionImage.objects.filter(auction_item__provider=provider).count(),
+            queries.count,
+            f"{elapsed:.2f}",
+            f"{args.rows / elapsed:.0f}",
+        ])
+
+    harness.print_table(['strategy', 'items', 'images', 'queries', 'seconds', 'rows/s'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Concurrent offer writers against each database profile.
+
+Every thread repeatedly opens a transaction that reads an auction item and
+then inserts an offer, the shape of the offer submission path. The stock
+SQLite setup (rollback journal, deferred transactions) fails such
+transactions with "database is locked" under contention; the WAL profile
+from settings queues them. Set BENCH_POSTGRES_NAME (and the usual DB_USER /
+DB_PASSWORD / DB_HOST / DB_PORT) to include the Postgres profile.
+
+    python -m benchmarks.db_writers --threads 16 --writes 50
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from benchmarks import harness
+
+
+def profiles(workdir):
+    from django.conf import settings
+
+    sqlite = settings.DATABASES['default'] if settings.DATABASES['default']['ENGINE'].endswith('sqlite3') else {}
+    result = {
+        'sqlite-default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(workdir, 'default-journal.sqlite3'),
+        },
+        'sqlite-wal': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(workdir, 'wal.sqlite3'),
+            'OPTIONS': sqlite.get('OPTIONS', {}),
+            'PRAGMAS': sqlite.get('PRAGMAS', {}),
+        },
+    }
+    if os.getenv('BENCH_POSTGRES_NAME'):
+        result['postgres'] = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('BENCH_POSTGRES_NAME'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', ''),
+            'CONN_MAX_AGE': 60,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    return result
+
+
+def seed(alias):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from auction.models import AuctionItem, Category, Provider
+
+    seller = User.objects.db_manager(alias).create(username='seller', password='!')
+    provider = Provider.objects.using(alias).create(user=seller, display_name='Seller')
+    category = Category.objects.using(alias).create(name='Bench')
+    item = AuctionItem(
+        provider=provider, category=category, title='Lot', short_description='Lot',
+        quantity_available=1000, unit_price=10, start_datetime=timezone.now(),
+    )
+    item.save(using=alias)
+    buyers = User.objects.db_manager(alias).bulk_create([User(username=f"buyer{i}", password='!') for i in range(32)])
+    return item.pk, [b.pk for b in buyers]
+
+
+def run(alias, threads, writes):
+    from django.db import OperationalError, connections, transaction
+
+    from auction.models import AuctionItem, Offer
+
+    item_id, buyer_ids = seed(alias)
+    locked = []
+
+    def writer(n):
+        errors = 0
+        try:
+            for _ in range(writes):
+                try:
+                    with transaction.atomic(using=alias):
+                        item = AuctionItem.objects.using(alias).get(pk=item_id)
+                        offer = Offer(
+                            auction_item=item, customer_id=buyer_ids[n % len(buyer_ids)],
+                            offer_quantity=1, offer_unit_price=item.unit_price, offer_price=item.unit_price,
+                        )
+                        offer.save(using=alias)
+                except OperationalError:
+                    errors += 1
+        finally:
+            connections[alias].close()
+        locked.append(errors)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(writer, range(threads)))
+    elapsed = time.perf_counter() - start
+    saved = Offer.objects.using(alias).count()
+    return [alias, threads * writes, saved, sum(locked), f"{elapsed:.2f}s", f"{saved / elapsed:.0f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=50)
+    args = parser.parse_args()
+
+    harness.setup(databases=profiles)
+
+    from django.conf import settings
+
+    rows = [run(alias, args.threads, args.writes) for alias in settings.DATABASES if alias != 'default']
+
+    harness.print_table(['profile', 'attempted', 'saved', 'locked errors', 'wall', 'writes/s'], rows)
+
+
+if __name__ == '__main__':
+    main()
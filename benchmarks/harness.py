@@ -0,0 +1,74 @@
+"""
+Shared setup for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite file (never db.sqlite3) and are
+started as modules from the project root, e.g.::
+
+    python -m benchmarks.sessions
+"""
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup(databases=None, **settings_overrides):
+    """Configure Django on a scratch database; ``databases`` maps a work
+    directory to extra DATABASES aliases, which are migrated too."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main_site.settings')
+
+    from django.conf import settings
+
+    if not settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        raise SystemExit("Benchmarks create scratch data; run them with the SQLite profile (unset DB_ENGINE).")
+    workdir = tempfile.mkdtemp(prefix='auction-bench-')
+    settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+    extra = databases(workdir) if databases else {}
+    settings.DATABASES.update(extra)
+    settings.ALLOWED_HOSTS = ['*']
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    for name, value in settings_overrides.items():
+        setattr(settings, name, value)
+    django.setup()
+
+    from django.core.management import call_command
+    for alias in ['default', *extra]:
+        call_command('migrate', database=alias, verbosity=0)
+    return workdir
+
+
+class QueryCounter:
+    """Counts queries on every connection that runs inside ``watch()``."""
+
+    def __init__(self, match=None):
+        self.match = match
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.match is None or self.match in sql:
+            with self._lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def watch(self):
+        from django.db import connection
+        with connection.execute_wrapper(self):
+            yield
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(v)) for v in column) for column in zip(headers, *rows)]
+    line = '  '.join(f"{{:<{w}}}" for w in widths)
+    print(line.format(*headers))
+    print(line.format(*('-' * w for w in widths)))
+    for row in rows:
+        print(line.format(*row))
@@ -0,0 +1,90 @@
+"""
+Session engine load under concurrent logged-in traffic.
+
+Logs in ``--users`` users, replays ``--requests`` cart page views per user
+from a thread pool and counts the queries that hit django_session for each
+session engine. A second pass re-saves every session unchanged to show the
+writes that main_site.sessions coalesces away.
+
+    python -m benchmarks.sessions --users 50 --requests 20 --threads 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from benchmarks import harness
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cached_db+coalesce': 'main_site.sessions',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    harness.setup()
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client, override_settings
+
+    User.objects.bulk_create([User(username=f"bench{i}", password='!') for i in range(args.users)])
+    users = list(User.objects.filter(username__startswith='bench'))
+
+    rows = []
+    for label, engine in ENGINES.items():
+        with override_settings(SESSION_ENGINE=engine):
+            cache.clear()
+            clients = []
+            for user in users:
+                client = Client()
+                client.force_login(user)
+                clients.append(client)
+
+            session_queries = harness.QueryCounter('"django_session"')
+            all_queries = harness.QueryCounter()
+
+            def browse(client):
+                try:
+                    with session_queries.watch(), all_queries.watch():
+                        for _ in range(args.requests):
+                            client.get('/courses/cart/')
+                finally:
+                    connection.close()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.threads) as pool:
+                list(pool.map(browse, clients))
+            elapsed = time.perf_counter() - start
+
+            store = import_module(engine).SessionStore
+            writes = harness.QueryCounter('"django_session"')
+            with writes.watch():
+                for client in clients:
+                    session = store(client.cookies[settings.SESSION_COOKIE_NAME].value)
+                    session['_auth_user_id'] = session['_auth_user_id']
+                    session.save()
+
+            total = len(clients) * args.requests
+            rows.append([
+                label, total, session_queries.count, all_queries.count, writes.count,
+                f"{elapsed:.2f}s", f"{total / elapsed:.0f}",
+            ])
+
+    harness.print_table(
+        ['engine', 'requests', 'session queries', 'all queries', 'no-op save queries', 'wall', 'req/s'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
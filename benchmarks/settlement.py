@@ -0,0 +1,109 @@
+"""
+Batched auction settlement against settling one item at a time.
+
+Lists ``--items`` ended English auctions with ``--offers`` submitted offers
+each and settles them twice: once item by item the way accept_offer does it
+(load the item's offers, save() the winner, let the Offer signals create the
+result, bump the stats), and once through auction.formats.settle_ended.
+
+    python -m benchmarks.settlement --items 10000 --offers 100
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks import harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--offers', type=int, default=100)
+    parser.add_argument('--bidders', type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = harness.setup()
+
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from auction import formats, stats
+    from auction.models import AuctionItem, AuctionResult, Category, Offer, Provider, ProviderSalesStat
+
+    rng = random.Random(42)
+    now = timezone.now()
+    category = Category.objects.create(name='Bench')
+    provider = Provider.objects.create(user=User.objects.create(username='provider', password='!'), display_name='Bench')
+    User.objects.bulk_create([User(username=f"bidder{i}", password='!') for i in range(args.bidders)])
+    bidders = list(User.objects.filter(username__startswith='bidder').values_list('pk', flat=True))
+
+    started = time.perf_counter()
+    AuctionItem.objects.bulk_create([
+        AuctionItem(
+            provider=provider, category=category, title=f"Lot {i}", short_description=f"Lot {i}",
+            quantity_available=1, unit_price=Decimal('10.00'), total_price=Decimal('10.00'),
+            auction_format=AuctionItem.FORMAT_ENGLISH, start_datetime=now - timedelta(days=2),
+            duration_days=1, ends_at=now - timedelta(days=1),
+        )
+        for i in range(args.items)
+    ], batch_size=1000)
+    item_ids = list(AuctionItem.objects.values_list('pk', flat=True))
+    for item_id in item_ids:
+        Offer.objects.bulk_create([
+            Offer(
+                auction_item_id=item_id, customer_id=rng.choice(bidders), status=Offer.STATUS_SUBMITTED,
+                offer_unit_price=Decimal(rng.randrange(1000, 100000)) / 100, offer_price=0,
+                submitted_at=now - timedelta(days=1, minutes=n),
+            )
+            for n in range(args.offers)
+        ])
+    print(f"{args.items} items, {args.items * args.offers} offers built in "
+          f"{time.perf_counter() - started:.1f}s, scratch dir {workdir}")
+
+    def reset():
+        AuctionResult.objects.all().delete()
+        ProviderSalesStat.objects.all().delete()
+        Offer.objects.filter(accepted=True).update(accepted=False, status=Offer.STATUS_SUBMITTED, accepted_at=None)
+        AuctionItem.objects.update(settled_at=None, is_active=True, quantity_available=1)
+
+    def per_item():
+        for item in AuctionItem.objects.filter(settled_at__isnull=True).select_related('provider__user'):
+            offers = list(item.offers.filter(status=Offer.STATUS_SUBMITTED).order_by('-offer_unit_price', 'submitted_at'))
+            if offers and (item.reserve_price is None or offers[0].offer_unit_price >= item.reserve_price):
+                winner = offers[0]
+                winner.auction_item = item
+                winner.accepted = True
+                winner.status = Offer.STATUS_ACCEPTED
+                winner.accepted_at = timezone.now()
+                winner.save()
+                stats.record_acceptance(winner)
+            item.settled_at = timezone.now()
+            item.is_active = False
+            item.save(update_fields=['settled_at', 'is_active'])
+
+    def batched():
+        formats.settle_ended()
+
+    results = []
+    for label, run in [('per-item save()', per_item), ('formats.settle_ended', batched)]:
+        reset()
+        queries = harness.QueryCounter()
+        started = time.perf_counter()
+        with queries.watch():
+            run()
+        elapsed = time.perf_counter() - started
+        results.append([
+            label,
+            AuctionResult.objects.count(),
+            queries.count,
+            f"{elapsed:.2f}",
+            f"{args.items / elapsed:.0f}",
+        ])
+
+    harness.print_table(['strategy', 'results', 'queries', 'seconds', 'items/s'], results)
+
+
+if __name__ == '__main__':
+    main()
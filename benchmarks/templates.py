@@ -0,0 +1,139 @@
+"""
+Template render time per page under three template setups.
+
+Renders each page template straight from a template engine (no view, no
+middleware) with a prebuilt context, ``--renders`` times per setup:
+
+- uncached loader: templates re-read and re-parsed on every render, debug on;
+- cached loader, cold: the production profile's cached loader with the item
+  and course card fragments and crispy forms rendered from scratch;
+- cached loader, warm: the same with the fragment and crispy caches filled.
+
+crispy's own field templates always come from the project engine, so they
+are compiled once in every setup.
+
+    python -m benchmarks.templates --renders 300
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks import harness
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def seed(items, courses):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from auction.models import AuctionImage, AuctionItem, Category, Provider
+    from courses.models import Course
+
+    seller = User.objects.create(username='seller', password='!')
+    provider = Provider.objects.create(user=seller, display_name='Seller')
+    category = Category.objects.create(name='Bench')
+    created = AuctionItem.objects.bulk_create([
+        AuctionItem(
+            provider=provider, category=category, title=f"Lot {i}",
+            short_description=f"Lot {i} " + "with a longer description " * 5,
+            unit_price=10, quantity_available=5, start_datetime=timezone.now(), duration_days=7,
+        )
+        for i in range(items)
+    ])
+    AuctionImage.objects.bulk_create([AuctionImage(auction_item=item, image='bench.png') for item in created])
+    Course.objects.bulk_create([
+        Course(title=f"Course {i}", teacher=seller, price=20, description="Bench course " * 10) for i in range(courses)
+    ])
+
+
+def contexts():
+    from django.contrib.auth.forms import AuthenticationForm
+    from django.core.paginator import Paginator
+
+    from auction.forms import AuctionImageFormSet, AuctionItemForm, AuctionVideoFormSet, RegistrationForm
+    from auction.models import AuctionItem
+    from courses.models import Course
+
+    page_obj = Paginator(AuctionItem.objects.order_by('-created_at').prefetch_related('images'), 12).get_page(1)
+    page_obj.object_list = list(page_obj.object_list)
+    return {
+        'auction/home.html': lambda: {'page_obj': page_obj, 'sort': 'newest', 'ending_within': None},
+        'courses/course_list.html': lambda: {'courses': list(Course.objects.select_related('teacher'))},
+        'auction/login.html': lambda: {'form': AuthenticationForm()},
+        'auction/register.html': lambda: {'form': RegistrationForm()},
+        'auction/create_item.html': lambda: {
+            'form': AuctionItemForm(),
+            'image_formset': AuctionImageFormSet(),
+            'video_formset': AuctionVideoFormSet(),
+        },
+    }
+
+
+def engine(cached):
+    from django.conf import settings
+    from django.template import Engine
+    from django.template.backends.django import get_installed_libraries
+
+    return Engine(
+        loaders=[('django.template.loaders.cached.Loader', LOADERS)] if cached else LOADERS,
+        debug=not cached,
+        context_processors=settings.TEMPLATES[0]['OPTIONS']['context_processors'],
+        libraries=get_installed_libraries(),
+    )
+
+
+def render_times(template_engine, name, build, request, renders, warm):
+    from django.core.cache import cache
+    from django.template import RequestContext
+
+    times = []
+    if warm:
+        template_engine.get_template(name).render(RequestContext(request, build()))
+    for _ in range(renders):
+        context = build()
+        if not warm:
+            cache.clear()
+        started = time.perf_counter()
+        template_engine.get_template(name).render(RequestContext(request, context))
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--renders', type=int, default=300)
+    parser.add_argument('--items', type=int, default=12)
+    parser.add_argument('--courses', type=int, default=30)
+    args = parser.parse_args()
+
+    harness.setup()
+
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    seed(args.items, args.courses)
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+
+    setups = [
+        ('uncached loader', engine(cached=False), False),
+        ('cached loader, cold', engine(cached=True), False),
+        ('cached loader, warm', engine(cached=True), True),
+    ]
+    rows = []
+    for name, build in contexts().items():
+        baseline = None
+        for label, template_engine, warm in setups:
+            ms = render_times(template_engine, name, build, request, args.renders, warm)
+            baseline = baseline or ms
+            rows.append([name, label, f"{ms:.2f}", f"{baseline / ms:.1f}x"])
+
+    harness.print_table(['template', 'setup', 'median ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
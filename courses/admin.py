@@ -1,7 +1,16 @@
 from django.contrib import admin
-from .models import Course, TimeSlot, Booking
+from .models import Course, TimeSlot, Booking, Cart, CartItem
 # Register your models here.
 
 admin.site.register(Course)
 admin.site.register(TimeSlot)
-admin.site.register(Booking)
\ No newline at end of file
+admin.site.register(Cart)
+admin.site.register(CartItem)
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    # 'unfilled' bookings were paid for without a seat and still need a refund
+    list_display = ('student', 'timeslot', 'status', 'paid_at', 'stripe_session_id', 'stripe_refund_id')
+    list_filter = ('status',)
+    list_select_related = ('student', 'timeslot__course')
@@ -0,0 +1,123 @@
+"""
+Server-side cart store.
+
+Each add or remove touches a single CartItem row instead of rewriting the
+whole session. Anonymous carts are referenced by id from the session and are
+merged into the user's cart on login. Cart totals are computed with one SQL
+aggregate and cached until the cart or a course price changes.
+"""
+import time
+
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Cart, CartItem, Course
+
+CART_SESSION_KEY = 'cart_id'
+PRICES_VERSION_KEY = 'courses:prices-version'
+
+
+def get_cart(request, create=False):
+    if request.user.is_authenticated:
+        if create:
+            return Cart.objects.get_or_create(user=request.user)[0]
+        return Cart.objects.filter(user=request.user).first()
+
+    cart_id = request.session.get(CART_SESSION_KEY)
+    cart = Cart.objects.filter(pk=cart_id, user__isnull=True).first() if cart_id else None
+    if cart is None and create:
+        cart = Cart.objects.create()
+        request.session[CART_SESSION_KEY] = cart.pk
+    return cart
+
+
+def add_item(cart, timeslot):
+    _, created = CartItem.objects.get_or_create(cart=cart, timeslot=timeslot)
+    if created:
+        _forget_totals(cart)
+    return created
+
+
+def remove_item(cart, timeslot_id):
+    removed, _ = CartItem.objects.filter(cart=cart, timeslot_id=timeslot_id).delete()
+    if removed:
+        _forget_totals(cart)
+    return bool(removed)
+
+
+def clear(cart):
+    cart.items.all().delete()
+    _forget_totals(cart)
+
+
+def restore(cart, timeslot_ids):
+    CartItem.objects.bulk_create(
+        [CartItem(cart=cart, timeslot_id=ts_id) for ts_id in timeslot_ids], ignore_conflicts=True,
+    )
+    _forget_totals(cart)
+
+
+def timeslot_ids(cart):
+    if cart is None:
+        return []
+    return list(cart.items.values_list('timeslot_id', flat=True))
+
+
+def totals(cart):
+    if cart is None:
+        return {'count': 0, 'amount': 0}
+    key = _totals_key(cart)
+    result = cache.get(key)
+    if result is None:
+        result = cart.items.aggregate(count=Count('pk'), amount=Sum('timeslot__course__price'))
+        result['amount'] = result['amount'] or 0
+        cache.set(key, result)
+    return result
+
+
+def merge(anonymous_cart, user):
+    with transaction.atomic():
+        cart = Cart.objects.get_or_create(user=user)[0]
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, timeslot_id=ts_id) for ts_id in timeslot_ids(anonymous_cart)],
+            ignore_conflicts=True,
+        )
+        anonymous_cart.delete()
+    _forget_totals(cart)
+    return cart
+
+
+def _totals_key(cart):
+    # an evicted version restarts from the clock so old totals never match again
+    version = cache.get_or_set(PRICES_VERSION_KEY, time.time_ns, None)
+    return f"courses:cart-totals:{cart.pk}:{version}"
+
+
+def _forget_totals(cart):
+    cache.delete(_totals_key(cart))
+
+
+@receiver(user_logged_in)
+def merge_anonymous_cart(sender, request, user, **kwargs):
+    # login() keeps session data when it rotates the key, so the anonymous
+    # cart id is still here
+    cart_id = request.session.pop(CART_SESSION_KEY, None) if request is not None else None
+    if not cart_id:
+        return
+    anonymous_cart = Cart.objects.filter(pk=cart_id, user__isnull=True).first()
+    if anonymous_cart is not None:
+        merge(anonymous_cart, user)
+
+
+@receiver(post_save, sender=Course)
+def invalidate_cart_totals(sender, instance, **kwargs):
+    # a price change makes every cached total stale; bump the version instead
+    # of finding the carts that contain the course
+    try:
+        cache.incr(PRICES_VERSION_KEY)
+    except ValueError:
+        cache.set(PRICES_VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.models import Cart
+
+
+class Command(BaseCommand):
+    help = "Delete anonymous carts whose session can no longer exist."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        deleted, _ = Cart.objects.filter(user__isnull=True, created_at__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {deleted} row(s) from stale carts.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.reservations import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Cancel pending checkout bookings whose hold has expired and release their seats."
+
+    def handle(self, *args, **options):
+        expired = expire_holds()
+        self.stdout.write(f"Expired {expired} pending booking(s).")
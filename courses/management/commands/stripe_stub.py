@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.stripe_stub import StripeStub
+
+
+class Command(BaseCommand):
+    help = "Run a local Stripe stand-in that creates checkout sessions and delivers signed webhooks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument(
+            '--webhook-url',
+            default='http://127.0.0.1:8000/courses/stripe/webhook/',
+            help="URL of the site's stripe_webhook endpoint.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.STRIPE_WEBHOOK_SECRET:
+            raise CommandError("Set STRIPE_WEBHOOK_SECRET so webhook signatures can be verified.")
+
+        server = StripeStub((options['host'], options['port']), options['webhook_url'], settings.STRIPE_WEBHOOK_SECRET)
+        self.stdout.write(f"Stripe stub listening on {server.base_url} (set STRIPE_API_BASE to this address)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:22
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def fill_seats_available(apps, schema_editor):
+    TimeSlot = apps.get_model('courses', 'TimeSlot')
+    taken = Count(
+        'bookings',
+        filter=Q(bookings__status='confirmed') | Q(bookings__status='pending', bookings__expires_at__gt=timezone.now()),
+    )
+    for slot in TimeSlot.objects.annotate(taken=taken).iterator():
+        slot.seats_available = max(slot.capacity - slot.taken, 0)
+        slot.save(update_fields=['seats_available'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_booking_expires_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeslot',
+            name='seats_available',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_seats_available, migrations.RunPython.noop),
+    ]
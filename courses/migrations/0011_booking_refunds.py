@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_timeslot_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='stripe_refund_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('canceled', 'Canceled'), ('unfilled', 'Paid, no seat'), ('refunded', 'Refunded')], default='pending', max_length=10),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
 # Create your models here.
 
@@ -44,14 +46,37 @@ class TimeSlot(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     capacity = models.PositiveIntegerField()
+    # capacity minus confirmed bookings and live holds; only changed through
+    # conditional UPDATEs in courses.reservations
+    seats_available = models.PositiveIntegerField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.course.title} - {self.start_time}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.seats_available = self.capacity
+            return super().save(*args, **kwargs)
+
+        # never write back a stale seat count; a capacity edit moves the seats
+        # by its difference to the stored capacity, in the same UPDATE
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+        update_fields = set(update_fields) - {'seats_available'}
+        with transaction.atomic():
+            if 'capacity' in update_fields:
+                update_fields.discard('capacity')
+                TimeSlot.objects.filter(pk=self.pk).update(
+                    seats_available=Greatest(F('seats_available') + self.capacity - F('capacity'), 0),
+                    capacity=self.capacity,
+                )
+            super().save(*args, update_fields=update_fields | {'updated_at'}, **kwargs)
+
     @property
     def remaining_slots(self):
-        booked_count = self.bookings.filter(status='confirmed').count()
-        return max(self.capacity - booked_count, 0)
+        return self.seats_available or 0
     
     @property
     def is_available(self):
@@ -63,14 +88,50 @@ class Booking(models.Model):
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
         ('canceled', 'Canceled'),
+        # paid, but the seat was gone by the time the payment arrived
+        ('unfilled', 'Paid, no seat'),
+        ('refunded', 'Refunded'),
     )
 
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     timeslot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name='bookings')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     stripe_session_id = models.CharField(max_length=255, blank=True, null=True)
+    stripe_refund_id = models.CharField(max_length=255, blank=True, null=True)
     paid_at = models.DateTimeField(blank=True, null=True)
+    # pending bookings are checkout holds; they are canceled in bulk once expired
+    expires_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stripe_session_id', 'timeslot'], name='unique_booking_per_session_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} -> {self.timeslot}"
+
+class Cart(models.Model):
+    # anonymous carts have no user and are found through the session
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cart of {self.user.username if self.user else 'anonymous'}"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    timeslot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name='cart_items')
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'timeslot'], name='unique_cart_timeslot'),
+        ]
+
     def __str__(self):
-        return f"{self.student.username} -> {self.timeslot}"
\ No newline at end of file
+        return f"{self.timeslot} in {self.cart}"
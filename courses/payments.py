@@ -0,0 +1,192 @@
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking
+from .reservations import cancel_holds, take_seat
+
+logger = logging.getLogger(__name__)
+
+
+def hold_expiry():
+    return timezone.now() + timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+
+
+def confirm_checkout_session(session):
+    # Called from the webhook, which Stripe may deliver more than once: the
+    # (stripe_session_id, timeslot) constraint and the status check make a
+    # replay a no-op, so bookings and emails are only produced once. A slot
+    # whose seat is gone by now is refunded rather than booked.
+    session_id = session['id']
+    metadata = session.get('metadata') or {}
+    user_id = metadata.get('user_id')
+    timeslot_ids = [int(tid) for tid in metadata.get('timeslot_ids', '').split(',') if tid]
+    now = timezone.now()
+
+    with transaction.atomic():
+        existing = {
+            b.timeslot_id: b
+            for b in Booking.objects.select_for_update().filter(stripe_session_id=session_id)
+        }
+        confirmed, unfilled, newly_unfilled = [], [], []
+        for ts_id in set(timeslot_ids) | set(existing):
+            booking = existing.get(ts_id)
+            if booking is not None and booking.status in ('confirmed', 'refunded'):
+                continue
+            if booking is None and not user_id:
+                continue
+            if booking is not None and booking.status == 'unfilled':
+                # an earlier delivery found no seat; only its refund is retried
+                unfilled.append(booking.pk)
+                continue
+            seated = True
+            if booking is None or booking.status != 'pending':
+                # the hold was swept or never recorded: the seat must be taken again
+                seated = take_seat(ts_id)
+            if booking is None:
+                booking = Booking.objects.create(
+                    student_id=user_id, timeslot_id=ts_id, status='pending', stripe_session_id=session_id,
+                )
+            if seated:
+                confirmed.append(booking.pk)
+            else:
+                logger.error("Paid checkout %s could not get a seat in time slot %s", session_id, ts_id)
+                unfilled.append(booking.pk)
+                newly_unfilled.append(booking.pk)
+
+        Booking.objects.filter(pk__in=confirmed).update(status='confirmed', paid_at=now, expires_at=None)
+        Booking.objects.filter(pk__in=newly_unfilled).update(status='unfilled', paid_at=now, expires_at=None)
+        confirmed = list(
+            Booking.objects.filter(pk__in=confirmed).select_related('student', 'timeslot__course__teacher')
+        )
+
+    if confirmed:
+        send_booking_emails(confirmed)
+    if unfilled:
+        refund_unfilled(session, unfilled, notify=newly_unfilled)
+    return confirmed
+
+
+def refund_unfilled(session, booking_ids, notify=()):
+    # The customer paid for seats that were gone: refund each slot's price
+    # and mark the booking refunded. A booking whose refund fails stays
+    # 'unfilled' for staff to settle by hand; a replayed webhook retries it
+    # under the same idempotency key, so nothing is refunded twice.
+    bookings = list(
+        Booking.objects.filter(pk__in=booking_ids, status='unfilled').select_related('student', 'timeslot__course')
+    )
+    for booking in bookings:
+        try:
+            refund = stripe.Refund.create(
+                payment_intent=session.get('payment_intent'),
+                amount=booking.timeslot.course.price,
+                metadata={'booking_id': booking.pk},
+                idempotency_key=f"booking-{booking.pk}-refund",
+            )
+        except stripe.StripeError:
+            logger.exception("Refund for unfilled booking %s of checkout %s failed", booking.pk, session['id'])
+            continue
+        booking.status, booking.stripe_refund_id = 'refunded', refund.id
+        Booking.objects.filter(pk=booking.pk).update(status='refunded', stripe_refund_id=refund.id)
+
+    notify = [booking for booking in bookings if booking.pk in set(notify)]
+    if notify:
+        send_unfilled_email(notify)
+
+
+def cancel_checkout_session(session_id):
+    return cancel_holds(Booking.objects.filter(stripe_session_id=session_id))
+
+
+def abandon_checkout_session(user, session_id):
+    # the buyer came back from Stripe without paying: release their holds now
+    # rather than when they expire, and return the time slots that were held
+    bookings = Booking.objects.filter(student=user, stripe_session_id=session_id)
+    held = list(bookings.filter(status='pending').values_list('timeslot_id', flat=True))
+    cancel_holds(bookings)
+    return list(bookings.filter(status='canceled', timeslot_id__in=held).values_list('timeslot_id', flat=True))
+
+
+def send_booking_emails(bookings):
+    student = bookings[0].student
+
+    for booking in bookings:
+        slot = booking.timeslot
+        teacher = slot.course.teacher
+        teacher_email = getattr(teacher, 'email', None)
+        if teacher_email:
+            teacher_subject = "New Class Booking Confirmed"
+            teacher_message = (
+                f"Dear {teacher.get_username()},\n\n"
+                f"A new booking has been confirmed for your course '{slot.course.title}'.\n"
+                f"Student: {student.get_username()}\n"
+                f"Time: {slot.start_time.strftime('%Y-%m-%d %H:%M')}\n\n"
+                f"Please contact the student to proceed with the class arrangements.\n\n"
+                f"Student Contact Email: {student.email}\n\n"
+                f"Best regards, \n"
+                f"TradeSocial ThirdSpace Support Team"
+            )
+            send_mail(
+                teacher_subject,
+                teacher_message,
+                settings.DEFAULT_FROM_EMAIL,
+                [teacher_email],
+                fail_silently=True,
+            )
+
+    student_email = student.email
+    if student_email:
+        lines = []
+        for booking in bookings:
+            slot = booking.timeslot
+            lines.append(
+                f"_ {slot.course.title} at {slot.start_time.strftime('%Y-%m-%d %H:%M')}"
+                f"(Teacher: {slot.course.teacher.get_username()}, {slot.course.teacher.email})"
+            )
+        student_subject = "Your Class Booking Confirmation"
+        student_message = (
+            f"Dear {student.get_username()},\n\n"
+            f"Thank you for your payment. Your bookings have been confirmed for the following classes:\n\n"
+            f"{chr(10).join(lines)}\n\n"
+            f"Should you not be able to attend any of these classes, please contact your teachers to arrange the class details.\n\n"
+            f"Best regards,\n"
+            f"TradeSocial ThirdSpace Support Team"
+        )
+        send_mail(
+            student_subject,
+            student_message,
+            settings.DEFAULT_FROM_EMAIL,
+            [student_email],
+            fail_silently=True,
+        )
+
+
+def send_unfilled_email(bookings):
+    student = bookings[0].student
+    if not student.email:
+        return
+    lines = []
+    for booking in bookings:
+        slot = booking.timeslot
+        outcome = "refunded" if booking.status == 'refunded' else "refund pending, our team will contact you"
+        lines.append(f"_ {slot.course.title} at {slot.start_time.strftime('%Y-%m-%d %H:%M')} ({outcome})")
+    send_mail(
+        "Your Class Booking Could Not Be Completed",
+        (
+            f"Dear {student.get_username()},\n\n"
+            f"Your payment arrived after the following classes were fully booked, so we could not reserve your seat. "
+            f"We are refunding the price of each class to your card:\n\n"
+            f"{chr(10).join(lines)}\n\n"
+            f"Refunds usually reach your account within 5-10 business days.\n\n"
+            f"Best regards,\n"
+            f"TradeSocial ThirdSpace Support Team"
+        ),
+        settings.DEFAULT_FROM_EMAIL,
+        [student.email],
+        fail_silently=True,
+    )
@@ -0,0 +1,73 @@
+"""
+Seat reservations for time slots.
+
+TimeSlot.seats_available is the single source of truth for capacity. Seats
+are taken with a conditional UPDATE (``seats_available > 0``), so two buyers
+racing for the last seat cannot both win and no row lock is held while the
+buyer is on the Stripe page. A seat is held by a pending Booking until the
+webhook confirms it or the sweeper releases it.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import Booking, TimeSlot
+
+
+class SlotUnavailable(Exception):
+
+    def __init__(self, slot_id):
+        super().__init__(f"Time slot {slot_id} is fully booked.")
+        self.slot_id = slot_id
+
+
+def take_seat(slot_id):
+    return TimeSlot.objects.filter(pk=slot_id, seats_available__gt=0).update(
+        seats_available=F('seats_available') - 1, updated_at=timezone.now()
+    ) == 1
+
+
+def release_seats(slot_ids):
+    counts = Counter(slot_ids)
+    if not counts:
+        return
+    TimeSlot.objects.filter(pk__in=counts).update(
+        seats_available=F('seats_available') + Case(
+            *[When(pk=slot_id, then=Value(n)) for slot_id, n in counts.items()],
+            default=Value(0),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def hold_slots(user, slots, expires_at):
+    # all-or-nothing: a full slot rolls back the seats already taken
+    with transaction.atomic():
+        for slot in slots:
+            if not take_seat(slot.pk):
+                raise SlotUnavailable(slot.pk)
+        return Booking.objects.bulk_create([
+            Booking(student=user, timeslot=slot, status='pending', expires_at=expires_at)
+            for slot in slots
+        ])
+
+
+def attach_session(holds, session_id):
+    Booking.objects.filter(pk__in=[b.pk for b in holds]).update(stripe_session_id=session_id)
+
+
+def cancel_holds(queryset):
+    with transaction.atomic():
+        holds = list(queryset.filter(status='pending').select_for_update(skip_locked=True).values_list('pk', 'timeslot_id'))
+        if not holds:
+            return 0
+        canceled = Booking.objects.filter(pk__in=[pk for pk, _ in holds]).update(status='canceled')
+        release_seats([slot_id for _, slot_id in holds])
+    return canceled
+
+
+def expire_holds(now=None):
+    now = now or timezone.now()
+    return cancel_holds(Booking.objects.filter(status='pending', expires_at__lte=now))
@@ -0,0 +1,180 @@
+"""
+Minimal local stand-in for the parts of the Stripe API used by checkout.
+
+Run it with ``manage.py stripe_stub`` and set ``STRIPE_API_BASE`` to its
+address. Visiting a session's ``url`` pays it: the stub posts a signed
+``checkout.session.completed`` event to the webhook and then redirects to
+the session's success URL, just like hosted Checkout. Expiring a session
+through the API posts ``checkout.session.expired`` the same way. Refunds
+are recorded in ``refunds``; a repeated Idempotency-Key gets the first
+refund back.
+"""
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+
+def sign_payload(payload, secret, timestamp=None):
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def _parse_form(body):
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        if key.startswith('metadata[') and key.endswith(']'):
+            params.setdefault('metadata', {})[key[len('metadata['):-1]] = value
+        elif '[' not in key:
+            params[key] = value
+    return params
+
+
+class StripeStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, webhook_url, webhook_secret):
+        super().__init__(address, StripeStubHandler)
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.sessions = {}
+        self.refunds = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def create_session(self, params):
+        session_id = f"cs_test_{secrets.token_hex(12)}"
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f"{self.base_url}/pay/{session_id}",
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'mode': params.get('mode', 'payment'),
+            'customer_email': params.get('customer_email'),
+            'metadata': params.get('metadata', {}),
+            'success_url': params.get('success_url'),
+            'cancel_url': params.get('cancel_url'),
+            'expires_at': int(params['expires_at']) if params.get('expires_at') else None,
+        }
+        with self.lock:
+            self.sessions[session_id] = session
+        return session
+
+    def create_refund(self, params, idempotency_key=None):
+        with self.lock:
+            if idempotency_key in self.refunds:
+                return self.refunds[idempotency_key]
+            refund = {
+                'id': f"re_test_{secrets.token_hex(12)}",
+                'object': 'refund',
+                'amount': int(params['amount']),
+                'payment_intent': params.get('payment_intent'),
+                'metadata': params.get('metadata', {}),
+                'status': 'succeeded',
+            }
+            self.refunds[idempotency_key or refund['id']] = refund
+        return refund
+
+    def send_event(self, event_type, session):
+        payload = json.dumps({
+            'id': f"evt_{secrets.token_hex(12)}",
+            'object': 'event',
+            'type': event_type,
+            'data': {'object': session},
+        })
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=payload.encode(),
+            headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_payload(payload, self.webhook_secret),
+            },
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+
+
+class StripeStubHandler(BaseHTTPRequestHandler):
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location):
+        self.send_response(303)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _not_found(self):
+        self._json(404, {'error': {'type': 'invalid_request_error', 'message': 'No such resource.'}})
+
+    def do_POST(self):
+        segments = [s for s in urlparse(self.path).path.split('/') if s]
+        length = int(self.headers.get('Content-Length') or 0)
+        params = _parse_form(self.rfile.read(length).decode())
+        if segments == ['v1', 'checkout', 'sessions']:
+            return self._json(200, self.server.create_session(params))
+        if len(segments) == 5 and segments[:3] == ['v1', 'checkout', 'sessions'] and segments[4] == 'expire':
+            return self._expire(segments[3])
+        if segments == ['v1', 'refunds']:
+            return self._refund(params)
+        self._not_found()
+
+    def do_GET(self):
+        parts = urlparse(self.path)
+        segments = [s for s in parts.path.split('/') if s]
+        if len(segments) == 4 and segments[:3] == ['v1', 'checkout', 'sessions']:
+            session = self.server.sessions.get(segments[3])
+            return self._json(200, session) if session else self._not_found()
+        if len(segments) == 2 and segments[0] == 'pay':
+            return self._pay(segments[1], cancel='cancel' in dict(parse_qsl(parts.query)))
+        self._not_found()
+
+    def _expire(self, session_id):
+        session = self.server.sessions.get(session_id)
+        if session is None:
+            return self._not_found()
+        if session['status'] != 'open':
+            return self._json(400, {'error': {
+                'type': 'invalid_request_error', 'message': f"Only open sessions can be expired ({session['status']}).",
+            }})
+        with self.server.lock:
+            session['status'] = 'expired'
+        self.server.send_event('checkout.session.expired', session)
+        self._json(200, session)
+
+    def _refund(self, params):
+        paid = [s for s in self.server.sessions.values() if s.get('payment_intent') == params.get('payment_intent')]
+        if not paid or not params.get('amount'):
+            return self._json(400, {'error': {
+                'type': 'invalid_request_error', 'message': "Refunds need a paid payment_intent and an amount.",
+            }})
+        self._json(200, self.server.create_refund(params, self.headers.get('Idempotency-Key')))
+
+    def _pay(self, session_id, cancel=False):
+        session = self.server.sessions.get(session_id)
+        if session is None:
+            return self._not_found()
+        if cancel:
+            return self._redirect(session['cancel_url'].replace('{CHECKOUT_SESSION_ID}', session_id))
+
+        with self.server.lock:
+            session.update(status='complete', payment_status='paid', payment_intent=f"pi_test_{secrets.token_hex(12)}")
+        self.server.send_event('checkout.session.completed', session)
+        self._redirect(session['success_url'].replace('{CHECKOUT_SESSION_ID}', session_id))
@@ -1,3 +1,278 @@
-from django.test import TestCase
+import http.client
+import threading
+import urllib.error
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
-# Create your tests here.
+import stripe
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cart as cart_store
+from .models import Booking, Cart, Course, TimeSlot
+from .payments import cancel_checkout_session
+from .reservations import take_seat
+from .stripe_stub import StripeStub
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeCheckoutTests(LiveServerTestCase):
+    """Checkout against courses.stripe_stub, which calls the webhook on the live server."""
+
+    def setUp(self):
+        cache.clear()
+        self.stub = StripeStub(('127.0.0.1', 0), self.live_server_url + reverse('courses:stripe_webhook'), WEBHOOK_SECRET)
+        threading.Thread(target=self.stub.serve_forever, daemon=True).start()
+        self.addCleanup(self.stub.server_close)
+        self.addCleanup(self.stub.shutdown)
+        for name, value in (('api_base', self.stub.base_url), ('api_key', 'sk_test_stub')):
+            self.addCleanup(setattr, stripe, name, getattr(stripe, name))
+            setattr(stripe, name, value)
+
+        teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw')
+        course = Course.objects.create(teacher=teacher, title='Pottery', description='Wheel throwing', price=40)
+        start = timezone.now() + timedelta(days=7)
+        self.slot = TimeSlot.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1), capacity=1)
+        self.buyer = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.client.force_login(self.buyer)
+
+    def checkout(self):
+        cart_store.add_item(Cart.objects.get_or_create(user=self.buyer)[0], self.slot)
+        response = self.client.post(reverse('courses:cart_checkout'))
+        self.assertTrue(response.url.startswith(self.stub.base_url), response.url)
+        return response.url.rsplit('/', 1)[1]
+
+    def visit(self, url):
+        # like a browser on the hosted page; the redirect back is not followed
+        parts = urlparse(url)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+        self.addCleanup(connection.close)
+        connection.request('GET', parts.path + (f"?{parts.query}" if parts.query else ''))
+        return connection.getresponse()
+
+    def booking(self):
+        return Booking.objects.get(student=self.buyer, timeslot=self.slot)
+
+    def seats(self):
+        self.slot.refresh_from_db()
+        return self.slot.seats_available
+
+    def test_checkout_holds_the_seat(self):
+        session_id = self.checkout()
+
+        booking = self.booking()
+        self.assertEqual((booking.status, booking.stripe_session_id), ('pending', session_id))
+        self.assertEqual(self.seats(), 0)
+
+    def test_bad_signature_is_rejected(self):
+        session_id = self.checkout()
+        self.stub.webhook_secret = 'whsec_wrong'
+
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.stub.send_event('checkout.session.completed', dict(self.stub.sessions[session_id], payment_status='paid'))
+
+        self.assertEqual(raised.exception.code, 400)
+        self.assertEqual(self.booking().status, 'pending')
+
+    def test_paid_session_confirms_holds(self):
+        session_id = self.checkout()
+
+        response = self.visit(f"{self.stub.base_url}/pay/{session_id}")
+
+        self.assertEqual(response.status, 303)
+        booking = self.booking()
+        self.assertEqual(booking.status, 'confirmed')
+        self.assertIsNotNone(booking.paid_at)
+        self.assertIsNone(booking.expires_at)
+        self.assertEqual(self.seats(), 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_expired_session_releases_holds(self):
+        session_id = self.checkout()
+
+        stripe.checkout.Session.expire(session_id)
+
+        self.assertEqual(self.booking().status, 'canceled')
+        self.assertEqual(self.seats(), 1)
+
+    def test_replayed_events_are_harmless(self):
+        session_id = self.checkout()
+        self.visit(f"{self.stub.base_url}/pay/{session_id}")
+        session = self.stub.sessions[session_id]
+
+        self.assertEqual(self.stub.send_event('checkout.session.completed', session), 200)
+        self.assertEqual(self.stub.send_event('checkout.session.expired', session), 200)
+
+        self.assertEqual(Booking.objects.filter(student=self.buyer).count(), 1)
+        self.assertEqual(self.booking().status, 'confirmed')
+        self.assertEqual(self.seats(), 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_payment_after_the_seat_was_resold_is_refunded(self):
+        session_id = self.checkout()
+        # the hold is swept while the buyer is on the Stripe page and someone else takes the seat
+        cancel_checkout_session(session_id)
+        self.assertTrue(take_seat(self.slot.pk))
+
+        with self.assertLogs('courses.payments', 'ERROR'):
+            self.visit(f"{self.stub.base_url}/pay/{session_id}")
+
+        booking = self.booking()
+        self.assertEqual(booking.status, 'refunded')
+        self.assertIsNotNone(booking.paid_at)
+        refund, = self.stub.refunds.values()
+        self.assertEqual(booking.stripe_refund_id, refund['id'])
+        self.assertEqual(refund['amount'], 40)
+        self.assertEqual(refund['payment_intent'], self.stub.sessions[session_id]['payment_intent'])
+        self.assertEqual(self.seats(), 0)
+        self.assertEqual([message.to for message in mail.outbox], [['buyer@example.com']])
+        self.assertIn('fully booked', mail.outbox[0].body)
+
+        # a replayed event neither refunds nor emails again
+        self.stub.send_event('checkout.session.completed', self.stub.sessions[session_id])
+        self.assertEqual(len(self.stub.refunds), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        response = self.client.get(reverse('courses:cart_payment_success'), {'session_id': session_id})
+        self.assertContains(response, 'We are refunding')
+
+    def test_cancelled_checkout_restores_the_cart(self):
+        session_id = self.checkout()
+
+        back = urlparse(self.visit(f"{self.stub.base_url}/pay/{session_id}?cancel=1").getheader('Location'))
+        self.client.get(f"{back.path}?{back.query}")
+
+        self.assertEqual(self.booking().status, 'canceled')
+        self.assertEqual(self.seats(), 1)
+        self.assertEqual(self.stub.sessions[session_id]['status'], 'expired')
+        self.assertEqual(cart_store.timeslot_ids(Cart.objects.get(user=self.buyer)), [self.slot.pk])
+        self.assertNotEqual(self.checkout(), session_id)
+
+
+class TimeSlotCapacityTests(TestCase):
+
+    def setUp(self):
+        teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw')
+        course = Course.objects.create(teacher=teacher, title='Pottery', description='Wheel throwing', price=40)
+        start = timezone.now() + timedelta(days=7)
+        self.slot = TimeSlot.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1), capacity=3)
+        take_seat(self.slot.pk)
+
+    def seats(self):
+        return TimeSlot.objects.values_list('capacity', 'seats_available').get(pk=self.slot.pk)
+
+    def test_capacity_edit_moves_seats_by_the_difference(self):
+        self.slot.capacity = 5
+        self.slot.save()
+
+        self.assertEqual(self.seats(), (5, 4))
+
+    def test_capacity_left_out_of_update_fields_is_not_applied(self):
+        self.slot.capacity = 5
+        self.slot.end_time += timedelta(minutes=30)
+        self.slot.save(update_fields=['end_time'])
+
+        self.assertEqual(self.seats(), (3, 2))
+
+
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw')
+        self.course = Course.objects.create(teacher=self.teacher, title='Pottery', description='Wheel throwing', price=40)
+        # Wednesday 10:00-12:00 of a fixed week
+        start = timezone.make_aware(datetime(2030, 1, 2, 10))
+        TimeSlot.objects.create(course=self.course, start_time=start, end_time=start + timedelta(hours=2), capacity=1)
+
+    async def test_course_list_shows_every_course(self):
+        response = await self.async_client.get(reverse('courses:course_list'))
+
+        self.assertEqual([course.title for course in response.context['courses']], ['Pottery'])
+
+    async def test_weekly_schedule_places_the_slot_in_its_hours(self):
+        await self.async_client.aforce_login(self.teacher)
+
+        response = await self.async_client.get(
+            reverse('courses:weekly_schedule', args=[self.course.pk]), {'start': '2029-12-31'},
+        )
+
+        booked = [
+            (row['hour'], cell['date'].day, cell['status'])
+            for row in response.context['hours'] for cell in row['cells'] if cell['slot']
+        ]
+        self.assertEqual(booked, [(10, 2, 'available'), (11, 2, 'available')])
+        response = await self.async_client.get(reverse('courses:weekly_schedule', args=[self.course.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CartTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user('teacher', 'teacher@example.com', 'pw')
+        self.course = Course.objects.create(teacher=teacher, title='Pottery', description='Wheel throwing', price=40)
+        start = timezone.now() + timedelta(days=7)
+        self.slots = [
+            TimeSlot.objects.create(
+                course=self.course, start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i + 1), capacity=3,
+            )
+            for i in range(3)
+        ]
+        self.buyer = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+
+    def add(self, slot):
+        self.client.get(reverse('courses:add_to_cart', args=[slot.pk]))
+
+    def test_anonymous_cart_is_merged_into_the_users_cart_on_login(self):
+        cart_store.add_item(Cart.objects.create(user=self.buyer), self.slots[0])
+        self.add(self.slots[0])
+        self.add(self.slots[1])
+        anonymous = Cart.objects.get(user__isnull=True)
+
+        self.client.login(username='buyer', password='pw')
+
+        self.assertFalse(Cart.objects.filter(pk=anonymous.pk).exists())
+        self.assertEqual(
+            sorted(cart_store.timeslot_ids(Cart.objects.get(user=self.buyer))), [self.slots[0].pk, self.slots[1].pk],
+        )
+        self.assertNotIn(cart_store.CART_SESSION_KEY, self.client.session)
+        self.assertEqual(self.client.get(reverse('courses:view_cart')).context['total_amount'], 80)
+
+    def test_cached_totals_follow_cart_changes(self):
+        cart = Cart.objects.create(user=self.buyer)
+        cart_store.add_item(cart, self.slots[0])
+        self.assertEqual(cart_store.totals(cart), {'count': 1, 'amount': 40})
+
+        cart_store.add_item(cart, self.slots[1])
+        self.assertEqual(cart_store.totals(cart), {'count': 2, 'amount': 80})
+
+        cart_store.remove_item(cart, self.slots[0].pk)
+        self.assertEqual(cart_store.totals(cart), {'count': 1, 'amount': 40})
+
+    def test_a_price_change_busts_every_cached_total(self):
+        carts = [Cart.objects.create(user=self.buyer), Cart.objects.create()]
+        for cart in carts:
+            cart_store.add_item(cart, self.slots[0])
+            self.assertEqual(cart_store.totals(cart)['amount'], 40)
+
+        self.course.price = 55
+        self.course.save()
+
+        self.assertEqual([cart_store.totals(cart)['amount'] for cart in carts], [55, 55])
+
+    def test_an_evicted_price_version_does_not_bring_back_old_totals(self):
+        cart = Cart.objects.create(user=self.buyer)
+        cart_store.add_item(cart, self.slots[0])
+        cart_store.totals(cart)
+        cache.delete(cart_store.PRICES_VERSION_KEY)
+
+        Course.objects.filter(pk=self.course.pk).update(price=70)
+        self.course.refresh_from_db()
+        self.course.save()
+
+        self.assertEqual(cart_store.totals(cart)['amount'], 70)
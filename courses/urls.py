@@ -19,6 +19,7 @@ urlpatterns = [
     path('cart/checkout/', views.cart_checkout, name='cart_checkout'),
     path('cart/success/', views.cart_payment_success, name='cart_payment_success'),
     path('cart/cancel/', views.cart_payment_cancel, name='cart_payment_cancel'),
+    path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
 
     
     
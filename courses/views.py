@@ -6,24 +6,40 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.urls import reverse
-from django.views.generic import ListView, DetailView, CreateView, TemplateView
+from django.views.generic import ListView, DetailView, CreateView
 from .models import Course, TimeSlot, Booking
 from .forms import CourseForm, TimeSlotForm, TimeSlotFormSet
 from datetime import timedelta
 from django.contrib import messages
 from django.views import View
+from django.utils.decorators import method_decorator
+from main_site.db import fetch_all
+from main_site.replicas import read_from_replica
 from datetime import datetime
 import ast
-from django.core.mail import send_mail
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .payments import abandon_checkout_session, cancel_checkout_session, confirm_checkout_session, hold_expiry
+from . import cart as cart_store
+from .reservations import SlotUnavailable, attach_session, cancel_holds, hold_slots
 
 stripe.api_key = settings.STRIPE_SECRET_KEY 
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
 
 
 
-class CourseListView(ListView):
-    model = Course
+class CourseListView(View):
     template_name = 'courses/course_list.html'
-    context_object_name = 'courses'
+
+    @method_decorator(read_from_replica)
+    async def get(self, request, *args, **kwargs):
+        courses = [course async for course in Course.objects.select_related('teacher')]
+        return await sync_to_async(render)(request, self.template_name, {'courses': courses})
 
 class MyCourseListView(LoginRequiredMixin, ListView):
     model = Course
@@ -41,7 +57,7 @@ class CourseDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         course = self.get_object()
-        context['available_slots'] = [slot for slot in course.time_slots.all() if slot.is_available]
+        context['available_slots'] = course.time_slots.filter(seats_available__gt=0)
         return context
 
 class CourseCreateView(LoginRequiredMixin, View):
@@ -114,15 +130,12 @@ def generate_timeslots_for_course(course, capacity=1):
 
 
 
-class WeeklyScheduleView(LoginRequiredMixin, TemplateView):
+class WeeklyScheduleView(View):
     template_name = 'courses/weekly_schedule.html'
 
-    def get_context_data(self, **kwargs):
-        ctx = super().get_context_data(**kwargs)
-        course = get_object_or_404(Course, pk=kwargs['pk'])
-        ctx['course'] = course
-
-        start_str = self.request.GET.get('start')
+    @method_decorator([login_required, read_from_replica])
+    async def get(self, request, pk):
+        start_str = request.GET.get('start')
         if start_str:
             try:
                 week_start = datetime.strptime(start_str, '%Y-%m-%d').date()
@@ -134,12 +147,16 @@ class WeeklyScheduleView(LoginRequiredMixin, TemplateView):
             week_start = today - timedelta(days=today.weekday())
         week_end = week_start + timedelta(days=7)
 
-        timeslots = (
-            course.time_slots
-            .filter(start_time__date__gte=week_start, start_time__date__lt=week_end)
-            .select_related('course')
-            .prefetch_related('bookings')
+        timeslots = TimeSlot.objects.filter(
+            course_id=pk, start_time__date__gte=week_start, start_time__date__lt=week_end,
         )
+        try:
+            course, timeslots = await asyncio.gather(
+                Course.objects.aget(pk=pk),
+                fetch_all(timeslots),
+            )
+        except Course.DoesNotExist:
+            raise Http404('No Course matches the given query.')
 
         slot_map = {}
         for ts in timeslots:
@@ -153,7 +170,6 @@ class WeeklyScheduleView(LoginRequiredMixin, TemplateView):
                     slot_map[key] = ts
                 current += timedelta(hours=1)
         days = [week_start + timedelta(days=i) for i in range(7)]
-        ctx['days'] = days
 
         hours = []
         for h in range(24):
@@ -170,13 +186,16 @@ class WeeklyScheduleView(LoginRequiredMixin, TemplateView):
                     'status': status,
                 })
             hours.append({ 'hour': h, 'cells': row_cells })
-        ctx['hours'] = hours
-        ctx['week_start'] = week_start
-        ctx['week_end'] = week_end - timedelta(days=1)
 
-        ctx['prev_start'] = week_start -timedelta(days=7)
-        ctx['next_start'] = week_start + timedelta(days=7)
-        return ctx
+        return await sync_to_async(render)(request, self.template_name, {
+            'course': course,
+            'days': days,
+            'hours': hours,
+            'week_start': week_start,
+            'week_end': week_end - timedelta(days=1),
+            'prev_start': week_start -timedelta(days=7),
+            'next_start': week_start + timedelta(days=7),
+        })
 
 
 
@@ -204,43 +223,30 @@ class TimeSlotCreateView(LoginRequiredMixin, CreateView):
 
 
 
-@login_required
 def add_to_cart(request, pk):
     slot = get_object_or_404(TimeSlot, pk=pk)
     if not slot.is_available:
         messages.error(request, "This time slot is no longer available.")
         return redirect('courses:weekly_schedule', pk=slot.course.pk)
-    cart = request.session.get('cart', [])
-    if pk not in cart:
-        cart.append(pk)
-        request.session['cart'] = cart
-        request.session.modified = True
+    if cart_store.add_item(cart_store.get_cart(request, create=True), slot):
         messages.success(request, "Time slot added to cart.")
     else:
         messages.info(request, "Time slot is already in your cart.")
     return redirect('courses:view_cart')
 
-@login_required
 def view_cart(request):
-    cart = request.session.get('cart', [])
-    slots = TimeSlot.objects.filter(pk__in=cart).select_related('course')
-    total_amount = sum(slot.course.price for slot in slots)
+    cart = cart_store.get_cart(request)
+    slots = TimeSlot.objects.filter(cart_items__cart=cart).select_related('course') if cart else []
     context = {
         'slots': slots,
-        'total_amount': total_amount,
+        'total_amount': cart_store.totals(cart)['amount'],
     }
     return render(request, 'courses/cart.html', context)
 
 
-@login_required
 def remove_from_cart(request, pk):
-    cart = request.session.get('cart', [])
-
-    cart = [int(x) for x in cart ]
-    if pk in cart:
-        cart.remove(pk)
-        request.session['cart'] = cart
-        request.session.modified = True
+    cart = cart_store.get_cart(request)
+    if cart is not None and cart_store.remove_item(cart, pk):
         messages.success(request, "Time slot removed from cart.")
     else:
         messages.info(request, "Time slot was not in your cart.")
@@ -249,14 +255,17 @@ def remove_from_cart(request, pk):
 
 @login_required
 def cart_checkout(request):
-    cart = request.session.get('cart', [])
-    if request.method != 'POST' or not cart:
+    cart = cart_store.get_cart(request)
+    slots = TimeSlot.objects.filter(cart_items__cart=cart).select_related('course') if cart else []
+    if request.method != 'POST' or not slots:
         messages.error(request, "Your cart is empty.")
         return redirect('courses:view_cart')
 
-    slots = TimeSlot.objects.filter(pk__in=cart).select_related('course')
-    if not slots:
-        messages.error(request, "Your cart is empty.")
+    expires_at = hold_expiry()
+    try:
+        holds = hold_slots(request.user, slots, expires_at)
+    except SlotUnavailable:
+        messages.error(request, "Some time slots in your cart are no longer available.")
         return redirect('courses:view_cart')
 
     YOUR_DOMAIN = request.build_absolute_uri('/')[:-1]
@@ -277,22 +286,28 @@ def cart_checkout(request):
         })
         timeslot_ids.append(str(slot.pk))
 
-    checkout_session = stripe.checkout.Session.create(
-    payment_method_types=['card'],
-    mode='payment',
-    customer_email=request.user.email or None,
-    line_items=line_items,
-    metadata={
-    'timeslot_ids': ','.join(timeslot_ids),
-    'user_id': request.user.id,
-    },
-    success_url=YOUR_DOMAIN + reverse('courses:cart_payment_success') + '?session_id={CHECKOUT_SESSION_ID}',
-    cancel_url=YOUR_DOMAIN + reverse('courses:cart_payment_cancel'),
-    )
+    try:
+        checkout_session = stripe.checkout.Session.create(
+        payment_method_types=['card'],
+        mode='payment',
+        customer_email=request.user.email or None,
+        line_items=line_items,
+        metadata={
+        'timeslot_ids': ','.join(timeslot_ids),
+        'user_id': request.user.id,
+        },
+        expires_at=int(expires_at.timestamp()),
+        success_url=YOUR_DOMAIN + reverse('courses:cart_payment_success') + '?session_id={CHECKOUT_SESSION_ID}',
+        cancel_url=YOUR_DOMAIN + reverse('courses:cart_payment_cancel') + '?session_id={CHECKOUT_SESSION_ID}',
+        )
+    except stripe.StripeError:
+        cancel_holds(Booking.objects.filter(pk__in=[b.pk for b in holds]))
+        messages.error(request, "We could not start the payment. Please try again.")
+        return redirect('courses:view_cart')
+    attach_session(holds, checkout_session.id)
 
-    # optional: keep cart until success, or clear now
-    request.session['cart'] = []
-    request.session.modified = True
+    # cart_payment_cancel puts the slots back if the buyer does not pay
+    cart_store.clear(cart)
 
     return redirect(checkout_session.url)
 
@@ -304,83 +319,61 @@ def cart_payment_success(request):
         messages.error(request, "Missing payment session.")
         return redirect('home')
 
-    session = stripe.checkout.Session.retrieve(session_id)
-    timeslot_ids_str = session.metadata.get('timeslot_ids', '')
-    timeslot_ids = [tid for tid in timeslot_ids_str.split(',') if tid]
-
-    if not timeslot_ids:
-        messages.error(request, "No time slots found in payment session.")
-        return redirect('home')
-
-    now = timezone.now()
-    created_bookings = []
-
-    for ts_id in timeslot_ids:
-        slot = TimeSlot.objects.get(pk=ts_id)
-        booking = Booking.objects.create(
-        student=request.user,
-        timeslot=slot,
-        status='confirmed',
-        stripe_session_id=session_id,
-        paid_at=now,
-        )
-        created_bookings.append(booking)
-
-        teacher = slot.course.teacher
-        teacher_email = getattr(teacher, 'email', None)
-        if teacher_email:
-            teacher_subject = "New Class Booking Confirmed"
-            teacher_message = (
-                f"Dear {teacher.get_username()},\n\n"
-                f"A new booking has been confirmed for your course '{slot.course.title}'.\n"
-                f"Student: {request.user.get_username()}\n"
-                f"Time: {slot.start_time.strftime('%Y-%m-%d %H:%M')}\n\n"
-                f"Please contact the student to proceed with the class arrangements.\n\n"
-                f"Student Contact Email: {request.user.email}\n\n"
-                f"Best regards, \n"
-                f"TradeSocial ThirdSpace Support Team"
-            )
-            send_mail(
-                teacher_subject,
-                teacher_message,
-                settings.DEFAULT_FROM_EMAIL,
-                [teacher_email],
-                fail_silently=True,
-            )
-        
-    student_email = request.user.email
-    if student_email:
-        lines = []
-        for booking in created_bookings:
-            slot = booking.timeslot
-            lines.append(
-                f"_ {slot.course.title} at {slot.start_time.strftime('%Y-%m-%d %H:%M')}"
-                f"(Teacher: {slot.course.teacher.get_username()})"
-            )
-        student_subject = "Your Class Booking Confirmation"
-        student_message = (
-            f"Dear {request.user.get_username()},\n\n"
-            f"Thank you for your payment. Your bookings have been confirmed for the following classes:\n\n"
-            f"{chr(10).join(lines)}\n\n"
-            f"Should you not be able to attend any of these classes, please contact your teachers to arrange the class details. Teacher's email: {teacher.email}\n\n"
-            f"Best regards,\n"
-            f"TradeSocial ThirdSpace Support Team"
-        )
-        send_mail(
-            student_subject,
-            student_message,
-            settings.DEFAULT_FROM_EMAIL,
-            [student_email],
-            fail_silently=True,
+    # bookings are confirmed by the webhook; this page only reports local state
+    bookings = (
+        Booking.objects.filter(student=request.user, stripe_session_id=session_id)
+        .select_related('timeslot__course')
+        .order_by('timeslot__start_time')
+    )
+    confirmed = [b for b in bookings if b.status == 'confirmed']
+    return render(request, 'courses/payment_success.html', {
+        'bookings': confirmed,
+        'unfilled': [b for b in bookings if b.status in ('unfilled', 'refunded')],
+        'processing': not confirmed and any(b.status == 'pending' for b in bookings),
+    })
+
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    payload = request.body
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload,
+            request.headers.get('Stripe-Signature'),
+            settings.STRIPE_WEBHOOK_SECRET,
+            stripe.Webhook.DEFAULT_TOLERANCE,
         )
+    except stripe.SignatureVerificationError:
+        return HttpResponseBadRequest("Invalid signature.")
+
+    event = json.loads(payload)
+    event_type = event.get('type')
+    session = event.get('data', {}).get('object', {})
 
-    messages.success(request, "Payment successful. Your classes have been booked!")
-    return redirect('some_dashboard_or_schedule') 
+    if event_type == 'checkout.session.completed' and session.get('payment_status') == 'paid':
+        confirm_checkout_session(session)
+    elif event_type == 'checkout.session.async_payment_succeeded':
+        confirm_checkout_session(session)
+    elif event_type in ('checkout.session.expired', 'checkout.session.async_payment_failed'):
+        cancel_checkout_session(session['id'])
+    return HttpResponse(status=200)
 
 
 @login_required
 def cart_payment_cancel(request):
-    messages.info(request, "Payment was cancelled.")
+    session_id = request.GET.get('session_id')
+    timeslot_ids = abandon_checkout_session(request.user, session_id) if session_id else []
+    if timeslot_ids:
+        cart_store.restore(cart_store.get_cart(request, create=True), timeslot_ids)
+        try:
+            # the holds are gone, so the session must not be paid any more
+            stripe.checkout.Session.expire(session_id)
+        except stripe.StripeError:
+            pass
+        messages.info(request, "Payment was cancelled. The time slots are back in your cart.")
+    else:
+        messages.info(request, "Payment was cancelled.")
     return render(request, 'courses/payment_cancel.html')
 
 
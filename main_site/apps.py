@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class MainSiteConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'main_site'
+
+    def ready(self):
+        # the database profiles in settings.py apply to every app
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='main_site.db.configure_sqlite')
@@ -2,6 +2,9 @@
 ASGI config for main_site project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with any ASGI server, e.g. ``uvicorn main_site.asgi:application``;
+the public read pages (home, item detail, course list, weekly schedule) are
+async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -0,0 +1,13 @@
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply the PRAGMAS of a SQLite database alias to each new connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+async def fetch_all(queryset):
+    """Evaluate a queryset from async code; lets asyncio.gather run several."""
+    return [obj async for obj in queryset]
@@ -0,0 +1,48 @@
+"""
+Paginator for very large admin change lists.
+
+COUNT(*) over millions of rows is the slowest query on a change list page.
+``EstimatedCountPaginator`` asks the planner for a row estimate instead
+(EXPLAIN on PostgreSQL, sqlite_stat1 on an unfiltered SQLite table) and only
+runs the exact count when the estimate is small or unavailable.
+"""
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if connection.vendor == 'sqlite' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    # below this many rows the exact count is cheap enough
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_limit:
+            return super().count
+        return estimate
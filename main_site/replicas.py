@@ -0,0 +1,114 @@
+"""
+Read-replica routing.
+
+Views opt in with ``read_from_replica``: their queries go to one replica
+picked for the whole request, unless the request writes or the browser
+wrote recently. Every non-safe request sets a short-lived cookie that pins
+the following requests to the primary, so a buyer sees their own offer or
+booking right after the redirect. Everything else, and anything inside a
+transaction, uses the primary. Both work with sync and async views.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.response import SimpleTemplateResponse
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica = ContextVar('replica', default=None)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or connections['default'].in_atomic_block:
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema through replication (or sync_replicas)
+        return db not in settings.DATABASE_REPLICAS
+
+
+def _use_replica(request):
+    return (
+        settings.DATABASE_REPLICAS
+        and request.method in SAFE_METHODS
+        and PIN_COOKIE not in request.COOKIES
+    )
+
+
+def read_from_replica(view):
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not _use_replica(request):
+                return await view(request, *args, **kwargs)
+
+            # sync_to_async copies the context, so ORM calls in worker
+            # threads see the replica too
+            token = _replica.set(random.choice(settings.DATABASE_REPLICAS))
+            try:
+                response = await view(request, *args, **kwargs)
+                if isinstance(response, SimpleTemplateResponse):
+                    await sync_to_async(response.render)()
+                return response
+            finally:
+                _replica.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _use_replica(request):
+            return view(request, *args, **kwargs)
+
+        token = _replica.set(random.choice(settings.DATABASE_REPLICAS))
+        try:
+            response = view(request, *args, **kwargs)
+            # template responses query lazily; render while still routed
+            if isinstance(response, SimpleTemplateResponse):
+                response.render()
+            return response
+        finally:
+            _replica.reset(token)
+    return wrapper
+
+
+class PinPrimaryAfterWriteMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,28 @@
+"""
+cached_db session store that coalesces no-op writes.
+
+Views often assign session values that did not actually change (a cart or
+a flag written back on every request). The stock store writes the row to
+the database and the cache each time; this one remembers what it loaded and
+skips the save when the serialized session is identical.
+"""
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class SessionStore(CachedDBStore):
+
+    _loaded = None
+
+    def load(self):
+        data = super().load()
+        self._loaded = self._serialize(data)
+        return data
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key and self._loaded == self._serialize(self._session):
+            return
+        super().save(must_create=must_create)
+        self._loaded = self._serialize(self._session)
+
+    def _serialize(self, data):
+        return self.serializer().dumps(data)
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,8 +40,10 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'main_site',
     'auction',
     'courses',
+    'api',
     'crispy_forms',
     'crispy_bootstrap5',
    
@@ -55,10 +60,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main_site.replicas.PinPrimaryAfterWriteMiddleware',
 ]
 
 ROOT_URLCONF = 'main_site.urls'
 
+# TEMPLATE_PROFILE=production pins the cached loader and turns template debug
+# info off regardless of DEBUG, so each template is compiled once per process
+# by the plain lexer. development (the default) keeps Django's defaults.
+
+TEMPLATE_PROFILE = os.getenv('TEMPLATE_PROFILE', 'development')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -71,23 +83,121 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'auction.context_processors.user_role',
+                'auction.context_processors.category_nav',
             ],
         },
     },
 ]
 
+if TEMPLATE_PROFILE == 'production':
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS'].update({
+        'debug': False,
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    })
+
 WSGI_APPLICATION = 'main_site.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) for local runs, DB_ENGINE=postgres for production.
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'auction'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', ''),
+            # keep connections open between requests and verify them before reuse
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': 20,
+                # take the write lock at BEGIN so read-then-write transactions
+                # wait for each other instead of failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # applied to every new connection by main_site.db.configure_sqlite
+            'PRAGMAS': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 20000,
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE={DB_ENGINE} is not supported; use sqlite or postgres.")
+
+# Read replicas: DB_REPLICAS is a comma-separated list of SQLite files, or of
+# Postgres hosts with DB_ENGINE=postgres. Tests mirror them onto 'default'.
+
+DATABASE_REPLICAS = []
+for number, location in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    replica['HOST' if DB_ENGINE == 'postgres' else 'NAME'] = location.strip()
+    DATABASES[f'replica{number}'] = replica
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['main_site.replicas.ReplicaRouter']
+
+# after a write, read from the primary for this long (read-your-writes)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+
+# Cache and sessions
+# CACHE_BACKEND=locmem suits a single process; use CACHE_BACKEND=file when
+# several worker processes on one host have to share cached sessions.
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', Path(tempfile.gettempdir()) / 'main_site_cache'),
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'main_site',
+        }
+    }
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'main_site.sessions',
+    'cache': 'django.contrib.sessions.backends.cache',
 }
+# sessions cached in a per-process locmem cache would outlive a logout made
+# on another worker, so cached sessions need the shared file cache
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cached_db' if CACHE_BACKEND == 'file' else 'db')
+if SESSION_BACKEND in ('cached_db', 'cache') and CACHE_BACKEND == 'locmem':
+    raise ImproperlyConfigured(f"SESSION_BACKEND={SESSION_BACKEND} needs a shared cache; set CACHE_BACKEND=file.")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
+# flash messages ride in a cookie so they never cause a session write
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 
 
 # Password validation
@@ -150,7 +260,36 @@ EMAIL_HOST_USER = os.getenv('EMAIL_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_PASSWORD', '')
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# absolute links in emails that are not sent from a request (watch digests)
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000').rstrip('/')
 
 
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
-STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
\ No newline at end of file
+STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+# point at a local stand-in (manage.py stripe_stub) instead of api.stripe.com
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE')
+
+# Stripe requires checkout sessions to stay open for at least 30 minutes
+BOOKING_HOLD_MINUTES = int(os.getenv('BOOKING_HOLD_MINUTES', 31))
+
+# rate limits for auction.ratelimit: name -> (burst size, requests per minute)
+RATE_LIMITS = {
+    'offer-user': (10, 6),
+    'offer-item': (60, 30),
+    'login-ip': (20, 10),
+    'login-username': (5, 1),
+}
+
+# drafts that were never confirmed are removed by manage.py purge_draft_offers
+DRAFT_OFFER_TTL_HOURS = int(os.getenv('DRAFT_OFFER_TTL_HOURS', 24))
+
+# proxy bids outbid a rival by this much per unit, capped at their maximum
+PROXY_BID_INCREMENT = os.getenv('PROXY_BID_INCREMENT', '1.00')
+
+# soft-close items end no sooner than this long after their latest offer
+SOFT_CLOSE_WINDOW_MINUTES = int(os.getenv('SOFT_CLOSE_WINDOW_MINUTES', 5))
+
+# stored POST results are replayed for retries this long, then purged by
+# manage.py purge_idempotency_keys
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', 24))
@@ -0,0 +1,170 @@
+import io
+import os
+import runpy
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+
+from auction.models import Category
+
+from .replicas import PIN_COOKIE, read_from_replica
+from .sessions import SessionStore
+
+REPLICA = 'replica1'
+
+
+@read_from_replica
+def category_names(request):
+    if request.method == 'POST':
+        Category.objects.create(name=request.POST['name'])
+    elif 'add' in request.GET:
+        Category.objects.create(name=request.GET['add'])
+    if 'atomic' in request.GET:
+        with transaction.atomic():
+            names = list(Category.objects.values_list('name', flat=True))
+    else:
+        names = list(Category.objects.values_list('name', flat=True))
+    return JsonResponse({'names': sorted(names)})
+
+
+urlpatterns = [path('names/', category_names)]
+
+
+@override_settings(ROOT_URLCONF=__name__, DATABASE_REPLICAS=[REPLICA])
+class ReplicaTestCase(TransactionTestCase):
+    """The test database as primary and a replica in its own SQLite file,
+    brought up to date with sync_replicas whenever a test calls sync()."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # added after the runner has set up its databases, and allowed by hand
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA] = dict(
+            connections['default'].settings_dict, NAME=os.path.join(cls.directory.name, 'replica.sqlite3'),
+        )
+        cls.databases = {*cls.databases, REPLICA}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.directory.cleanup()
+
+    def sync(self):
+        call_command('sync_replicas', stdout=io.StringIO())
+
+    def names(self, **params):
+        return self.client.get('/names/', params).json()['names']
+
+
+class ReplicaRoutingTests(ReplicaTestCase):
+
+    def test_reads_go_to_the_replica(self):
+        Category.objects.create(name='synced')
+        self.sync()
+        Category.objects.create(name='not yet synced')
+
+        self.assertEqual(self.names(), ['synced'])
+
+    def test_reads_in_a_transaction_go_to_the_primary(self):
+        self.sync()
+        Category.objects.create(name='not yet synced')
+
+        self.assertEqual(self.names(atomic=1), ['not yet synced'])
+
+    def test_writes_go_to_the_primary(self):
+        self.sync()
+
+        self.assertEqual(self.names(add='written'), [])
+        self.assertTrue(Category.objects.using('default').filter(name='written').exists())
+        self.assertFalse(Category.objects.using(REPLICA).filter(name='written').exists())
+
+    def test_reads_after_a_write_are_pinned_to_the_primary(self):
+        self.sync()
+
+        response = self.client.post('/names/', {'name': 'posted'})
+
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertEqual(self.names(), ['posted'])
+
+    def test_reads_go_back_to_the_replica_when_the_pin_expires(self):
+        self.sync()
+        self.client.post('/names/', {'name': 'posted'})
+
+        # the browser drops the cookie after max-age
+        del self.client.cookies[PIN_COOKIE]
+
+        self.assertEqual(self.names(), [])
+        self.sync()
+        self.assertEqual(self.names(), ['posted'])
+
+
+class DatabaseProfileTests(TestCase):
+
+    def test_new_sqlite_connections_get_the_profile_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            # 1 is NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.DATABASES['default']['PRAGMAS']['busy_timeout'])
+
+
+class SettingsTests(SimpleTestCase):
+
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            for name in {'DB_ENGINE', 'CACHE_BACKEND', 'SESSION_BACKEND'} - set(environ):
+                os.environ.pop(name, None)
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'main_site', 'settings.py'))
+
+    def test_unknown_db_engine_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load(DB_ENGINE='mysql')
+
+    def test_sessions_are_cached_only_with_a_shared_cache(self):
+        self.assertEqual(self.load()['SESSION_ENGINE'], 'django.contrib.sessions.backends.db')
+        self.assertEqual(self.load(CACHE_BACKEND='file')['SESSION_ENGINE'], 'main_site.sessions')
+        self.assertEqual(
+            self.load(CACHE_BACKEND='file', SESSION_BACKEND='db')['SESSION_ENGINE'], 'django.contrib.sessions.backends.db',
+        )
+
+    def test_cached_sessions_on_the_per_process_cache_are_refused(self):
+        for backend in ('cached_db', 'cache'):
+            with self.subTest(backend), self.assertRaises(ImproperlyConfigured):
+                self.load(SESSION_BACKEND=backend)
+
+
+class CoalescingSessionTests(TestCase):
+
+    def setUp(self):
+        session = SessionStore()
+        session['cart'] = [1, 2]
+        session.save()
+        self.session = SessionStore(session.session_key)
+        self.session.load()
+
+    def test_unchanged_session_is_not_written(self):
+        self.session['cart'] = [1, 2]
+
+        with self.assertNumQueries(0):
+            self.session.save()
+
+    def test_changed_session_is_written(self):
+        self.session['cart'] = [1, 2, 3]
+        self.session.save()
+
+        self.assertEqual(Session.objects.get(pk=self.session.session_key).get_decoded()['cart'], [1, 2, 3])
+        with self.assertNumQueries(0):
+            self.session.save()